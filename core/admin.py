@@ -4,11 +4,42 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.db import transaction  # Linha adicionada para importar o módulo 'transaction'
 from django.utils import timezone
+from django.utils.html import format_html
+from . import approvals, ledger, referrals, search
+from .paginators import EstimatedCountPaginator
 from .models import (
     CustomUser, Product, Bank, Deposit, UserBankAccount, UserProfile,
-    Withdrawal, Task, SupportInfo, LuckyWheelPrize, LuckyWheelSpin
+    Withdrawal, Task, SupportInfo, LuckyWheelPrize, LuckyWheelSpin,
+    LedgerEntry, UserLedgerTotals, Job
 )
 
+class LargeTableMixin:
+    """
+    Listagens de tabelas que crescem sem limite: contagem estimada em vez do
+    COUNT(*) exato (core/paginators.py) e sem o segundo COUNT(*) da tabela
+    inteira que o admin faz para mostrar "N de M" quando há filtros.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class IndexedUserSearchMixin:
+    """
+    Pesquisa de usuários pelo índice de core/search.py (telefone, IBAN, código
+    de convite, nome ou e-mail, normalizados) em vez de icontains em várias colunas com
+    joins, que percorre a tabela inteira. `search_user_field` é o campo que
+    aponta para o usuário ('pk' na própria lista de usuários).
+    """
+    search_user_field = 'user'
+    search_help_text = "Telefone, IBAN, código de convite, nome ou e-mail (o início basta)."
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        users = search.matching_users(search_term, using=queryset.db)
+        return queryset.filter(**{f'{self.search_user_field}__in': users}), False
+
+
 # Adiciona o modelo UserProfile como um "Inline" na página de edição do CustomUser
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
@@ -20,7 +51,7 @@ class UserProfileInline(admin.StackedInline):
 
 # Admin para CustomUser
 @admin.register(CustomUser)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(IndexedUserSearchMixin, LargeTableMixin, UserAdmin):
     # Usa o inline para exibir os campos do UserProfile na página de edição do usuário
     inlines = (UserProfileInline,)
     
@@ -31,25 +62,54 @@ class CustomUserAdmin(UserAdmin):
         'my_invitation_code', 'invited_by_code',
         'can_spin_lucky_wheel', 'daily_spins_remaining', 'last_spin_date'
     )
-    # Campos que podem ser usados para buscar usuários.
-    # 'profile__full_name' e 'profile__iban' acessam os campos do UserProfile.
-    # Os outros campos são diretamente do CustomUser.
-    search_fields = ('username', 'phone_number', 'email', 'my_invitation_code', 'invited_by_code', 'profile__full_name', 'profile__iban')
+    # Pesquisa pelo índice (IndexedUserSearchMixin): telefone, username, e-mail,
+    # código de convite, nome e IBANs do perfil e das contas bancárias.
+    search_user_field = 'pk'
+    search_fields = ('search_entries__value',)
     # Campos que podem ser filtrados
     list_filter = ('is_staff', 'is_active', 'is_superuser', 'current_product', 'can_spin_lucky_wheel')
+    # Chaves estrangeiras mostradas na lista, lidas no mesmo SELECT (também as que aceitam NULL)
+    list_select_related = ('current_product',)
+    # Filtro por data pelo índice core_user_joined_idx
+    date_hierarchy = 'date_joined'
 
     # Configuração dos campos no formulário de edição de usuário no admin
     fieldsets = (
         (None, {'fields': ('username', 'password')}),
         ('Informações Pessoais', {'fields': ('phone_number', 'email', 'balance', 'bonus_balance')}),
         ('Produto de Investimento', {'fields': ('current_product', 'level_activation_date')}),
-        ('Convites e Roleta', {'fields': ('my_invitation_code', 'referral_income', 'invited_by_code', 'can_spin_lucky_wheel', 'daily_spins_remaining', 'last_spin_date')}),
+        ('Convites e Roleta', {'fields': ('my_invitation_code', 'referral_income', 'invited_by_code', 'invited_by', 'team_size', 'invested_team_size', 'can_spin_lucky_wheel', 'daily_spins_remaining', 'last_spin_date')}),
         ('Permissões', {'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions')}),
         ('Datas Importantes', {'fields': ('last_login', 'date_joined')}),
     )
     
     # Garante que 'password' e 'last_login' não sejam editáveis diretamente como texto
-    readonly_fields = ('last_login', 'date_joined', 'my_invitation_code')
+    readonly_fields = ('last_login', 'date_joined', 'my_invitation_code', 'team_size', 'invested_team_size')
+    # Evita carregar todos os usuários num <select> para o campo de referenciador
+    raw_id_fields = ('invited_by',)
+
+    def save_model(self, request, obj, form, change):
+        # Mantém os contadores da equipa do referenciador quando o produto ou o
+        # próprio referenciador são alterados manualmente pelo admin, e regista no
+        # livro-razão (ajuste manual) qualquer alteração dos saldos.
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if not change:
+                return
+            for account in (LedgerEntry.BALANCE, LedgerEntry.BONUS_BALANCE):
+                if account in form.changed_data:
+                    ledger.record(
+                        obj.pk, LedgerEntry.ADJUSTMENT, getattr(obj, account) - form.initial[account],
+                        account=account, description=f"Ajuste no admin por {request.user.get_username()}",
+                    )
+            was_invested = form.initial.get('current_product') is not None
+            if 'invited_by' in form.changed_data:
+                referrals.change_referrer(obj, form.initial.get('invited_by'), was_invested)
+            elif 'current_product' in form.changed_data:
+                if obj.current_product_id and not was_invested:
+                    referrals.mark_invested([obj.pk])
+                elif not obj.current_product_id and was_invested:
+                    referrals.mark_not_invested([obj.pk])
 
 
 # Admin para Produto de Investimento
@@ -71,48 +131,65 @@ class BankAdmin(admin.ModelAdmin):
 
 # Admin para Depósito
 @admin.register(Deposit)
-class DepositAdmin(admin.ModelAdmin):
-    list_display = ('user', 'amount', 'bank', 'status', 'timestamp')
-    list_filter = ('status', 'bank', 'timestamp')
-    search_fields = ('user__username', 'user__phone_number', 'bank__name')
-    readonly_fields = ('timestamp',)
+class DepositAdmin(IndexedUserSearchMixin, LargeTableMixin, admin.ModelAdmin):
+    list_display = ('user', 'amount', 'bank', 'status', 'timestamp', 'proof_preview')
+    list_filter = ('status', 'bank')
+    list_select_related = ('user', 'bank')
+    date_hierarchy = 'timestamp'
+    search_fields = ('user__search_entries__value',)
+    readonly_fields = ('timestamp', 'proof_preview', 'proof_original_size', 'proof_size', 'proof_processed_at')
+    exclude = ('proof_reduced', 'proof_thumbnail')
+
+    @admin.display(description='Comprovativo')
+    def proof_preview(self, obj):
+        # A miniatura (gerada em segundo plano por core/proofs.py) abre a cópia
+        # reduzida; o ficheiro enviado, guardado como prova, tem a sua própria ligação.
+        if not obj.proof_image:
+            return "-"
+        original = format_html('<a href="{}" target="_blank">Original</a>', obj.proof_image.url)
+        if not obj.proof_thumbnail:
+            if obj.proof_processed_at:
+                return original
+            return format_html('{} (em processamento)', original)
+        review = obj.proof_reduced or obj.proof_image
+        return format_html(
+            '<a href="{}" target="_blank"><img src="{}" alt="Comprovativo" style="max-height: 80px;"></a> {}',
+            review.url, obj.proof_thumbnail.url, original,
+        )
 
     # Ações personalizadas
     actions = ['approve_deposits', 'reject_deposits']
 
     @admin.action(description='Marcar depósitos selecionados como Aprovado')
     def approve_deposits(self, request, queryset):
-        with transaction.atomic():
-            for deposit in queryset:
-                if deposit.status == 'Pending':
-                    deposit.status = 'Approved'
-                    deposit.user.balance += deposit.amount
-                    deposit.user.save()
-                    deposit.save()
-        self.message_user(request, "Depósitos aprovados e saldo atualizado com sucesso.")
+        approved, skipped = approvals.approve_deposits(queryset)
+        self.message_user(request, f"{approved} depósitos aprovados e saldo atualizado com sucesso ({skipped} ignorados por não estarem pendentes).")
 
     @admin.action(description='Marcar depósitos selecionados como Rejeitado')
     def reject_deposits(self, request, queryset):
-        with transaction.atomic():
-            queryset.update(status='Rejected')
-        self.message_user(request, "Depósitos rejeitados com sucesso.")
+        rejected, skipped = approvals.reject_deposits(queryset)
+        self.message_user(request, f"{rejected} depósitos rejeitados com sucesso ({skipped} ignorados por não estarem pendentes).")
 
 
 # Admin para Conta Bancária do Usuário
 @admin.register(UserBankAccount)
-class UserBankAccountAdmin(admin.ModelAdmin):
+class UserBankAccountAdmin(IndexedUserSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'bank_name', 'account_name', 'iban', 'is_active', 'created_at')
+    list_select_related = ('user',)
     list_filter = ('is_active', 'bank_name')
-    search_fields = ('user__username', 'user__phone_number', 'bank_name', 'iban')
+    search_fields = ('user__search_entries__value',)
     readonly_fields = ('created_at',)
 
 
 # Admin para Retirada
 @admin.register(Withdrawal)
-class WithdrawalAdmin(admin.ModelAdmin):
+class WithdrawalAdmin(IndexedUserSearchMixin, LargeTableMixin, admin.ModelAdmin):
     list_display = ('user', 'amount', 'amount_received', 'status', 'user_bank_account', 'timestamp')
-    list_filter = ('status', 'timestamp')
-    search_fields = ('user__username', 'user__phone_number', 'user_bank_account__iban')
+    list_filter = ('status',)
+    # UserBankAccount.__str__ mostra o nome do seu usuário
+    list_select_related = ('user', 'user_bank_account__user')
+    date_hierarchy = 'timestamp'
+    search_fields = ('user__search_entries__value',)
     readonly_fields = ('timestamp', 'approved_at')
 
     # Ações personalizadas
@@ -120,32 +197,23 @@ class WithdrawalAdmin(admin.ModelAdmin):
 
     @admin.action(description='Marcar retiradas selecionadas como Aprovado')
     def approve_withdrawals(self, request, queryset):
-        with transaction.atomic():
-            for withdrawal in queryset:
-                if withdrawal.status == 'Pending':
-                    withdrawal.status = 'Approved'
-                    withdrawal.approved_at = timezone.now()
-                    withdrawal.save()
-        self.message_user(request, "Retiradas aprovadas com sucesso.")
+        approved, skipped = approvals.approve_withdrawals(queryset)
+        self.message_user(request, f"{approved} retiradas aprovadas com sucesso ({skipped} ignoradas por não estarem pendentes).")
 
     @admin.action(description='Marcar retiradas selecionadas como Rejeitado')
     def reject_withdrawals(self, request, queryset):
-        with transaction.atomic():
-            for withdrawal in queryset:
-                if withdrawal.status == 'Pending':
-                    withdrawal.status = 'Rejected'
-                    withdrawal.user.balance += withdrawal.amount
-                    withdrawal.user.save()
-                    withdrawal.save()
-        self.message_user(request, "Retiradas rejeitadas e saldos reembolsados com sucesso.")
+        rejected, skipped = approvals.reject_withdrawals(queryset)
+        self.message_user(request, f"{rejected} retiradas rejeitadas e saldos reembolsados com sucesso ({skipped} ignoradas por não estarem pendentes).")
 
 
 # Admin para Tarefa
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(IndexedUserSearchMixin, LargeTableMixin, admin.ModelAdmin):
     list_display = ('user', 'product', 'is_completed', 'creation_date', 'completion_date', 'last_income_calculation_date')
     list_filter = ('is_completed', 'product')
-    search_fields = ('user__username', 'user__phone_number', 'product__level_name')
+    list_select_related = ('user', 'product')
+    date_hierarchy = 'creation_date'
+    search_fields = ('user__search_entries__value',)
     readonly_fields = ('creation_date', 'completion_date', 'last_income_calculation_date')
     actions = ['mark_as_completed']
 
@@ -179,9 +247,67 @@ class LuckyWheelPrizeAdmin(admin.ModelAdmin):
 
 
 @admin.register(LuckyWheelSpin)
-class LuckyWheelSpinAdmin(admin.ModelAdmin):
+class LuckyWheelSpinAdmin(IndexedUserSearchMixin, LargeTableMixin, admin.ModelAdmin):
     list_display = ('user', 'prize_won', 'spin_time', 'is_paid_spin')
-    list_filter = ('is_paid_spin', 'spin_time')
-    search_fields = ('user__username', 'user__phone_number', 'prize_won__value', 'prize_won__name')
+    list_filter = ('is_paid_spin', 'prize_won')
+    list_select_related = ('user', 'prize_won')
+    date_hierarchy = 'spin_time'
+    search_fields = ('user__search_entries__value',)
     readonly_fields = ('spin_time',)
-    
\ No newline at end of file
+    
+
+# --- Admin para o Livro-Razão (apenas leitura) ---
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(IndexedUserSearchMixin, LargeTableMixin, admin.ModelAdmin):
+    list_display = ('user', 'entry_type', 'account', 'amount', 'description', 'created')
+    list_filter = ('entry_type', 'account')
+    list_select_related = ('user',)
+    date_hierarchy = 'created'
+    search_fields = ('user__search_entries__value',)
+    readonly_fields = ('user', 'entry_type', 'account', 'amount', 'description', 'created')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(UserLedgerTotals)
+class UserLedgerTotalsAdmin(IndexedUserSearchMixin, LargeTableMixin, admin.ModelAdmin):
+    list_display = ('user', 'deposit', 'withdrawal', 'withdrawal_refund', 'product_purchase', 'task_income', 'referral_bonus', 'lucky_wheel', 'adjustment', 'opening_balance', 'updated_at')
+    list_select_related = ('user',)
+    search_fields = ('user__search_entries__value',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+# --- Admin para a fila de tarefas em segundo plano ---
+
+@admin.register(Job)
+class JobAdmin(LargeTableMixin, admin.ModelAdmin):
+    list_display = ('name', 'queue', 'status', 'attempts', 'max_attempts', 'run_after', 'duration_ms', 'locked_by', 'created')
+    list_filter = ('status', 'queue', 'name')
+    readonly_fields = [field.name for field in Job._meta.fields]
+    actions = ['requeue_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Voltar a pôr as tarefas falhadas na fila')
+    def requeue_jobs(self, request, queryset):
+        requeued = queryset.filter(status=Job.FAILED).update(
+            status=Job.QUEUED, attempts=0, run_after=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f"{requeued} tarefas voltaram à fila.")
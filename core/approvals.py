@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/approvals.py
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import balance
+from .models import Deposit, LedgerEntry, Withdrawal
+
+# Quantidade de registos tratados por transação nas aprovações em massa.
+DEFAULT_CHUNK_SIZE = 1000
+# Vezes que um lote é relido se mudar entre a leitura e o UPDATE.
+SETTLE_ATTEMPTS = 3
+
+
+class ConcurrentSettlement(Exception):
+    """
+    Um lote mudou entre a leitura e o UPDATE em todas as tentativas.
+    """
+
+
+class _LotChanged(Exception):
+    pass
+
+
+def _chunked_ids(queryset, chunk_size):
+    """
+    Percorre os ids do queryset por ordem de chave primária, em lotes.
+    """
+    last_id = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return
+        last_id = ids[-1]
+        yield ids
+
+
+def _lock_pending(model, ids):
+    """
+    (id, usuário, valor) das linhas ainda pendentes do lote, bloqueadas até ao fim da transação.
+    """
+    return list(
+        model.objects.select_for_update()
+        .filter(pk__in=ids, status='Pending')
+        .values_list('pk', 'user_id', 'amount')
+    )
+
+
+def _settle_pending(model, ids, status, entry_type, description):
+    """
+    Muda as linhas pendentes do lote para `status` e credita os valores, somados
+    por usuário, num único UPDATE. Só credita se o UPDATE condicional alterou
+    exatamente as linhas lidas: numa base sem bloqueio de linhas real, outra
+    sessão pode ter mudado alguma entre a leitura e o UPDATE; nesse caso a
+    transação do lote é desfeita e o lote relido. Devolve quantas mudaram.
+    """
+    for _ in range(SETTLE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                rows = _lock_pending(model, ids)
+                if not rows:
+                    return 0
+                pending_ids = [pk for pk, _, _ in rows]
+                updated = model.objects.filter(pk__in=pending_ids, status='Pending').update(status=status)
+                if updated != len(pending_ids):
+                    raise _LotChanged
+                balance.credit_many(
+                    entry_type,
+                    [(user_id, amount, description.format(pk=pk)) for pk, user_id, amount in rows],
+                )
+                return updated
+        except _LotChanged:
+            continue
+    raise ConcurrentSettlement(f"O lote de {model._meta.verbose_name_plural} mudou a cada tentativa.")
+
+
+def approve_deposits(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Aprova em massa os depósitos pendentes do queryset.
+    Por lote: bloqueia as linhas pendentes, muda o estado com um único UPDATE
+    condicional e credita os saldos somados por usuário com outro UPDATE.
+    Devolve (aprovados, ignorados); os ignorados são os que já não estavam pendentes.
+    """
+    approved = skipped = 0
+    for ids in _chunked_ids(queryset, chunk_size):
+        settled = _settle_pending(Deposit, ids, 'Approved', LedgerEntry.DEPOSIT, "Depósito #{pk}")
+        approved += settled
+        skipped += len(ids) - settled
+    return approved, skipped
+
+
+def reject_deposits(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Rejeita os depósitos ainda pendentes; os já aprovados não são alterados.
+    Devolve (rejeitados, ignorados).
+    """
+    rejected = skipped = 0
+    for ids in _chunked_ids(queryset, chunk_size):
+        with transaction.atomic():
+            updated = Deposit.objects.filter(pk__in=ids, status='Pending').update(status='Rejected')
+        rejected += updated
+        skipped += len(ids) - updated
+    return rejected, skipped
+
+
+def approve_withdrawals(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Aprova em massa as retiradas pendentes com um UPDATE condicional por lote
+    (o saldo já foi debitado no pedido). Devolve (aprovadas, ignoradas).
+    """
+    approved = skipped = 0
+    now = timezone.now()
+    for ids in _chunked_ids(queryset, chunk_size):
+        with transaction.atomic():
+            updated = Withdrawal.objects.filter(pk__in=ids, status='Pending').update(
+                status='Approved', approved_at=now
+            )
+        approved += updated
+        skipped += len(ids) - updated
+    return approved, skipped
+
+
+def reject_withdrawals(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Rejeita em massa as retiradas pendentes e reembolsa os valores, somados por
+    usuário, num único UPDATE por lote. Só são reembolsadas as retiradas que o
+    UPDATE condicional mudou de facto para rejeitadas, por isso duas sessões do
+    admin a rejeitar a mesma seleção nunca reembolsam a mesma retirada duas vezes.
+    Devolve (rejeitadas, ignoradas).
+    """
+    rejected = skipped = 0
+    for ids in _chunked_ids(queryset, chunk_size):
+        settled = _settle_pending(Withdrawal, ids, 'Rejected', LedgerEntry.WITHDRAWAL_REFUND, "Retirada #{pk}")
+        rejected += settled
+        skipped += len(ids) - settled
+    return rejected, skipped
@@ -5,7 +5,12 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
 
-    # Removi o método ready() e a importação de signals.
-    # Os seus signals já são carregados automaticamente porque estão em models.py,
-    # que é importado pelo Django quando a aplicação é iniciada.
+    # Os signals dos modelos estão em models.py, importado automaticamente pelo Django.
+    def ready(self):
+        # Regista a invalidação das caches de dados de referência (signals de
+        # Product, LuckyWheelPrize, Bank e SupportInfo), a manutenção do índice
+        # de pesquisa do admin (core/search.py) e dos contadores da equipa
+        # (core/referrals.py) e a contagem de consultas por pedido em cada nova
+        # ligação (core/metrics.py).
+        from . import catalog, lucky_wheel, metrics, reference_data, referrals, search  # noqa: F401
     
\ No newline at end of file
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/async_views.py
+
+# Versões assíncronas das páginas só de leitura, servidas com SERVER_MODE=asgi
+# (ver core/urls.py). Tudo o que o template usa é lido aqui com o API
+# assíncrono do ORM e da cache; a renderização em si não faz nenhuma consulta,
+# porque uma consulta síncrona dentro do event loop levanta SynchronousOnlyOperation.
+
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render
+
+from . import catalog, reference_data
+from .models import Task
+from .views import tasks_context
+
+
+async def _user(request):
+    # O login_required já leu o usuário com request.auser() (sem nova consulta
+    # aqui). request.user é um objeto preguiçoso à parte, que o voltaria a ler
+    # de forma síncrona quando o template ou o context processor `auth` o usassem.
+    user = await request.auser()
+    request.user = user
+    return user
+
+
+@login_required
+async def home_view(request):
+    """
+    Página inicial: o usuário, o seu produto ativo e o número de referidos.
+    """
+    user = await _user(request)
+    if user.current_product_id:
+        user.current_product = await catalog.aget_product(user.current_product_id)
+    context = {
+        'user': user,
+        'referral_count': user.team_size,
+    }
+    return render(request, 'core/home.html', context)
+
+
+@login_required
+async def support_view(request):
+    """
+    Página de suporte.
+    """
+    await _user(request)
+    # Resolvido aqui: o `support_info` do context processor seria lido de forma síncrona.
+    version, support_info = await reference_data.asupport_info_with_version()
+    context = {'support_info': support_info, 'support_version': version}
+    return render(request, 'core/support.html', context)
+
+
+@login_required
+async def products_view(request):
+    """
+    Lista de produtos (níveis de investimento).
+    """
+    await _user(request)
+    # Sem o SelectProductForm da versão síncrona: o template não o usa e o
+    # formulário lê o catálogo de forma síncrona.
+    context = {'products': await catalog.aactive_products()}
+    return render(request, 'core/products.html', context)
+
+
+@login_required
+async def tasks_view(request):
+    """
+    Página de tarefas (investimento ativo).
+    """
+    user = await _user(request)
+    active_task = await Task.objects.filter(user=user, is_completed=False).afirst()
+    if active_task:
+        await catalog.aattach_products([active_task])
+    return render(request, 'core/tasks.html', tasks_context(active_task))
+
+
+@login_required
+async def investment_levels_view(request):
+    """
+    Níveis de investimento com o saldo e o produto atual do usuário.
+    """
+    user = await _user(request)
+    version, products = await catalog.aactive_products_with_version()
+    context = {
+        'investment_levels': products,
+        'catalog_version': version,
+        'user_balance': user.balance,
+        'current_product_id': user.current_product_id,
+    }
+    return render(request, 'core/investment_levels.html', context)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/balance.py
+
+from django.db import transaction
+from django.db.models import F
+
+from . import ledger
+from .models import CustomUser, LedgerEntry
+
+# Colunas de acumulado que acompanham certos créditos
+# (ex: o bónus de convite também soma em `referral_income`).
+TALLY_FIELDS = {
+    LedgerEntry.REFERRAL_BONUS: 'referral_income',
+}
+
+
+class InsufficientBalance(Exception):
+    """
+    O saldo do usuário não cobre o débito pedido.
+    """
+
+
+def credit(user_id, amount, entry_type, account=LedgerEntry.BALANCE, description=''):
+    """
+    Soma `amount` ao saldo do usuário com um único UPDATE atómico
+    (`SET balance = balance + x`) e regista o movimento no livro-razão.
+    Só as colunas de saldo são gravadas.
+    """
+    with transaction.atomic():
+        updated = CustomUser.objects.filter(pk=user_id).update(**_increment(account, entry_type, amount))
+        if not updated:
+            raise CustomUser.DoesNotExist(f"Usuário {user_id} não existe.")
+        ledger.record(user_id, entry_type, amount, account=account, description=description)
+
+
+def debit(user_id, amount, entry_type, account=LedgerEntry.BALANCE, description=''):
+    """
+    Subtrai `amount` do saldo apenas se houver saldo suficiente, numa única
+    instrução `UPDATE ... SET balance = balance - x WHERE balance >= x`.
+    Levanta InsufficientBalance se a condição falhar; nesse caso nada é gravado.
+    """
+    with transaction.atomic():
+        updated = CustomUser.objects.filter(pk=user_id, **{f'{account}__gte': amount}).update(
+            **{account: F(account) - amount}
+        )
+        if not updated:
+            raise InsufficientBalance("Saldo insuficiente.")
+        ledger.record(user_id, entry_type, -amount, account=account, description=description)
+
+
+def credit_many(entry_type, entries, account=LedgerEntry.BALANCE):
+    """
+    Versão em massa de `credit`: `entries` é uma lista de (user_id, valor, descrição).
+    Os valores são somados por usuário e aplicados num único UPDATE
+    (`SET balance = balance + CASE ... END`), seguido do registo em massa no livro-razão.
+    """
+    if not entries:
+        return
+    sums = ledger.sum_by_user(entries)
+
+    with transaction.atomic():
+        CustomUser.objects.filter(pk__in=list(sums)).update(
+            **_increment(account, entry_type, ledger.increment_by_user(sums))
+        )
+        ledger.record_many(entry_type, entries, account=account)
+
+
+def credit_fields(amount, entry_type, account=LedgerEntry.BALANCE):
+    """
+    Os campos do UPDATE de um crédito, para juntar a outras colunas numa
+    única instrução (ex: o giro da roda da sorte). Quem usa deve registar o
+    movimento com `ledger.record` na mesma transação.
+    """
+    return _increment(account, entry_type, amount)
+
+
+def _increment(account, entry_type, amount):
+    fields = {account: F(account) + amount}
+    tally_field = TALLY_FIELDS.get(entry_type)
+    if tally_field:
+        fields[tally_field] = F(tally_field) + amount
+    return fields
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/catalog.py
+
+from .models import Product
+from .versioned_cache import VersionedData
+
+
+def _index(products):
+    return tuple(products), {product.pk: product for product in products}
+
+
+# Catálogo de produtos em cache (ver core/versioned_cache.py): uma edição no
+# admin é vista pelos outros processos no máximo REFERENCE_DATA_RECHECK_SECONDS depois.
+_catalog = VersionedData(
+    'catalog',
+    load=lambda: list(Product.objects.all().order_by('order', 'pk')),
+    build=_index,
+).watch(Product)
+
+
+def _active(index):
+    products, _ = index
+    return [product for product in products if product.is_active]
+
+
+def _lookup(index, pk):
+    _, by_id = index
+    try:
+        product = by_id.get(int(pk))
+    except (TypeError, ValueError):
+        raise Product.DoesNotExist(f"Produto {pk!r} não existe.")
+    if product is None:
+        raise Product.DoesNotExist(f"Produto {pk} não existe.")
+    return product
+
+
+def _attach(index, objects):
+    _, by_id = index
+    for obj in objects:
+        product = by_id.get(obj.product_id)
+        if product is not None:
+            obj.product = product
+    return objects
+
+
+def active_products():
+    """
+    Produtos ativos por ordem de exibição, servidos da cópia em memória do
+    processo. A versão do catálogo é confirmada na cache partilhada no máximo a
+    cada REFERENCE_DATA_RECHECK_SECONDS (com a DatabaseCache, uma consulta).
+    """
+    return _active(_catalog.get())
+
+
+def active_products_with_version():
+    """
+    (versão do catálogo, active_products()): a versão é a chave das caches de
+    fragmentos de template com os produtos.
+    """
+    version, index = _catalog.get_with_version()
+    return version, _active(index)
+
+
+def get_product(pk):
+    """
+    Um produto pelo id (ativo ou não, como Product.objects.get).
+    Levanta Product.DoesNotExist se não existir.
+    """
+    return _lookup(_catalog.get(), pk)
+
+
+def products_for_purchase(pk, current_pk=None):
+    """
+    (produto a comprar, produto atual) lidos da base de dados numa consulta, e não
+    da cópia em memória: para os caminhos que cobram dinheiro, que devem usar o
+    preço, a ordem e o estado atuais mesmo que outro processo os tenha acabado de
+    mudar. Chamar dentro da transação do débito. O produto a comprar é None se não
+    existir ou estiver desativado; o atual conta mesmo desativado.
+    """
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None, None
+    products = Product.objects.in_bulk({pk, current_pk} - {None})
+    selected = products.get(pk)
+    if selected is not None and not selected.is_active:
+        selected = None
+    return selected, products.get(current_pk)
+
+
+def attach_products(objects):
+    """
+    Preenche `obj.product` a partir do catálogo (ex: tarefas do histórico),
+    em vez de uma consulta por objeto.
+    """
+    return _attach(_catalog.get(), objects)
+
+
+# Versões para as views assíncronas (core/async_views.py).
+
+async def aactive_products():
+    return _active(await _catalog.aget())
+
+
+async def aactive_products_with_version():
+    version, index = await _catalog.aget_with_version()
+    return version, _active(index)
+
+
+async def aget_product(pk):
+    return _lookup(await _catalog.aget(), pk)
+
+
+async def aattach_products(objects):
+    return _attach(await _catalog.aget(), objects)
+
+
+def invalidate():
+    _catalog.invalidate()
@@ -4,6 +4,7 @@ from django import forms
 from django.contrib.auth.forms import AuthenticationForm, PasswordChangeForm
 from django.core.validators import RegexValidator
 from django.forms import PasswordInput
+from . import catalog, reference_data
 # Importa todos os modelos necessários, incluindo UserProfile
 from .models import CustomUser, Bank, Deposit, UserBankAccount, Product, Withdrawal, UserProfile
 import re # Usado para normalizar o número de telefone
@@ -65,10 +66,12 @@ class CustomUserCreationForm(forms.ModelForm):
         invited_by_code = self.cleaned_data.get('invited_by_code')
         if invited_by_code:
             try:
-                # Verifica se o código de convite existe
-                if not CustomUser.objects.filter(my_invitation_code=invited_by_code).exists():
+                # Verifica se o código de convite existe e liga o novo usuário ao referenciador
+                referrer_id = CustomUser.objects.filter(my_invitation_code=invited_by_code).values_list('pk', flat=True).first()
+                if referrer_id is None:
                     raise forms.ValidationError("Código de convite inválido ou inexistente.")
                 user.invited_by_code = invited_by_code
+                user.invited_by_id = referrer_id
             except forms.ValidationError as e:
                 self.add_error('invited_by_code', e)
                 if commit:
@@ -167,6 +170,10 @@ class DepositForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.fields['amount'].widget.attrs.update({'class': 'form-control'})
         self.fields['proof_image'].widget.attrs.update({'class': 'form-control-file'})
+        # As opções vêm da cache de dados de referência; a validação continua a usar o queryset.
+        self.fields['bank'].choices = [('', self.fields['bank'].empty_label)] + [
+            (bank.pk, str(bank)) for bank in reference_data.active_banks()
+        ]
 
 
 # Formulário para Adicionar Conta Bancária do Usuário (contas adicionais para retirada)
@@ -236,3 +243,7 @@ class SelectProductForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['product'].widget.attrs.update({'class': 'form-control'})
+        # As opções vêm do catálogo em cache; a validação continua a usar o queryset.
+        self.fields['product'].choices = [('', self.fields['product'].empty_label)] + [
+            (product.pk, str(product)) for product in catalog.active_products()
+        ]
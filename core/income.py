@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/income.py
+
+import datetime
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import balance, referrals
+from .models import CustomUser, LedgerEntry, Product, Task
+
+# Quantidade de tarefas processadas por transação.
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class AccrualResult:
+    """
+    Resultado de uma execução do motor de renda diária.
+    """
+    def __init__(self, day):
+        self.day = day
+        self.credited = 0
+        self.completed = 0
+        self.skipped = 0
+        self.chunks = 0
+        self.elapsed = 0.0
+
+    @property
+    def processed(self):
+        return self.credited + self.completed + self.skipped
+
+    @property
+    def tasks_per_second(self):
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def eligible_tasks(day):
+    """
+    Tarefas abertas que ainda não receberam a renda do dia `day`.
+    Ao fim de semana só entram as tarefas que nunca foram calculadas,
+    tal como acontecia no cálculo antigo feito na página de renda.
+    """
+    pending = Q(last_income_calculation_date__isnull=True)
+    if day.weekday() < 5:  # 5 é sábado, 6 é domingo
+        pending |= Q(last_income_calculation_date__lt=day)
+    return Task.objects.filter(pending, is_completed=False)
+
+
+def accrue_daily_income(day=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Credita a renda diária de todas as tarefas elegíveis em lotes.
+    Cada lote corre numa transação própria e usa apenas UPDATEs em massa:
+    um para os saldos (com F-expressions) e um para marcar as tarefas.
+    Executar duas vezes no mesmo dia não credita nada de novo, porque a
+    elegibilidade é verificada de novo dentro do lote.
+    """
+    day = day or timezone.localdate()
+    result = AccrualResult(day)
+    products = {p.pk: p for p in Product.objects.all()}
+    started = time.perf_counter()
+
+    last_id = 0
+    while True:
+        ids = list(
+            eligible_tasks(day).filter(id__gt=last_id)
+            .order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+        _accrue_chunk(ids, day, products, result)
+        result.chunks += 1
+
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def _accrue_chunk(ids, day, products, result):
+    now = timezone.now()
+    with transaction.atomic():
+        # Bloqueia as tarefas do lote e volta a aplicar o filtro de elegibilidade,
+        # para que duas execuções simultâneas nunca creditem a mesma tarefa.
+        rows = list(
+            eligible_tasks(day).select_for_update()
+            .filter(id__in=ids).values_list('id', 'user_id', 'product_id')
+        )
+        activation_dates = dict(
+            CustomUser.objects.filter(pk__in={user_id for _, user_id, _ in rows})
+            .values_list('pk', 'level_activation_date')
+        )
+
+        credit_by_user = defaultdict(Decimal)
+        credited_task_ids = []
+        expired_task_ids = []
+        expired_users_by_product = defaultdict(list)
+
+        for task_id, user_id, product_id in rows:
+            product = products.get(product_id)
+            activated_at = activation_dates.get(user_id)
+            if product is None or activated_at is None:
+                result.skipped += 1
+                continue
+
+            end_date = timezone.localdate(activated_at) + datetime.timedelta(days=product.duration_days)
+            if day >= end_date:
+                expired_task_ids.append(task_id)
+                expired_users_by_product[product_id].append(user_id)
+                continue
+
+            credit_by_user[user_id] += product.daily_income
+            credited_task_ids.append(task_id)
+
+        if expired_task_ids:
+            Task.objects.filter(id__in=expired_task_ids).update(is_completed=True, completion_date=now)
+            for product_id, user_ids in expired_users_by_product.items():
+                expired_users = CustomUser.objects.filter(pk__in=user_ids, current_product_id=product_id)
+                cleared_ids = list(expired_users.values_list('pk', flat=True))
+                expired_users.update(current_product=None, level_activation_date=None)
+                referrals.mark_not_invested(cleared_ids)
+
+        if credited_task_ids:
+            Task.objects.filter(id__in=credited_task_ids).update(last_income_calculation_date=day)
+            # Um único UPDATE com F-expression para os saldos de todo o lote.
+            balance.credit_many(
+                LedgerEntry.TASK_INCOME,
+                [(user_id, amount, f"Renda diária de {day}") for user_id, amount in credit_by_user.items()],
+            )
+
+        result.credited += len(credited_task_ids)
+        result.completed += len(expired_task_ids)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/invitation_codes.py
+
+import hashlib
+import hmac
+
+from django.conf import settings
+
+# Mesmo alfabeto e tamanho dos códigos gerados aleatoriamente até agora.
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+CODE_LENGTH = 10
+
+_BASE = len(ALPHABET)
+_HALF = _BASE ** (CODE_LENGTH // 2)  # cada metade da rede de Feistel: 36^5 valores
+DOMAIN = _HALF * _HALF                # 36^10 códigos possíveis
+_ROUNDS = 4
+
+
+def _key():
+    key = getattr(settings, 'INVITATION_CODE_KEY', None) or settings.SECRET_KEY
+    return key.encode()
+
+
+def _round(key, round_number, value):
+    digest = hmac.new(key, f"{round_number}:{value}".encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], 'big') % _HALF
+
+
+def encode(number):
+    """
+    Converte um número (a chave primária do usuário) num código de convite de
+    10 caracteres. É uma permutação com chave (rede de Feistel sobre 36^5 x 36^5),
+    por isso números diferentes dão sempre códigos diferentes, sem consultar a
+    base de dados, e os códigos não revelam a ordem de registo.
+    """
+    if not 0 <= number < DOMAIN:
+        raise ValueError("Número fora do intervalo dos códigos de convite.")
+    key = _key()
+    left, right = divmod(number, _HALF)
+    for round_number in range(_ROUNDS):
+        left, right = right, (left + _round(key, round_number, right)) % _HALF
+    value = left * _HALF + right
+
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, index = divmod(value, _BASE)
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def decode(code):
+    """
+    Operação inversa de `encode`. Devolve None se o código não usar o alfabeto.
+    Códigos antigos (aleatórios) também são "descodificados" para um número
+    qualquer, por isso o resultado não substitui a procura pelo código.
+    """
+    if not code or len(code) != CODE_LENGTH:
+        return None
+    value = 0
+    for char in code:
+        index = ALPHABET.find(char)
+        if index < 0:
+            return None
+        value = value * _BASE + index
+
+    key = _key()
+    left, right = divmod(value, _HALF)
+    for round_number in reversed(range(_ROUNDS)):
+        left, right = (right - _round(key, round_number, left)) % _HALF, left
+    return left * _HALF + right
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/jobs.py
+
+import datetime
+import os
+import random
+import socket
+import time
+import traceback
+from dataclasses import dataclass
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+# Espera antes da nova tentativa: BACKOFF_BASE * 2^(tentativas - 1), até BACKOFF_MAX, com ±10%.
+BACKOFF_BASE = datetime.timedelta(seconds=10)
+BACKOFF_MAX = datetime.timedelta(hours=1)
+# O worker renova o `locked_at` das tarefas em curso a cada HEARTBEAT_INTERVAL; uma
+# tarefa "em execução" sem renovação há mais de STALE_AFTER pertence a um worker que morreu.
+HEARTBEAT_INTERVAL = datetime.timedelta(minutes=1)
+STALE_AFTER = datetime.timedelta(minutes=15)
+
+
+def job(queue='default', max_attempts=5):
+    """
+    Marca uma função como tarefa em segundo plano. Os argumentos têm de ser
+    nomeados e serializáveis em JSON (ids, não instâncias de modelos).
+
+        @jobs.job(queue='media')
+        def process_proof_job(deposit_id): ...
+
+        jobs.enqueue(process_proof_job, deposit_id=deposit.pk)
+    """
+    def decorator(func):
+        func.job_options = {'queue': queue, 'max_attempts': max_attempts}
+        return func
+    return decorator
+
+
+def enqueue(func, delay=None, **kwargs):
+    """
+    Insere a tarefa na fila. Dentro de um `transaction.atomic()` a tarefa só
+    fica visível para o worker se a transação fizer commit.
+    """
+    options = getattr(func, 'job_options', None)
+    if options is None:
+        raise ValueError(f"{func!r} não está marcada com @jobs.job.")
+    return Job.objects.create(
+        name=f'{func.__module__}.{func.__qualname__}',
+        payload=kwargs,
+        run_after=timezone.now() + (delay or datetime.timedelta()),
+        **options,
+    )
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+@dataclass(frozen=True)
+class Lease:
+    """
+    Uma reserva de tarefa: o worker e a tentativa. Só quem tem a reserva atual
+    renova ou grava o resultado; se a tarefa voltou à fila e foi reservada de
+    novo, a execução antiga já não lhe toca.
+    """
+    job_id: int
+    worker: str
+    attempt: int
+
+    def owned(self):
+        return Job.objects.filter(pk=self.job_id, status=Job.RUNNING, locked_by=self.worker, attempts=self.attempt)
+
+
+def claim(queues, limit, worker):
+    """
+    Reserva até `limit` tarefas prontas das filas indicadas e devolve as reservas (Lease).
+    No Postgres usa `SELECT ... FOR UPDATE SKIP LOCKED`: vários workers
+    reservam em paralelo sem se bloquearem. Sem SKIP LOCKED (SQLite, que só
+    tem um escritor de cada vez) cada id é reservado por um UPDATE condicional.
+    """
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    ready = Job.objects.filter(status=Job.QUEUED, queue__in=queues, run_after__lte=now).order_by('run_after', 'pk')
+    running = {'status': Job.RUNNING, 'locked_by': worker, 'locked_at': now, 'attempts': F('attempts') + 1}
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            rows = list(ready.select_for_update(skip_locked=True).values_list('pk', 'attempts')[:limit])
+            Job.objects.filter(pk__in=[pk for pk, _ in rows]).update(**running)
+        return [Lease(pk, worker, attempts + 1) for pk, attempts in rows]
+
+    claimed = []
+    for pk, attempts in ready.values_list('pk', 'attempts')[:limit]:
+        if Job.objects.filter(pk=pk, status=Job.QUEUED, attempts=attempts).update(**running):
+            claimed.append(Lease(pk, worker, attempts + 1))
+    return claimed
+
+
+def heartbeat(leases):
+    """
+    Renova o `locked_at` das tarefas ainda reservadas por estas reservas, para que
+    uma tarefa lenta de um worker vivo não seja dada como abandonada.
+    """
+    renewed = 0
+    now = timezone.now()
+    for lease in leases:
+        renewed += lease.owned().update(locked_at=now)
+    return renewed
+
+
+def requeue_stale(older_than=STALE_AFTER):
+    """
+    Devolve à fila as tarefas reservadas por workers que deixaram de responder
+    (sem heartbeat há mais de `older_than`).
+    """
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=timezone.now() - older_than).update(
+        status=Job.QUEUED, locked_by='', locked_at=None,
+    )
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+    return delay * random.uniform(0.9, 1.1)
+
+
+@dataclass
+class JobOutcome:
+    job_id: int
+    name: str
+    ok: bool
+    duration_ms: int
+    retry: bool = False
+    # A reserva foi perdida (a tarefa voltou à fila durante a execução): o resultado não foi gravado.
+    lost: bool = False
+
+
+def execute(lease):
+    """
+    Executa uma tarefa reservada e grava o resultado, se a reserva ainda for
+    deste worker. Em caso de erro volta à fila com espera exponencial, ou fica
+    como falhada ao atingir o máximo de tentativas. Corre numa thread ou num
+    processo do worker.
+    """
+    close_old_connections()
+    try:
+        job = Job.objects.get(pk=lease.job_id)
+        started = time.perf_counter()
+        try:
+            func = import_string(job.name)
+            func(**job.payload)
+        except Exception:
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            retry = lease.attempt < job.max_attempts
+            saved = lease.owned().update(
+                status=Job.QUEUED if retry else Job.FAILED,
+                run_after=timezone.now() + backoff(lease.attempt) if retry else job.run_after,
+                last_error=traceback.format_exc()[-4000:],
+                duration_ms=duration_ms,
+                finished_at=None if retry else timezone.now(),
+                locked_by='', locked_at=None,
+            )
+            return JobOutcome(lease.job_id, job.name, False, duration_ms, retry, lost=not saved)
+
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        saved = lease.owned().update(
+            status=Job.DONE, duration_ms=duration_ms, finished_at=timezone.now(),
+            last_error='', locked_by='', locked_at=None,
+        )
+        return JobOutcome(lease.job_id, job.name, True, duration_ms, lost=not saved)
+    finally:
+        close_old_connections()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/ledger.py
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .models import LedgerEntry, UserLedgerTotals
+
+
+def record(user_id, entry_type, amount, account=LedgerEntry.BALANCE, description=''):
+    """
+    Insere um movimento no livro-razão e atualiza os totais do usuário.
+    Deve ser chamado dentro da mesma transação que altera o saldo.
+    """
+    with transaction.atomic():
+        entry = LedgerEntry.objects.create(
+            user_id=user_id,
+            entry_type=entry_type,
+            account=account,
+            amount=amount,
+            description=description,
+        )
+        _add_to_totals(entry_type, {user_id: amount})
+    return entry
+
+
+def record_many(entry_type, entries, account=LedgerEntry.BALANCE):
+    """
+    Versão em massa de `record` para os processos em lote (renda diária,
+    aprovações no admin). `entries` é uma lista de (user_id, valor, descrição).
+    Usa um bulk_create para os movimentos e um único UPDATE para os totais.
+    """
+    if not entries:
+        return
+    now = timezone.now()
+
+    with transaction.atomic():
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(
+                user_id=user_id,
+                entry_type=entry_type,
+                account=account,
+                amount=amount,
+                description=description,
+                created=now,
+            )
+            for user_id, amount, description in entries
+        ])
+        _add_to_totals(entry_type, sum_by_user(entries))
+
+
+def sum_by_user(entries):
+    """
+    Soma os valores de (user_id, valor, descrição) por usuário: {user_id: total}.
+    """
+    sums = defaultdict(Decimal)
+    for user_id, amount, _ in entries:
+        sums[user_id] += amount
+    return sums
+
+
+def history(user, entry_types=None, since=None, limit=20):
+    """
+    Movimentos mais recentes do usuário, lidos pelo índice (user, created).
+    """
+    entries = LedgerEntry.objects.filter(user=user)
+    if entry_types:
+        entries = entries.filter(entry_type__in=entry_types)
+    if since:
+        entries = entries.filter(created__gte=since)
+    return entries.order_by('-created')[:limit]
+
+
+def totals_for(user):
+    """
+    Totais acumulados do usuário (sem gravar nada se ainda não existirem).
+    """
+    return UserLedgerTotals.objects.filter(user=user).first() or UserLedgerTotals(user=user)
+
+
+def increment_by_user(sums, column='id'):
+    """
+    Expressão `CASE <coluna> WHEN <id> THEN <valor> ... END` que devolve o valor
+    a somar a cada usuário, para aplicar totais diferentes num único UPDATE.
+    É montada em SQL direto porque um Case/When do ORM com milhares de ramos
+    custa mais a compilar do que a própria instrução custa a executar.
+    """
+    params = []
+    for user_id, amount in sums.items():
+        params.extend((user_id, amount))
+    sql = f"CASE {column} {' '.join(['WHEN %s THEN %s'] * len(sums))} ELSE 0 END"
+    return RawSQL(sql, params, output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _add_to_totals(entry_type, sums):
+    UserLedgerTotals.objects.bulk_create(
+        [UserLedgerTotals(user_id=user_id) for user_id in sums],
+        ignore_conflicts=True,
+    )
+    UserLedgerTotals.objects.filter(user_id__in=list(sums)).update(
+        **{entry_type: F(entry_type) + increment_by_user(sums, column='user_id'), 'updated_at': timezone.now()}
+    )
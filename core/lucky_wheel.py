@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/lucky_wheel.py
+
+import random
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from . import balance, ledger
+from .models import CustomUser, LedgerEntry, LuckyWheelPrize, LuckyWheelSpin
+from .versioned_cache import VersionedData
+
+
+class AliasTable:
+    """
+    Tabela de Walker (método alias) para sortear itens com pesos inteiros em
+    tempo constante: escolhe uma coluna ao acaso e, com um segundo inteiro,
+    o item da coluna ou o seu alias. Só usa inteiros, por isso as
+    probabilidades são exatamente peso / soma dos pesos.
+    Itens com peso <= 0 nunca saem.
+    """
+
+    def __init__(self, items, weights):
+        pairs = [(item, int(weight)) for item, weight in zip(items, weights) if weight > 0]
+        self.items = [item for item, _ in pairs]
+        self.total = sum(weight for _, weight in pairs)
+        count = len(pairs)
+        # Cada coluna vale `total` unidades; o item i ocupa peso_i * n unidades no total.
+        self._threshold = [weight * count for _, weight in pairs]
+        self._alias = list(range(count))
+
+        small = [i for i, value in enumerate(self._threshold) if value < self.total]
+        large = [i for i, value in enumerate(self._threshold) if value >= self.total]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self._alias[less] = more
+            self._threshold[more] -= self.total - self._threshold[less]
+            (small if self._threshold[more] < self.total else large).append(more)
+        # O que sobra enche a coluna inteira.
+        for i in small + large:
+            self._threshold[i] = self.total
+
+    def __len__(self):
+        return len(self.items)
+
+    def sample(self, rng=random):
+        if not self.items:
+            return None
+        column = rng.randrange(len(self.items))
+        if rng.randrange(self.total) < self._threshold[column]:
+            return self.items[column]
+        return self.items[self._alias[column]]
+
+
+class _Wheel:
+    """
+    Prémios ativos com a respetiva tabela alias e a quota diária de giros.
+    """
+
+    def __init__(self, prizes):
+        self.prizes = tuple(prizes)
+        self.table = AliasTable(prizes, [prize.weight for prize in prizes])
+        self.spins_allowed = 0
+        if prizes:
+            # Ordenação do modelo (-value): o primeiro prémio define os giros diários.
+            allowed = prizes[0].daily_spins_allowed
+            self.spins_allowed = allowed if allowed is not None else 1
+
+
+# Cada processo reconstrói a roda só depois de uma alteração em LuckyWheelPrize
+# (ver core/versioned_cache.py).
+_wheel = VersionedData(
+    'lucky_wheel',
+    load=lambda: list(LuckyWheelPrize.objects.filter(is_active=True)),
+    build=_Wheel,
+).watch(LuckyWheelPrize)
+
+
+def prize_table():
+    """
+    Tabela alias dos prémios ativos, reconstruída só depois de uma
+    alteração em LuckyWheelPrize (a versão é confirmada no máximo a cada
+    REFERENCE_DATA_RECHECK_SECONDS, não em cada giro).
+    """
+    return _wheel.get().table
+
+
+def active_prizes():
+    """
+    Prémios ativos (para mostrar na roda), da mesma cópia em memória.
+    """
+    return list(_wheel.get().prizes)
+
+
+def daily_spins_allowed():
+    """
+    Giros por dia, definidos no primeiro prémio ativo (0 se não houver prémios).
+    """
+    return _wheel.get().spins_allowed
+
+
+def spins_remaining(user, today=None):
+    """
+    Giros que o usuário ainda tem hoje, calculados na leitura: se o último
+    giro foi noutro dia, vale a quota diária inteira. Nada é gravado; a
+    reposição acontece no UPDATE do próprio giro (ver `spin`).
+    """
+    today = today or timezone.localdate()
+    if user.last_spin_date == today:
+        return max(user.daily_spins_remaining, 0)
+    return daily_spins_allowed()
+
+
+def draw_prize(rng=random):
+    """
+    Sorteia um prémio ativo de acordo com os pesos, ou None se não houver
+    prémios com peso positivo.
+    """
+    return prize_table().sample(rng)
+
+
+class NoPrizes(Exception):
+    """
+    Não há prémios ativos com peso positivo.
+    """
+
+
+class NoSpinsLeft(Exception):
+    """
+    O usuário já não tem giros hoje (ou perdeu a corrida para outro pedido).
+    """
+
+
+def spin(user_id, rng=random):
+    """
+    Consome um giro e credita o prémio numa única instrução UPDATE:
+    `daily_spins_remaining` desce 1 (ou passa a quota diária - 1 se o último
+    giro foi noutro dia, a reposição preguiçosa), `last_spin_date` passa a hoje
+    e `balance` soma o prémio, só se ainda houver giros. Segue-se o registo do
+    giro (e do movimento no livro-razão, se houver valor).
+    Dois pedidos simultâneos nunca gastam o mesmo giro: o que não altera
+    nenhuma linha levanta NoSpinsLeft. Devolve o prémio ganho.
+    """
+    prize = draw_prize(rng)
+    if prize is None:
+        raise NoPrizes("Nenhum prémio configurado para a Roda da Sorte.")
+
+    today = timezone.localdate()
+    allowed = daily_spins_allowed()
+    spun_today = Q(last_spin_date=today)
+    available = spun_today & Q(daily_spins_remaining__gt=0)
+    if allowed > 0:
+        available |= Q(last_spin_date__isnull=True) | Q(last_spin_date__lt=today)
+
+    fields = {
+        'daily_spins_remaining': Case(
+            When(spun_today, then=F('daily_spins_remaining') - 1),
+            default=Value(allowed - 1),
+        ),
+        'last_spin_date': today,
+    }
+    if prize.value > 0:
+        fields.update(balance.credit_fields(prize.value, LedgerEntry.LUCKY_WHEEL))
+
+    with transaction.atomic():
+        updated = CustomUser.objects.filter(available, pk=user_id).update(**fields)
+        if not updated:
+            raise NoSpinsLeft("Sem giros disponíveis hoje.")
+        LuckyWheelSpin.objects.create(user_id=user_id, prize_won=prize, is_paid_spin=False)
+        if prize.value > 0:
+            ledger.record(user_id, LedgerEntry.LUCKY_WHEEL, prize.value)
+    return prize
+
+
+def invalidate():
+    _wheel.invalidate()
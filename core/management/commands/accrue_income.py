@@ -0,0 +1,33 @@
+# microsoft_2025_platform/core/management/commands/accrue_income.py
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.income import DEFAULT_CHUNK_SIZE, accrue_daily_income
+
+
+class Command(BaseCommand):
+    help = "Credita a renda diária de todas as tarefas ativas (executar uma vez por dia, ex: via cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Dia a creditar no formato AAAA-MM-DD (padrão: hoje, Africa/Luanda).")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Tarefas por transação.")
+
+    def handle(self, *args, **options):
+        day = None
+        if options['date']:
+            try:
+                day = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError("Data inválida, use o formato AAAA-MM-DD.")
+        if options['chunk_size'] <= 0:
+            raise CommandError("--chunk-size deve ser maior que zero.")
+
+        result = accrue_daily_income(day=day, chunk_size=options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Renda de {result.day}: {result.credited} tarefas creditadas, "
+            f"{result.completed} concluídas, {result.skipped} ignoradas "
+            f"em {result.chunks} lotes ({result.elapsed:.2f}s, {result.tasks_per_second:.0f} tarefas/s)."
+        ))
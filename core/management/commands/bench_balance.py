@@ -0,0 +1,119 @@
+# microsoft_2025_platform/core/management/commands/bench_balance.py
+
+import statistics
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+
+from core import balance
+from core.models import CustomUser, LedgerEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de concorrência do serviço de saldo: N threads creditam e debitam "
+        "o mesmo usuário ao mesmo tempo e o saldo final é comparado com o esperado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--ops', type=int, default=200, help="Operações por thread.")
+        parser.add_argument('--amount', default='10.00')
+        parser.add_argument(
+            '--mode', choices=['service', 'legacy'], default='service',
+            help="'service' usa core.balance; 'legacy' reproduz o antigo user.balance += x; user.save().",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] == ':memory:':
+            raise CommandError("Use uma base de dados em ficheiro ou Postgres; SQLite em memória não é partilhado entre threads.")
+
+        threads, ops = options['threads'], options['ops']
+        amount = Decimal(options['amount'])
+        initial = amount * threads * ops
+        if CustomUser.objects.filter(username='999999999').exists():
+            raise CommandError("O usuário de benchmark 999999999 já existe; remova-o antes de continuar.")
+        user = CustomUser.objects.create_user('999999999', None, balance=initial)
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+
+        def worker(index):
+            local = []
+            barrier.wait()
+            try:
+                for _ in range(ops):
+                    # Metade das threads credita, a outra metade debita o dobro.
+                    started = time.perf_counter()
+                    if index % 2 == 0:
+                        self._credit(options['mode'], user.pk, amount)
+                    else:
+                        self._debit(options['mode'], user.pk, amount * 2)
+                    local.append(time.perf_counter() - started)
+            except OperationalError as exc:
+                with lock:
+                    errors.append(str(exc))
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(local)
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        creditors = (threads + 1) // 2
+        debitors = threads // 2
+        expected = initial + amount * ops * creditors - amount * 2 * ops * debitors
+        user.refresh_from_db(fields=['balance'])
+        done = len(latencies)
+
+        self.stdout.write(f"Modo: {options['mode']} | backend: {connection.vendor} | {threads} threads x {ops} ops")
+        self.stdout.write(f"Operações concluídas: {done} em {elapsed:.2f}s ({done / elapsed:.0f} ops/s)")
+        if latencies:
+            ordered = sorted(latencies)
+            self.stdout.write(
+                "Espera por operação (lock + UPDATE): "
+                f"p50={statistics.median(ordered) * 1000:.2f}ms "
+                f"p95={ordered[int(len(ordered) * 0.95) - 1] * 1000:.2f}ms "
+                f"max={ordered[-1] * 1000:.2f}ms"
+            )
+        if errors:
+            self.stdout.write(self.style.WARNING(f"{len(errors)} threads abortaram: {errors[0]}"))
+
+        if not errors:
+            message = f"Saldo final: {user.balance} | esperado: {expected}"
+            if user.balance == expected:
+                self.stdout.write(self.style.SUCCESS(message + " | nenhuma atualização perdida"))
+            else:
+                self.stdout.write(self.style.ERROR(message + f" | diferença: {user.balance - expected}"))
+
+        # Limpa o usuário de teste (o livro-razão é apagado em cascata).
+        user.delete()
+
+    def _credit(self, mode, user_id, amount):
+        if mode == 'service':
+            balance.credit(user_id, amount, LedgerEntry.DEPOSIT, description="bench_balance")
+            return
+        with transaction.atomic():
+            user = CustomUser.objects.get(pk=user_id)
+            user.balance += amount
+            user.save()
+
+    def _debit(self, mode, user_id, amount):
+        if mode == 'service':
+            balance.debit(user_id, amount, LedgerEntry.WITHDRAWAL, description="bench_balance")
+            return
+        with transaction.atomic():
+            user = CustomUser.objects.get(pk=user_id)
+            user.balance -= amount
+            user.save()
@@ -0,0 +1,77 @@
+# microsoft_2025_platform/core/management/commands/bench_deposits.py
+
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.db.models import Sum
+
+from core import approvals
+from core.models import CustomUser, Deposit, UserLedgerTotals
+
+BENCH_PREFIX = 'bench-dep-'
+
+
+class Command(BaseCommand):
+    help = "Benchmark da aprovação em massa de depósitos pendentes (por omissão 50 mil)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--deposits', type=int, default=50000)
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--chunk-size', type=int, default=approvals.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--seed', type=int, default=2025)
+        parser.add_argument('--keep', action='store_true', help="Não apagar os dados gerados no fim.")
+
+    def handle(self, *args, **options):
+        if CustomUser.objects.filter(username__startswith=BENCH_PREFIX).exists():
+            raise CommandError(f"Já existem usuários '{BENCH_PREFIX}*'; apague-os antes de repetir o benchmark.")
+
+        rng = random.Random(options['seed'])
+        users = CustomUser.objects.bulk_create(
+            [
+                CustomUser(username=f'{BENCH_PREFIX}{i}', phone_number=f'{BENCH_PREFIX}{i}', password='!')
+                for i in range(options['users'])
+            ],
+            batch_size=1000,
+        )
+        user_ids = [user.pk for user in users]
+        Deposit.objects.bulk_create(
+            [
+                Deposit(user_id=rng.choice(user_ids), amount=Decimal(rng.randrange(1000, 100000)), status='Pending')
+                for _ in range(options['deposits'])
+            ],
+            batch_size=1000,
+        )
+        # Alguns depósitos já aprovados no meio da seleção, que devem ser ignorados.
+        already = Deposit.objects.filter(user_id__in=user_ids).order_by('?').values_list('pk', flat=True)[:options['deposits'] // 100]
+        Deposit.objects.filter(pk__in=list(already)).update(status='Approved')
+        expected = Deposit.objects.filter(user_id__in=user_ids, status='Pending').aggregate(s=Sum('amount'))['s'] or Decimal('0')
+
+        queryset = Deposit.objects.filter(user_id__in=user_ids)
+        debug_cursor = connection.force_debug_cursor
+        connection.force_debug_cursor = True
+        reset_queries()
+        started = time.perf_counter()
+        approved, skipped = approvals.approve_deposits(queryset, chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+        queries = len(connection.queries)
+        connection.force_debug_cursor = debug_cursor
+
+        credited = CustomUser.objects.filter(pk__in=user_ids).aggregate(s=Sum('balance'))['s'] or Decimal('0')
+        ledger_total = UserLedgerTotals.objects.filter(user_id__in=user_ids).aggregate(s=Sum('deposit'))['s'] or Decimal('0')
+
+        self.stdout.write(
+            f"{approved} aprovados, {skipped} ignorados em {elapsed:.2f}s "
+            f"({approved / elapsed:.0f} depósitos/s, {queries} consultas, lotes de {options['chunk_size']})"
+        )
+        if credited == expected == ledger_total:
+            self.stdout.write(self.style.SUCCESS(f"Saldos creditados conferem: Kz {credited}"))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"Divergência: esperado Kz {expected}, saldos Kz {credited}, livro-razão Kz {ledger_total}"
+            ))
+
+        if not options['keep']:
+            CustomUser.objects.filter(pk__in=user_ids).delete()
@@ -0,0 +1,79 @@
+# microsoft_2025_platform/core/management/commands/bench_invitation_codes.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+
+from core.models import CustomUser
+
+BENCH_PREFIX = '8'  # números 8XXXXXXXX não passam na validação de telefone, logo não colidem com usuários reais
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara registos/s com o gerador antigo de códigos de convite (aleatório + .exists()), "
+        "com o novo gerador derivado do id e com o modo em massa (bulk_create + assign_invitation_codes)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help="Usuários criados em cada modo.")
+
+    def handle(self, *args, **options):
+        count = options['users']
+        if CustomUser.objects.filter(username__startswith=BENCH_PREFIX).exists():
+            raise CommandError(f"Já existem usuários '{BENCH_PREFIX}*'; apague-os antes de repetir o benchmark.")
+
+        modes = [
+            ('antigo (aleatório + exists)', self._legacy),
+            ('novo (derivado do id)', self._keyed),
+            ('em massa (bulk)', self._bulk),
+        ]
+        debug_cursor = connection.force_debug_cursor
+        connection.force_debug_cursor = True
+        try:
+            for offset, (label, create) in enumerate(modes):
+                usernames = [f'{BENCH_PREFIX}{offset}{i:07d}' for i in range(count)]
+                reset_queries()
+                started = time.perf_counter()
+                create(usernames)
+                elapsed = time.perf_counter() - started
+                queries = len(connection.queries)
+                self.stdout.write(
+                    f"{label:<30} {count / elapsed:8.0f} registos/s  "
+                    f"{queries / count:5.2f} consultas/registo"
+                )
+        finally:
+            connection.force_debug_cursor = debug_cursor
+            reset_queries()
+
+        created = CustomUser.objects.filter(username__startswith=BENCH_PREFIX)
+        codes = created.values_list('my_invitation_code', flat=True)
+        if len(set(codes)) == len(codes) == count * len(modes) and all(codes):
+            self.stdout.write(self.style.SUCCESS("Todos os códigos gerados são únicos."))
+        else:
+            self.stdout.write(self.style.ERROR("Foram encontrados códigos em falta ou repetidos."))
+        created.delete()
+
+    def _legacy(self, usernames):
+        # Reproduz o caminho antigo: código aleatório verificado com .exists() antes do INSERT.
+        for username in usernames:
+            user = CustomUser(
+                username=username, phone_number=username,
+                my_invitation_code=CustomUser.objects.generate_unique_invitation_code(),
+            )
+            user.set_unusable_password()
+            user.save()
+
+    def _keyed(self, usernames):
+        for username in usernames:
+            user = CustomUser(username=username, phone_number=username)
+            user.set_unusable_password()
+            user.save()
+
+    def _bulk(self, usernames):
+        users = CustomUser.objects.bulk_create(
+            [CustomUser(username=username, phone_number=username, password='!') for username in usernames],
+            batch_size=1000,
+        )
+        CustomUser.objects.assign_invitation_codes(users)
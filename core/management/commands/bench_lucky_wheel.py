@@ -0,0 +1,58 @@
+# microsoft_2025_platform/core/management/commands/bench_lucky_wheel.py
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.lucky_wheel import AliasTable
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark do sorteio da Roda da Sorte: tabela alias (core/lucky_wheel.py) "
+        "contra a soma cumulativa com random.uniform usada antes em spin_lucky_wheel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prizes', type=int, default=8, help="Número de prémios sintéticos.")
+        parser.add_argument('--draws', type=int, default=1_000_000, help="Sorteios por método.")
+        parser.add_argument('--seed', type=int, default=2025)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prizes = list(range(options['prizes']))
+        weights = [rng.randint(1, 1000) for _ in prizes]
+        draws = options['draws']
+
+        started = time.perf_counter()
+        table = AliasTable(prizes, weights)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for _ in range(draws):
+            table.sample(rng)
+        alias_rate = draws / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        misses = 0
+        for _ in range(draws):
+            if self._legacy_draw(prizes, weights, rng) is None:
+                misses += 1
+        legacy_rate = draws / (time.perf_counter() - started)
+
+        self.stdout.write(f"Prémios: {len(prizes)}  construção da tabela: {build_ms:.3f} ms")
+        self.stdout.write(f"alias            {alias_rate:12,.0f} sorteios/s")
+        self.stdout.write(f"cumulativo       {legacy_rate:12,.0f} sorteios/s  ({misses} sem prémio)")
+
+    @staticmethod
+    def _legacy_draw(prizes, weights, rng):
+        # Reproduz o algoritmo antigo: soma dos pesos e percurso linear a cada giro.
+        total_weight = sum(weights)
+        rand_num = rng.uniform(0, total_weight)
+        cumulative_weight = 0
+        for prize, weight in zip(prizes, weights):
+            cumulative_weight += weight
+            if rand_num <= cumulative_weight:
+                return prize
+        return None
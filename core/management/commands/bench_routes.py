@@ -0,0 +1,343 @@
+# microsoft_2025_platform/core/management/commands/bench_routes.py
+
+import json
+import math
+import platform
+import time
+import tracemalloc
+from decimal import Decimal
+
+import django
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from core import referrals, synthetic
+from core.models import Bank, CustomUser, Deposit, Product, Task, UserBankAccount, Withdrawal
+
+# Telefones usados pelos registos do benchmark (os usuários sintéticos usam o prefixo 90).
+REGISTER_PREFIX = '93'
+
+
+def percentile(values, fraction):
+    # Percentil pelo método do posto mais próximo (valores já ordenados).
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de ponta a ponta: cria uma base de dados de teste isolada com um "
+        "conjunto de dados sintético reprodutível, pede todas as rotas de core/urls.py, "
+        "as listas do admin e as ações em massa com o cliente de testes do Django e "
+        "grava p50/p95, número de consultas e pico de memória em JSON. "
+        "Com --compare compara dois relatórios e falha se houver regressões."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help="Usuários sintéticos.")
+        parser.add_argument('--seed', type=int, default=2025, help="Semente do gerador (o mesmo valor gera os mesmos dados).")
+        parser.add_argument('--iterations', type=int, default=20, help="Pedidos medidos por rota (mais um de aquecimento).")
+        parser.add_argument('--batch', type=int, default=100, help="Linhas pendentes em cada ação em massa do admin.")
+        parser.add_argument('--only', default='', help="Só as rotas cujo nome contém este texto.")
+        parser.add_argument('--output', help="Ficheiro JSON do relatório (por omissão só imprime a tabela).")
+        parser.add_argument(
+            '--compare', nargs=2, metavar=('BASE', 'NEW'),
+            help="Não corre o benchmark: compara dois relatórios JSON e falha se houver regressões.",
+        )
+        parser.add_argument('--threshold', type=float, default=0.2, help="Aumento relativo do p95 e da memória tolerado (0.2 = 20%%).")
+        parser.add_argument('--min-ms', type=float, default=1.0, help="Diferença mínima de p95 (ms) para contar como regressão.")
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self._compare(*options['compare'], options['threshold'], options['min_ms'])
+
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment(debug=False)
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Relatório gravado em {options['output']}"))
+
+    # --- Execução ---
+
+    def _run(self, options):
+        cache.clear()
+        self.stdout.write(f"A criar {options['users']} usuários sintéticos (semente {options['seed']})...")
+        dataset = synthetic.seed(options['users'], seed=options['seed'], progress=self._progress)
+        self.stdout.write(
+            f"Dados: {dataset['users']} usuários, {dataset['tasks']} tarefas, {dataset['deposits']} depósitos, "
+            f"{dataset['withdrawals']} retiradas, {dataset['spins']} giros em {dataset['seconds']}s"
+        )
+
+        self.options = options
+        self._prepare_actors()
+        cases = self._cases()
+        missing = self._uncovered_routes(cases)
+        if missing:
+            raise CommandError(f"Rotas de core/urls.py sem caso no benchmark: {', '.join(sorted(missing))}")
+        if options['only']:
+            cases = [case for case in cases if options['only'] in case[0]]
+
+        routes = {}
+        self.stdout.write(f"{'rota':<48} {'status':>6} {'p50 ms':>8} {'p95 ms':>8} {'SQL':>5} {'pico KB':>9}")
+        for name, prepare, request in cases:
+            routes[name] = result = self._measure(prepare, request, options['iterations'])
+            self.stdout.write(
+                f"{name:<48} {result['status']:>6} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                f"{result['queries']:>5} {result['peak_kb']:>9.0f}"
+            )
+
+        return {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'backend': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'users': options['users'],
+                'seed': options['seed'],
+                'iterations': options['iterations'],
+                'batch': options['batch'],
+            },
+            'dataset': dataset,
+            'routes': routes,
+        }
+
+    def _progress(self, stage, done, total, rows):
+        self.stdout.write(f"  {stage}: {done}/{total}")
+
+    def _measure(self, prepare, request, iterations):
+        # Aquecimento (caches de templates, catálogo e dados de referência).
+        prepare(-1)
+        request(-1)
+
+        durations, queries, statuses = [], [], set()
+        for i in range(iterations):
+            prepare(i)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = request(i)
+                durations.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured.captured_queries))
+            statuses.add(response.status_code)
+
+        # Memória numa passagem à parte: o tracemalloc torna os pedidos mais lentos.
+        prepare(iterations)
+        tracemalloc.start()
+        try:
+            request(iterations)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        durations.sort()
+        return {
+            'status': ','.join(str(status) for status in sorted(statuses)),
+            'p50_ms': round(percentile(durations, 0.50), 3),
+            'p95_ms': round(percentile(durations, 0.95), 3),
+            'mean_ms': round(sum(durations) / len(durations), 3),
+            'max_ms': round(durations[-1], 3),
+            'queries': max(queries),
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    # --- Atores e casos ---
+
+    def _prepare_actors(self):
+        # O membro medido é o que tem a maior equipa (a página da equipa mais pesada).
+        self.member = CustomUser.objects.order_by('-team_size', 'pk').first()
+        self.member.balance = Decimal('1000000000.00')
+        self.member.is_staff = True
+        self.member.is_superuser = True
+        self.member.save(update_fields=['balance', 'is_staff', 'is_superuser'])
+        self.bank_account = UserBankAccount.objects.create(
+            user=self.member, bank_name='BAI', account_name='Benchmark', iban='AO06999900000000000000001',
+        )
+        self.bank = Bank.objects.filter(is_active=True).first()
+        self.product = Product.objects.filter(is_active=True).order_by('order').first()
+        _, self.team_cursor = referrals.team_page(self.member)
+
+        self.client = Client()
+        self.client.force_login(self.member)
+        self.logout_client = Client()
+
+    def _get(self, url, client=None):
+        return lambda i: (client or self.client).get(url)
+
+    def _post(self, url, data, client=None):
+        return lambda i: (client or self.client).post(url, data(i) if callable(data) else data)
+
+    def _cases(self):
+        """
+        Lista de (nome, preparar(i), pedido(i)). `preparar` corre fora da medição
+        e repõe o estado que o pedido consome (giros, produto ativo, sessão...).
+        """
+        nothing = lambda i: None
+        member = self.member
+        today = timezone.localdate()
+
+        def relogin(i):
+            self.logout_client.force_login(member)
+
+        def fresh_anonymous(i):
+            self.anonymous = Client()
+
+        def reset_product(i):
+            CustomUser.objects.filter(pk=member.pk).update(current_product=None, level_activation_date=None)
+
+        def reset_spins(i):
+            CustomUser.objects.filter(pk=member.pk).update(daily_spins_remaining=1000, last_spin_date=today)
+
+        cases = [
+            ('GET register', fresh_anonymous, lambda i: self.anonymous.get(reverse('register'))),
+            ('POST register', fresh_anonymous, lambda i: self.anonymous.post(reverse('register'), {
+                'username': f'{REGISTER_PREFIX}{i + 1:07d}', 'password': synthetic.DEFAULT_PASSWORD,
+                'invited_by_code': member.my_invitation_code,
+            })),
+            ('GET login', fresh_anonymous, lambda i: self.anonymous.get(reverse('login'))),
+            ('POST login', fresh_anonymous, lambda i: self.anonymous.post(reverse('login'), {
+                'username': member.username, 'password': synthetic.DEFAULT_PASSWORD,
+            })),
+            ('GET logout', relogin, self._get(reverse('logout'), self.logout_client)),
+            ('GET home', nothing, self._get(reverse('home'))),
+            ('GET profile', nothing, self._get(reverse('profile'))),
+            ('POST profile', nothing, self._post(reverse('profile'), {
+                'update_profile': '1', 'full_name': 'Benchmark', 'bank_name': 'BAI', 'iban': 'AO06999900000000000000002',
+            })),
+            ('GET update_profile_name', nothing, self._get(reverse('update_profile_name'))),
+            ('GET update_bank_profile', nothing, self._get(reverse('update_bank_profile'))),
+            ('GET add_bank_account', nothing, self._get(reverse('add_bank_account'))),
+            ('POST add_bank_account', nothing, self._post(reverse('add_bank_account'), lambda i: {
+                'bank_name': 'BFA', 'account_name': 'Benchmark', 'iban': f'AO07{i + 1:021d}',
+            })),
+            ('GET deposit', nothing, self._get(reverse('deposit'))),
+            ('POST deposit', nothing, self._post(reverse('deposit'), {'bank': self.bank.pk, 'amount': '5000.00'})),
+            ('GET withdrawal', nothing, self._get(reverse('withdrawal'))),
+            ('POST withdrawal', nothing, self._post(reverse('withdrawal'), {
+                'amount': '2000.00', 'user_bank_account': self.bank_account.pk,
+            })),
+            ('GET products', nothing, self._get(reverse('products'))),
+            ('POST activate_product', reset_product, self._post(reverse('activate_product'), {'product_id': self.product.pk})),
+            ('GET tasks', nothing, self._get(reverse('tasks'))),
+            ('GET investment_levels', nothing, self._get(reverse('investment_levels'))),
+            ('GET team', nothing, self._get(reverse('team'))),
+            ('GET team?filter=invested', nothing, self._get(reverse('team') + '?filter=invested')),
+            ('GET team?after=<página 2>', nothing, self._get(
+                reverse('team') + (f'?after={self.team_cursor}' if self.team_cursor else '')
+            )),
+            ('GET lucky_wheel', nothing, self._get(reverse('lucky_wheel'))),
+            ('POST spin_lucky_wheel', reset_spins, self._post(reverse('spin_lucky_wheel'), {})),
+            ('GET support', nothing, self._get(reverse('support'))),
+            ('GET income', nothing, self._get(reverse('income'))),
+            ('GET metrics', nothing, self._get(reverse('metrics'))),
+        ]
+        return cases + self._admin_cases()
+
+    def _admin_cases(self):
+        nothing = lambda i: None
+        cases = []
+        for model in admin.site._registry:
+            if model._meta.app_label != 'core':
+                continue
+            url = reverse(f'admin:core_{model._meta.model_name}_changelist')
+            cases.append((f'GET admin {model._meta.model_name} (lista)', nothing, self._get(url)))
+
+        users_url = reverse('admin:core_customuser_changelist')
+        cases.append(('GET admin customuser (pesquisa)', nothing, self._get(f'{users_url}?q={self.member.phone_number}')))
+        cases.append((
+            'GET admin customuser (edição)', nothing,
+            self._get(reverse('admin:core_customuser_change', args=[self.member.pk])),
+        ))
+
+        user_ids = list(CustomUser.objects.order_by('pk').values_list('pk', flat=True)[:self.options['batch']])
+        batch = self.options['batch']
+
+        def pending_deposits(i):
+            self._selected = [deposit.pk for deposit in Deposit.objects.bulk_create([
+                Deposit(user_id=user_ids[n % len(user_ids)], bank=self.bank, amount=Decimal('5000.00'))
+                for n in range(batch)
+            ])]
+
+        def pending_withdrawals(i):
+            self._selected = [withdrawal.pk for withdrawal in Withdrawal.objects.bulk_create([
+                Withdrawal(user_id=user_ids[n % len(user_ids)], amount=Decimal('2000.00'), amount_received=Decimal('1900.00'))
+                for n in range(batch)
+            ])]
+
+        def open_tasks(i):
+            self._selected = [task.pk for task in Task.objects.bulk_create([
+                Task(user_id=user_ids[n % len(user_ids)], product=self.product) for n in range(batch)
+            ])]
+
+        def action(model_name, name):
+            url = reverse(f'admin:core_{model_name}_changelist')
+            return lambda i: self.client.post(url, {'action': name, '_selected_action': self._selected, 'index': 0})
+
+        for prepare, model_name, name in [
+            (pending_deposits, 'deposit', 'approve_deposits'),
+            (pending_deposits, 'deposit', 'reject_deposits'),
+            (pending_withdrawals, 'withdrawal', 'approve_withdrawals'),
+            (pending_withdrawals, 'withdrawal', 'reject_withdrawals'),
+            (open_tasks, 'task', 'mark_as_completed'),
+        ]:
+            cases.append((f'POST admin {name} ({batch})', prepare, action(model_name, name)))
+        return cases
+
+    def _uncovered_routes(self, cases):
+        # Cada rota com nome em core/urls.py tem de ter pelo menos um caso.
+        from core import urls
+
+        names = {pattern.name for pattern in urls.urlpatterns if isinstance(pattern, URLPattern) and pattern.name}
+        covered = {case[0].split()[1].split('?')[0] for case in cases if not case[0].split()[1] == 'admin'}
+        return names - covered
+
+    # --- Comparação ---
+
+    def _compare(self, base_path, new_path, threshold, min_ms):
+        with open(base_path) as handle:
+            base = json.load(handle)['routes']
+        with open(new_path) as handle:
+            new = json.load(handle)['routes']
+
+        regressions = []
+        self.stdout.write(f"{'rota':<48} {'p95 base':>9} {'p95 novo':>9} {'Δ%':>7} {'SQL':>9} {'pico KB':>17}")
+        for name in sorted(set(base) | set(new)):
+            if name not in base or name not in new:
+                self.stdout.write(f"{name:<48} {'só em ' + ('NEW' if name in new else 'BASE'):>9}")
+                continue
+            before, after = base[name], new[name]
+            change = (after['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+            problems = []
+            if change > threshold and after['p95_ms'] - before['p95_ms'] >= min_ms:
+                problems.append(f"p95 +{change:.0%}")
+            if after['queries'] > before['queries']:
+                problems.append(f"SQL {before['queries']}→{after['queries']}")
+            if before['peak_kb'] and after['peak_kb'] > before['peak_kb'] * (1 + threshold):
+                problems.append(f"memória {before['peak_kb']:.0f}→{after['peak_kb']:.0f} KB")
+            if after['status'] != before['status']:
+                problems.append(f"status {before['status']}→{after['status']}")
+
+            line = (
+                f"{name:<48} {before['p95_ms']:>9.2f} {after['p95_ms']:>9.2f} {change:>+7.0%} "
+                f"{before['queries']:>4}→{after['queries']:<4} {before['peak_kb']:>8.0f}→{after['peak_kb']:<8.0f}"
+            )
+            if problems:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f"{line} REGRESSÃO: {', '.join(problems)}"))
+            else:
+                self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} rotas com regressões.")
+        self.stdout.write(self.style.SUCCESS("Sem regressões."))
@@ -0,0 +1,304 @@
+# microsoft_2025_platform/core/management/commands/bench_servers.py
+
+import http.client
+import importlib.util
+import json
+import os
+import platform
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from core import synthetic
+
+from .bench_routes import percentile
+
+# As páginas que têm versão assíncrona (core/async_views.py).
+ROUTES = ['home', 'support', 'products', 'tasks', 'investment_levels']
+MODES = ['wsgi', 'asgi']
+STARTUP_TIMEOUT = 30.0
+# Usuário com investimento ativo (a página de tarefas tem dados) e a maior equipa.
+PICK_USER = (
+    "from core.models import CustomUser\n"
+    "users = CustomUser.objects.order_by('-team_size', 'pk')\n"
+    "user = users.filter(current_product__isnull=False, task__is_completed=False).first() or users.first()\n"
+    "print(user.username)"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara os dois modos do servidor (SERVER_MODE em gunicorn.conf.py): gunicorn "
+        "com workers síncronos e as views síncronas contra workers do uvicorn e as views "
+        "assíncronas de core/async_views.py. Arranca cada modo num processo à parte sobre "
+        "a mesma base de dados, faz pedidos concorrentes autenticados às páginas de leitura "
+        "e mede pedidos/s, p50/p95 e a memória (RSS) de cada worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help="Usuários sintéticos da base de dados temporária.")
+        parser.add_argument('--seed', type=int, default=2025, help="Semente do gerador (o mesmo valor gera os mesmos dados).")
+        parser.add_argument('--workers', type=int, default=2, help="Workers do gunicorn em cada modo.")
+        parser.add_argument('--concurrency', type=int, default=16, help="Clientes em simultâneo.")
+        parser.add_argument('--duration', type=float, default=5.0, help="Segundos de carga por rota.")
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES, help="Modos a comparar.")
+        parser.add_argument('--only', default='', help="Só as rotas cujo nome contém este texto.")
+        parser.add_argument(
+            '--database-url',
+            help="Base de dados já migrada e com dados (ex: uma cópia do Postgres) em vez de uma SQLite temporária.",
+        )
+        parser.add_argument('--phone', help="Usuário dos pedidos (por omissão o de maior equipa com investimento ativo).")
+        parser.add_argument('--password', default=synthetic.DEFAULT_PASSWORD, help="Palavra-passe desse usuário.")
+        parser.add_argument('--output', help="Ficheiro JSON do relatório (por omissão só imprime a tabela).")
+
+    def handle(self, *args, **options):
+        if 'asgi' in options['modes'] and importlib.util.find_spec('uvicorn_worker') is None:
+            raise CommandError("O modo asgi precisa do pacote uvicorn-worker (pip install -r requirements.txt).")
+        if options['workers'] <= 0 or options['concurrency'] <= 0 or options['duration'] <= 0:
+            raise CommandError("--workers, --concurrency e --duration têm de ser positivos.")
+        routes = [name for name in ROUTES if options['only'] in name]
+        if not routes:
+            raise CommandError(f"Nenhuma rota contém {options['only']!r}: {', '.join(ROUTES)}")
+
+        self.workdir = tempfile.mkdtemp(prefix='bench_servers_')
+        try:
+            report = self._run(options, routes)
+        finally:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Relatório gravado em {options['output']}"))
+
+    # --- Execução ---
+
+    def _run(self, options, routes):
+        self.env = {
+            **os.environ,
+            'DATABASE_URL': options['database_url'] or f"sqlite:///{os.path.join(self.workdir, 'bench.sqlite3')}",
+            # Como em produção: sessões na base de dados e sem DEBUG (que guarda todas as consultas em memória).
+            'SESSION_MODE': 'db',
+            'DEBUG': 'False',
+            'METRICS_DIR': os.path.join(self.workdir, 'metrics'),
+        }
+        if not options['database_url']:
+            self.stdout.write(f"A preparar uma SQLite temporária com {options['users']} usuários (semente {options['seed']})...")
+            self._manage('migrate', '--noinput')
+            self._manage('createcachetable')
+            self._manage('seed_platform', '--users', str(options['users']), '--seed', str(options['seed']))
+        phone = options['phone'] or self._manage('shell', '--verbosity', '0', '-c', PICK_USER).strip().splitlines()[-1]
+
+        modes = {}
+        for mode in options['modes']:
+            self.stdout.write(
+                f"Modo {mode}: {options['workers']} workers, {options['concurrency']} clientes, "
+                f"{options['duration']:.0f}s por rota"
+            )
+            modes[mode] = self._bench_mode(mode, phone, options, routes)
+
+        self._print_summary(modes, routes)
+        return {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'database': self.env['DATABASE_URL'].split(':', 1)[0],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'users': None if options['database_url'] else options['users'],
+                'seed': options['seed'],
+                'workers': options['workers'],
+                'concurrency': options['concurrency'],
+                'duration': options['duration'],
+            },
+            'modes': modes,
+        }
+
+    def _manage(self, *args):
+        completed = subprocess.run(
+            [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), *args],
+            cwd=settings.BASE_DIR, env=self.env, capture_output=True, text=True,
+        )
+        if completed.returncode:
+            raise CommandError(f"manage.py {args[0]} falhou:\n{completed.stderr[-2000:]}")
+        return completed.stdout
+
+    def _bench_mode(self, mode, phone, options, routes):
+        port = _free_port()
+        log_path = os.path.join(self.workdir, f'gunicorn-{mode}.log')
+        with open(log_path, 'w') as log:
+            # Sem argumentos de aplicação: a aplicação e o tipo de worker vêm de gunicorn.conf.py.
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(options['workers'])],
+                cwd=settings.BASE_DIR, env={**self.env, 'SERVER_MODE': mode}, stdout=log, stderr=subprocess.STDOUT,
+            )
+        try:
+            self._wait_until_ready(server, port, log_path)
+            cookie = self._login(port, phone, options['password'])
+            results = {}
+            for name in routes:
+                path = reverse(name)
+                # Aquecimento: templates, catálogo e dados de referência de cada worker.
+                _load(port, cookie, path, options['concurrency'], min(1.0, options['duration']))
+                results[name] = result = _load(port, cookie, path, options['concurrency'], options['duration'])
+                self.stdout.write(
+                    f"  {name:<20} {result['rps']:>8.1f} pedidos/s  p50 {result['p50_ms']:>7.2f} ms  "
+                    f"p95 {result['p95_ms']:>7.2f} ms  erros {result['errors']}"
+                )
+            rss = _worker_rss_kb(server.pid)
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        if rss:
+            self.stdout.write(f"  memória por worker: {sum(rss) / len(rss) / 1024:.1f} MB (máx. {max(rss) / 1024:.1f} MB)")
+        return {'routes': results, 'worker_rss_kb': rss}
+
+    def _wait_until_ready(self, server, port, log_path):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                break
+            try:
+                status, _, _ = _request(port, 'GET', reverse('login'))
+            except OSError:
+                time.sleep(0.2)
+                continue
+            if status == 200:
+                return
+            break
+        with open(log_path) as log:
+            raise CommandError(f"O gunicorn não arrancou (porta {port}):\n{log.read()[-2000:]}")
+
+    def _login(self, port, phone, password):
+        path = reverse('login')
+        _, headers, body = _request(port, 'GET', path)
+        cookies = _cookies(headers)
+        match = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', body)
+        if not match or 'csrftoken' not in cookies:
+            raise CommandError("A página de login não devolveu o token CSRF.")
+        form = urlencode({'username': phone, 'password': password, 'csrfmiddlewaretoken': match.group(1)})
+        status, headers, _ = _request(
+            port, 'POST', path, body=form,
+            headers={'Cookie': f"csrftoken={cookies['csrftoken']}", 'Content-Type': 'application/x-www-form-urlencoded'},
+        )
+        cookies.update(_cookies(headers))
+        if status != 302 or 'sessionid' not in cookies:
+            raise CommandError(f"Não foi possível entrar como {phone} (status {status}).")
+        return '; '.join(f'{name}={value}' for name, value in cookies.items() if name in ('sessionid', 'csrftoken'))
+
+    def _print_summary(self, modes, routes):
+        if len(modes) < 2:
+            return
+        names = list(modes)
+        self.stdout.write("")
+        self.stdout.write(f"{'rota':<20} " + ' '.join(f"{f'{mode} req/s':>12} {f'{mode} p95':>10}" for mode in names))
+        for route in routes:
+            row = ' '.join(
+                f"{modes[mode]['routes'][route]['rps']:>12.1f} {modes[mode]['routes'][route]['p95_ms']:>10.2f}"
+                for mode in names
+            )
+            self.stdout.write(f"{route:<20} {row}")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _request(port, method, path, body=None, headers=None):
+    # Uma ligação nova por pedido: os workers síncronos do gunicorn não mantêm ligações abertas.
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request(method, path, body=body, headers={'Host': 'localhost', **(headers or {})})
+        response = connection.getresponse()
+        return response.status, response.getheaders(), response.read().decode('utf-8', 'replace')
+    finally:
+        connection.close()
+
+
+def _cookies(headers):
+    jar = SimpleCookie()
+    for name, value in headers:
+        if name.lower() == 'set-cookie':
+            jar.load(value)
+    return {name: morsel.value for name, morsel in jar.items()}
+
+
+def _load(port, cookie, path, concurrency, duration):
+    """
+    `concurrency` clientes em threads a pedir `path` sem pausas durante `duration` segundos.
+    """
+    durations = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    started = time.perf_counter()
+    deadline = started + duration
+
+    def client(slot):
+        while time.perf_counter() < deadline:
+            request_started = time.perf_counter()
+            try:
+                status, _, _ = _request(port, 'GET', path, headers={'Cookie': cookie})
+            except OSError:
+                status = None
+            if status == 200:
+                durations[slot].append((time.perf_counter() - request_started) * 1000)
+            else:
+                errors[slot] += 1
+
+    threads = [threading.Thread(target=client, args=(slot,)) for slot in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    values = sorted(value for slot in durations for value in slot)
+    return {
+        'requests': len(values),
+        'errors': sum(errors),
+        'rps': round(len(values) / elapsed, 1),
+        'p50_ms': round(percentile(values, 0.50), 2) if values else None,
+        'p95_ms': round(percentile(values, 0.95), 2) if values else None,
+    }
+
+
+def _worker_rss_kb(master_pid):
+    """
+    Memória residente (KB) de cada worker, os filhos do processo mestre do
+    gunicorn, lida do /proc. Lista vazia fora do Linux.
+    """
+    rss = []
+    if not os.path.isdir('/proc'):
+        return rss
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as handle:
+                # O campo 4 é o pai; o nome do processo (campo 2) pode ter espaços e vem entre parênteses.
+                parent = int(handle.read().rsplit(')', 1)[1].split()[1])
+            if parent != master_pid:
+                continue
+            with open(f'/proc/{entry}/status') as handle:
+                for line in handle:
+                    if line.startswith('VmRSS:'):
+                        rss.append(int(line.split()[1]))
+        except (OSError, IndexError, ValueError):
+            continue
+    return sorted(rss)
@@ -0,0 +1,119 @@
+# microsoft_2025_platform/core/management/commands/bench_spins.py
+
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from core import lucky_wheel
+from core.models import CustomUser, LuckyWheelPrize, LuckyWheelSpin
+
+BENCH_PREFIX = '7'  # números 7XXXXXXXX não passam na validação de telefone, logo não colidem com usuários reais
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede giros/s da Roda da Sorte com N threads a girar para os mesmos usuários e "
+        "verifica que nenhum usuário passa do limite diário."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--spins', type=int, default=50, help="Giros diários de cada usuário.")
+        parser.add_argument(
+            '--mode', choices=['service', 'legacy'], default='service',
+            help="'service' usa lucky_wheel.spin; 'legacy' reproduz a verificação em memória e os dois user.save().",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] == ':memory:':
+            raise CommandError("Use uma base de dados em ficheiro ou Postgres; SQLite em memória não é partilhado entre threads.")
+        if CustomUser.objects.filter(username__startswith=BENCH_PREFIX).exists():
+            raise CommandError(f"Já existem usuários '{BENCH_PREFIX}*'; apague-os antes de repetir o benchmark.")
+
+        threads, spins = options['threads'], options['spins']
+        prize = LuckyWheelPrize.objects.create(value=Decimal('10.00'), weight=1, name="bench_spins")
+        today = timezone.localdate()
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'{BENCH_PREFIX}{i:08d}', phone_number=f'{BENCH_PREFIX}{i:08d}', password='!',
+                daily_spins_remaining=spins, last_spin_date=today,
+            )
+            for i in range(options['users'])
+        ])
+        CustomUser.objects.assign_invitation_codes(users)
+        user_ids = [user.pk for user in users]
+
+        counts = {'ok': 0, 'recusado': 0, 'erro': 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+
+        def worker(index):
+            local = dict.fromkeys(counts, 0)
+            barrier.wait()
+            try:
+                # Cada thread tenta gastar todos os giros de todos os usuários:
+                # só `users x spins` tentativas podem ter sucesso.
+                for user_id in user_ids[index % len(user_ids):] + user_ids[:index % len(user_ids)]:
+                    for _ in range(spins):
+                        try:
+                            local['ok' if self._spin(options['mode'], user_id) else 'recusado'] += 1
+                        except OperationalError:
+                            local['erro'] += 1
+            finally:
+                connection.close()
+            with lock:
+                for key, value in local.items():
+                    counts[key] += value
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        attempts = sum(counts.values())
+        logged = LuckyWheelSpin.objects.filter(user_id__in=user_ids).count()
+        allowed = len(user_ids) * spins
+        self.stdout.write(f"Modo: {options['mode']} | backend: {connection.vendor} | {threads} threads")
+        self.stdout.write(
+            f"{attempts} pedidos em {elapsed:.2f}s ({attempts / elapsed:.0f} pedidos/s, "
+            f"{counts['ok'] / elapsed:.0f} giros/s) | aceites: {counts['ok']} | "
+            f"recusados: {counts['recusado']} | erros de bloqueio: {counts['erro']}"
+        )
+        message = f"Giros registados: {logged} | permitidos: {allowed}"
+        if logged <= allowed:
+            self.stdout.write(self.style.SUCCESS(message + " | nenhum giro a mais"))
+        else:
+            self.stdout.write(self.style.ERROR(message + f" | {logged - allowed} giros a mais"))
+
+        CustomUser.objects.filter(pk__in=user_ids).delete()
+        prize.delete()
+
+    def _spin(self, mode, user_id):
+        if mode == 'service':
+            try:
+                lucky_wheel.spin(user_id)
+            except lucky_wheel.NoSpinsLeft:
+                return False
+            return True
+
+        # Caminho antigo: verificação sobre o usuário carregado e duas gravações completas.
+        user = CustomUser.objects.get(pk=user_id)
+        if user.daily_spins_remaining <= 0:
+            return False
+        prize = lucky_wheel.draw_prize()
+        with transaction.atomic():
+            user.daily_spins_remaining -= 1
+            user.last_spin_date = timezone.localdate()
+            user.save()
+            user.balance += prize.value
+            user.save()
+            LuckyWheelSpin.objects.create(user=user, prize_won=prize, is_paid_spin=False)
+        return True
@@ -0,0 +1,133 @@
+# microsoft_2025_platform/core/management/commands/bench_templates.py
+
+import copy
+import json
+import re
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from core import synthetic, views
+from core.models import CustomUser, SupportInfo
+
+from .bench_routes import percentile
+
+# Páginas com fragmentos em cache: (rota, view).
+PAGES = [
+    ('support', views.support_view),
+    ('investment_levels', views.investment_levels_view),
+]
+UNCACHED_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+CSRF_TOKEN = re.compile(r'name="csrfmiddlewaretoken" value="[^"]+"')
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o tempo de renderização das páginas de suporte e de níveis de investimento "
+        "em três configurações: sem o carregador de templates em cache nem fragmentos em "
+        "cache (antes), só com o carregador em cache e com os dois (depois). Usa uma base "
+        "de dados de teste isolada e verifica que o HTML é o mesmo nas três."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500, help="Renderizações medidas por página e configuração.")
+        parser.add_argument('--text-kb', type=int, default=20, help="Tamanho (KB) das informações e das regras da plataforma.")
+        parser.add_argument('--output', help="Ficheiro JSON do relatório (por omissão só imprime a tabela).")
+
+    def handle(self, *args, **options):
+        if options['iterations'] <= 0:
+            raise CommandError("--iterations tem de ser positivo.")
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment(debug=False)
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Relatório gravado em {options['output']}"))
+
+    def _run(self, options):
+        cache.clear()
+        synthetic.seed_reference_data()
+        # Textos longos com parágrafos, como os que o admin cola nas regras.
+        paragraph = "Regra da plataforma sobre depósitos, retiradas e convites. " * 8 + "\n\n"
+        text = (paragraph * (options['text_kb'] * 1024 // len(paragraph) + 1))[:options['text_kb'] * 1024]
+        SupportInfo.objects.update(platform_info=text, platform_rules=text)
+        self.user = CustomUser(username='900000000', phone_number='900000000')
+
+        configurations = {
+            'antes': self._settings(cached_loader=False, fragments=False),
+            'carregador em cache': self._settings(cached_loader=True, fragments=False),
+            'carregador + fragmentos': self._settings(cached_loader=True, fragments=True),
+        }
+        results, pages_html = {}, {}
+        self.stdout.write(f"{'página':<20} {'configuração':<26} {'p50 ms':>8} {'p95 ms':>8} {'média ms':>9} {'KB':>6}")
+        for page, view in PAGES:
+            results[page] = {}
+            for label, overrides in configurations.items():
+                with override_settings(**overrides):
+                    result, html = self._measure(page, view, options['iterations'])
+                results[page][label] = result
+                self.stdout.write(
+                    f"{page:<20} {label:<26} {result['p50_ms']:>8.3f} {result['p95_ms']:>8.3f} "
+                    f"{result['mean_ms']:>9.3f} {result['kb']:>6.1f}"
+                )
+                pages_html.setdefault(page, set()).add(CSRF_TOKEN.sub('', html))
+        different = [page for page, variants in pages_html.items() if len(variants) > 1]
+        if different:
+            raise CommandError(f"O HTML muda com a cache de fragmentos em: {', '.join(different)}")
+        return {
+            'meta': {'iterations': options['iterations'], 'text_kb': options['text_kb']},
+            'pages': results,
+        }
+
+    def _settings(self, cached_loader, fragments):
+        templates = copy.deepcopy(settings.TEMPLATES)
+        if not cached_loader:
+            templates[0]['OPTIONS']['loaders'] = UNCACHED_LOADERS
+        caches = copy.deepcopy(settings.CACHES)
+        if not fragments:
+            # Com a DummyCache o {% cache %} renderiza sempre o conteúdo.
+            caches['fragments'] = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        return {'TEMPLATES': templates, 'CACHES': caches}
+
+    def _request(self, page):
+        request = RequestFactory().get(reverse(page))
+        request.user = self.user
+        return request
+
+    def _measure(self, page, view, iterations):
+        # Aquecimento: catálogo e dados de suporte em memória e, conforme a configuração,
+        # templates compilados e fragmentos guardados.
+        view(self._request(page))
+        durations = []
+        for _ in range(iterations):
+            request = self._request(page)
+            started = time.perf_counter()
+            response = view(request)
+            durations.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise CommandError(f"{page} devolveu {response.status_code}.")
+        durations.sort()
+        html = response.content.decode()
+        return {
+            'p50_ms': round(percentile(durations, 0.50), 3),
+            'p95_ms': round(percentile(durations, 0.95), 3),
+            'mean_ms': round(statistics.fmean(durations), 3),
+            'kb': round(len(response.content) / 1024, 1),
+        }, html
@@ -0,0 +1,49 @@
+# microsoft_2025_platform/core/management/commands/process_deposit_proofs.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import proofs
+from core.models import Deposit
+
+
+class Command(BaseCommand):
+    help = (
+        "Processa os comprovativos de depósito ainda não processados (cópia reduzida sem EXIF e miniatura), "
+        "por exemplo os enviados antes do processamento em segundo plano ou interrompidos por um reinício."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help="Máximo de comprovativos a processar.")
+
+    def handle(self, *args, **options):
+        pending = (
+            Deposit.objects.filter(proof_processed_at__isnull=True)
+            .exclude(proof_image='').exclude(proof_image__isnull=True)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        if options['limit']:
+            pending = pending[:options['limit']]
+
+        processed = failed = 0
+        original = stored = 0
+        started = time.perf_counter()
+        for deposit_id in list(pending):
+            try:
+                result = proofs.process_proof(deposit_id)
+            except OSError as exc:
+                failed += 1
+                self.stderr.write(f"Depósito #{deposit_id}: {exc}")
+                continue
+            if result:
+                processed += 1
+                original += result.original_bytes
+                stored += result.stored_bytes
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{processed} comprovativos processados em {elapsed:.1f}s ({failed} falhas). "
+            f"Enviados (mantidos): {original / 1e6:.1f} MB | cópias de revisão: {stored / 1e6:.1f} MB | "
+            f"a menos por revisão: {(original - stored) / 1e6:.1f} MB"
+        ))
@@ -0,0 +1,27 @@
+# microsoft_2025_platform/core/management/commands/reconcile_team_counters.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import referrals
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula team_size e invested_team_size a partir dos convidados reais e corrige os "
+        "usuários em que divergem (alterações feitas por fora das views e do admin). "
+        "Executar periodicamente, ex: via cron a seguir a accrue_income."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Usuários corrigidos por UPDATE.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError("--batch-size deve ser maior que zero.")
+        started = time.perf_counter()
+        fixed = referrals.reconcile_team_counters(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{fixed} usuários com contadores da equipa corrigidos ({time.perf_counter() - started:.2f}s)."
+        ))
@@ -0,0 +1,163 @@
+# microsoft_2025_platform/core/management/commands/runworker.py
+
+import multiprocessing
+import os
+import signal
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+# `core.jobs` (e os modelos) só é importado depois do django.setup(): este módulo
+# também é importado pelos processos filhos, antes do `_init_process`.
+
+
+def _init_process():
+    # Processos novos (spawn): carregam o Django sem herdar ligações à base de dados do pai.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'microsoft_2025_platform.settings')
+    django.setup()
+
+
+def _execute_in_process(lease):
+    from core import jobs
+
+    try:
+        return jobs.execute(lease)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa as tarefas em segundo plano da fila na base de dados (core/jobs.py), "
+        "com várias threads ou processos, novas tentativas com espera exponencial e "
+        "métricas de tempo por tarefa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=int(os.environ.get('WORKER_CONCURRENCY', 2)),
+            help="Tarefas em paralelo (por omissão WORKER_CONCURRENCY ou 2).",
+        )
+        parser.add_argument(
+            '--pool', choices=['thread', 'process'], default='thread',
+            help="'thread' para tarefas de E/S; 'process' para tarefas pesadas de CPU (ex: imagens).",
+        )
+        parser.add_argument('--queues', default='default', help="Filas servidas, separadas por vírgulas.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Segundos entre consultas quando a fila está vazia.")
+        parser.add_argument('--stats-interval', type=float, default=300.0, help="Segundos entre relatórios de métricas.")
+        parser.add_argument('--burst', action='store_true', help="Termina quando a fila estiver vazia.")
+
+    def handle(self, *args, **options):
+        from core import jobs
+
+        concurrency = max(options['concurrency'], 1)
+        queues = [queue.strip() for queue in options['queues'].split(',') if queue.strip()]
+        poll = options['poll_interval']
+        worker = jobs.worker_id()
+
+        if options['pool'] == 'process':
+            executor = ProcessPoolExecutor(
+                max_workers=concurrency, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_process,
+            )
+            run = _execute_in_process
+        else:
+            executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='runworker')
+            run = jobs.execute
+
+        stopping = []
+
+        def stop(signum, frame):
+            self.stdout.write("A terminar depois das tarefas em curso...")
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(
+            f"Worker {worker}: filas {', '.join(queues)} | concorrência {concurrency} ({options['pool']})"
+        )
+        self._stats = defaultdict(lambda: {'ok': 0, 'failed': 0, 'retried': 0, 'durations': []})
+        last_stats = last_recovery = last_heartbeat = time.monotonic()
+        # {future: reserva} das tarefas em curso.
+        inflight = {}
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f"{requeued} tarefas de workers anteriores voltaram à fila.")
+
+        try:
+            while not stopping:
+                for lease in jobs.claim(queues, concurrency - len(inflight), worker):
+                    inflight[executor.submit(run, lease)] = lease
+
+                if not inflight:
+                    if options['burst']:
+                        break
+                    time.sleep(poll)
+                else:
+                    done, _ = wait(inflight, timeout=poll, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        del inflight[future]
+                        self._record(future)
+
+                now = time.monotonic()
+                if inflight and now - last_heartbeat >= jobs.HEARTBEAT_INTERVAL.total_seconds():
+                    jobs.heartbeat(inflight.values())
+                    last_heartbeat = now
+                if now - last_recovery >= jobs.STALE_AFTER.total_seconds():
+                    jobs.requeue_stale()
+                    last_recovery = now
+                if now - last_stats >= options['stats_interval']:
+                    self._report()
+                    last_stats = now
+
+            # As tarefas em curso continuam a ter heartbeat enquanto terminam.
+            while inflight:
+                done, _ = wait(inflight, timeout=jobs.HEARTBEAT_INTERVAL.total_seconds())
+                for future in done:
+                    del inflight[future]
+                    self._record(future)
+                if inflight:
+                    jobs.heartbeat(inflight.values())
+        finally:
+            executor.shutdown(wait=True)
+            connections.close_all()
+        self._report()
+
+    def _record(self, future):
+        try:
+            outcome = future.result()
+        except Exception as exc:  # falha do próprio worker (ex: processo filho terminado)
+            self.stderr.write(f"Erro no worker: {exc!r}")
+            return
+        stats = self._stats[outcome.name]
+        stats['durations'].append(outcome.duration_ms)
+        if outcome.lost:
+            self.stderr.write(
+                f"Tarefa #{outcome.job_id} ({outcome.name}) voltou à fila durante a execução; "
+                "o resultado desta execução não foi gravado."
+            )
+        if outcome.ok:
+            stats['ok'] += 1
+        elif outcome.retry:
+            stats['retried'] += 1
+            self.stderr.write(f"Tarefa #{outcome.job_id} ({outcome.name}) falhou; nova tentativa agendada.")
+        else:
+            stats['failed'] += 1
+            self.stderr.write(self.style.ERROR(f"Tarefa #{outcome.job_id} ({outcome.name}) falhou definitivamente."))
+
+    def _report(self):
+        for name, stats in sorted(self._stats.items()):
+            durations = sorted(stats['durations'])
+            if not durations:
+                continue
+            p95 = durations[max(int(len(durations) * 0.95) - 1, 0)]
+            self.stdout.write(
+                f"{name}: {stats['ok']} ok, {stats['retried']} a repetir, {stats['failed']} falhadas | "
+                f"média {sum(durations) / len(durations):.0f} ms, p95 {p95} ms, máx {durations[-1]} ms"
+            )
+        self._stats.clear()
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/metrics.py
+
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates
+
+# Limites (em segundos) dos histogramas de tempo e (em número) dos de consultas.
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+# Cada processo grava os seus totais em METRICS_DIR no máximo uma vez por intervalo;
+# o /metrics junta os ficheiros de todos os workers do gunicorn.
+FLUSH_INTERVAL = 5.0
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': ("Tempo total do pedido por rota.", TIME_BUCKETS),
+    'http_request_db_queries': ("Número de consultas SQL por pedido.", QUERY_BUCKETS),
+    'http_request_db_duration_seconds': ("Tempo gasto em SQL por pedido.", TIME_BUCKETS),
+    'http_request_template_duration_seconds': ("Tempo de renderização de templates por pedido.", TIME_BUCKETS),
+}
+
+_lock = threading.Lock()
+# {(métrica, rota, método): [contagens por bucket..., +Inf], soma}
+_histograms = {}
+# {(rota, método, classe do status): total}
+_requests = defaultdict(int)
+_last_flush = [0.0]
+
+_current = contextvars.ContextVar('core_request_metrics', default=None)
+
+
+class _RequestStats:
+    __slots__ = ('queries', 'db_time', 'template_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def _count_queries(execute, sql, params, many, context):
+    # Wrapper permanente de todas as ligações: conta e cronometra cada consulta
+    # no `_RequestStats` do pedido em curso, se houver um.
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+@receiver(connection_created, dispatch_uid='core.metrics.connection_created')
+def _install_query_counter(sender, connection, **kwargs):
+    # Instalado em cada ligação (uma por thread) e não à volta do pedido com
+    # connection.execute_wrapper(): com ASGI as consultas do ORM assíncrono (e as
+    # views síncronas) correm pelo sync_to_async noutra thread, com outra ligação.
+    # O sync_to_async copia o contexto, por isso `_current` aponta lá para o
+    # mesmo `_RequestStats` do pedido.
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+def _observe(name, route, method, value):
+    buckets = HISTOGRAMS[name][1]
+    key = (name, route, method)
+    series = _histograms.get(key)
+    if series is None:
+        series = _histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+    series[0][bisect.bisect_left(buckets, value)] += 1
+    series[1] += value
+
+
+def record(route, method, status, duration, stats):
+    with _lock:
+        _requests[(route, method, f'{status // 100}xx')] += 1
+        _observe('http_request_duration_seconds', route, method, duration)
+        _observe('http_request_db_queries', route, method, stats.queries)
+        _observe('http_request_db_duration_seconds', route, method, stats.db_time)
+        _observe('http_request_template_duration_seconds', route, method, stats.template_time)
+    now = time.monotonic()
+    if now - _last_flush[0] >= FLUSH_INTERVAL:
+        _last_flush[0] = now
+        flush()
+
+
+class RequestMetricsMiddleware:
+    """
+    Regista, por nome de rota, o tempo do pedido, o número e o tempo das
+    consultas SQL e o tempo de renderização dos templates, em histogramas
+    em memória expostos no /metrics (formato de texto do Prometheus).
+
+    Funciona nos dois modos: com ASGI corre no event loop (um middleware só
+    síncrono obrigaria todos os pedidos a passar por uma thread).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = _RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = _RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            # As consultas feitas noutra thread também contam: ver _install_query_counter.
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def _record(self, request, response, duration, stats):
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else 'unmatched'
+        record(route, request.method, response.status_code, duration, stats)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Backend de templates do Django que mede o tempo de cada renderização
+    (os includes contam dentro do template que os inclui).
+    """
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+
+class _TimedTemplate:
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+# --- Agregação entre processos e exposição ---
+
+def _metrics_dir():
+    return str(getattr(settings, 'METRICS_DIR', ''))
+
+
+def _snapshot():
+    with _lock:
+        return {
+            'histograms': [[list(key), [list(series[0]), series[1]]] for key, series in _histograms.items()],
+            'requests': [[list(key), count] for key, count in _requests.items()],
+        }
+
+
+def flush():
+    """
+    Grava os totais deste processo em METRICS_DIR/<pid>.json (substituição atómica).
+    """
+    directory = _metrics_dir()
+    if not directory:
+        return
+    try:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as handle:
+            json.dump(_snapshot(), handle)
+        os.replace(path + '.tmp', path)
+    except OSError:
+        pass
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def forget_process(pid):
+    """
+    Apaga o ficheiro de um processo que terminou, para que os seus totais deixem
+    de ser somados e um novo processo com o mesmo PID não os herde. O gunicorn
+    chama-o no child_exit (ver gunicorn.conf.py).
+    """
+    directory = _metrics_dir()
+    if not directory:
+        return
+    try:
+        os.remove(os.path.join(directory, f'{pid}.json'))
+    except OSError:
+        pass
+
+
+def _collect():
+    """
+    Soma os totais de todos os processos: os ficheiros dos outros workers e o
+    estado em memória deste (mais recente do que o seu ficheiro). Os ficheiros
+    de processos que já não existem (p. ex. sem o child_exit do gunicorn) são apagados.
+    """
+    snapshots = [_snapshot()]
+    directory = _metrics_dir()
+    if directory and os.path.isdir(directory):
+        own = os.getpid()
+        for filename in os.listdir(directory):
+            pid = filename[:-len('.json')]
+            if not filename.endswith('.json') or not pid.isdigit() or int(pid) == own:
+                continue
+            if not _process_alive(int(pid)):
+                forget_process(int(pid))
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as handle:
+                    snapshots.append(json.load(handle))
+            except (OSError, ValueError):
+                continue
+
+    histograms = {}
+    requests = defaultdict(int)
+    for snapshot in snapshots:
+        for key, (counts, total) in snapshot['histograms']:
+            key = tuple(key)
+            if key not in histograms:
+                histograms[key] = [[0] * len(counts), 0.0]
+            merged = histograms[key]
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+        for key, count in snapshot['requests']:
+            requests[tuple(key)] += count
+    return histograms, requests
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def render_prometheus():
+    """
+    Todas as métricas no formato de texto do Prometheus (versão 0.0.4).
+    """
+    histograms, requests = _collect()
+    lines = [
+        "# HELP http_requests_total Pedidos por rota, método e classe de status.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (route, method, status), count in sorted(requests.items()):
+        lines.append(f'http_requests_total{{{_labels(view=route, method=method, status=status)}}} {count}')
+
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, route, method), (counts, total) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            labels = _labels(view=route, method=method)
+            cumulative = 0
+            for bound, count in zip(buckets, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {total:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {cumulative}')
+    return '\n'.join(lines) + '\n'
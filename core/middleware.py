@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/middleware.py
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    O middleware do WhiteNoise, que também funciona com ASGI. O original só é
+    síncrono e, com workers do uvicorn, o Django faria cada pedido passar por
+    ele numa thread partilhada, um de cada vez. Os ficheiros estáticos são
+    procurados num dicionário em memória, por isso a versão assíncrona pode
+    correr no event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # Só em DEBUG: procura o ficheiro no disco a cada pedido.
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, Sum
+
+
+def backfill_totals(apps, schema_editor):
+    """
+    Preenche os totais a partir do histórico existente. Como não havia registo
+    da renda diária, o total de tarefas usa a mesma estimativa da página de
+    renda antiga (renda diária x duração das tarefas concluídas).
+    """
+    CustomUser = apps.get_model('core', 'CustomUser')
+    Deposit = apps.get_model('core', 'Deposit')
+    Withdrawal = apps.get_model('core', 'Withdrawal')
+    Task = apps.get_model('core', 'Task')
+    LuckyWheelSpin = apps.get_model('core', 'LuckyWheelSpin')
+    UserLedgerTotals = apps.get_model('core', 'UserLedgerTotals')
+
+    totals = {}
+
+    def add(rows, column, sign=1):
+        for user_id, value in rows:
+            if value:
+                totals.setdefault(user_id, {})[column] = sign * value
+
+    add(Deposit.objects.filter(status='Approved').values('user').annotate(s=Sum('amount')).values_list('user', 's'), 'deposit')
+    add(Withdrawal.objects.values('user').annotate(s=Sum('amount')).values_list('user', 's'), 'withdrawal', -1)
+    add(Withdrawal.objects.filter(status='Rejected').values('user').annotate(s=Sum('amount')).values_list('user', 's'), 'withdrawal_refund')
+    add(Task.objects.values('user').annotate(s=Sum('product__min_deposit_amount')).values_list('user', 's'), 'product_purchase', -1)
+    add(
+        Task.objects.filter(is_completed=True).values('user').annotate(
+            s=Sum(ExpressionWrapper(
+                F('product__daily_income') * F('product__duration_days'),
+                output_field=models.DecimalField(max_digits=14, decimal_places=2),
+            ))
+        ).values_list('user', 's'),
+        'task_income',
+    )
+    add(CustomUser.objects.exclude(referral_income=0).values_list('pk', 'referral_income'), 'referral_bonus')
+    add(LuckyWheelSpin.objects.filter(prize_won__isnull=False).values('user').annotate(s=Sum('prize_won__value')).values_list('user', 's'), 'lucky_wheel')
+
+    UserLedgerTotals.objects.bulk_create(
+        [UserLedgerTotals(user_id=user_id, **columns) for user_id, columns in totals.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserLedgerTotals',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger_totals', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+                ('deposit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Total de Depósitos')),
+                ('withdrawal', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Total de Retiradas')),
+                ('withdrawal_refund', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Total de Reembolsos')),
+                ('product_purchase', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Total de Compras de Produto')),
+                ('task_income', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Total de Renda de Tarefas')),
+                ('referral_bonus', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Total de Bónus de Convite')),
+                ('lucky_wheel', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Total de Prémios da Roleta')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado Em')),
+            ],
+            options={
+                'verbose_name': 'Totais do Livro-Razão',
+                'verbose_name_plural': 'Totais do Livro-Razão',
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('deposit', 'Depósito Aprovado'), ('withdrawal', 'Retirada'), ('withdrawal_refund', 'Reembolso de Retirada'), ('product_purchase', 'Compra de Produto'), ('task_income', 'Renda de Tarefa'), ('referral_bonus', 'Bónus de Convite'), ('lucky_wheel', 'Prémio da Roda da Sorte')], max_length=20, verbose_name='Tipo de Movimento')),
+                ('account', models.CharField(choices=[('balance', 'Saldo'), ('bonus_balance', 'Saldo Bônus')], default='balance', max_length=20, verbose_name='Conta')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Valor')),
+                ('description', models.CharField(blank=True, default='', max_length=255, verbose_name='Descrição')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Data/Hora')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Movimento de Saldo',
+                'verbose_name_plural': 'Movimentos de Saldo',
+                'ordering': ['-created'],
+                'indexes': [models.Index(fields=['user', 'created'], name='core_ledger_user_created_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0002_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['invited_by_code'], name='core_user_invited_by_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(fields=['user', 'status', '-timestamp'], name='core_dep_user_status_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(condition=models.Q(('status', 'Pending')), fields=['-timestamp'], name='core_dep_pending_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='luckywheelspin',
+            index=models.Index(fields=['user', '-spin_time'], name='core_spin_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_completed', False)), fields=['user', '-creation_date'], name='core_task_user_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_completed', True)), fields=['user', '-completion_date'], name='core_task_user_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['user', 'status', '-timestamp'], name='core_wdr_user_status_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(condition=models.Q(('status', 'Pending')), fields=['-timestamp'], name='core_wdr_pending_ts_idx'),
+        ),
+    ]
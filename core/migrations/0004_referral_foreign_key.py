@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def link_referrals(apps, schema_editor):
+    """
+    Preenche invited_by a partir de invited_by_code e calcula os contadores
+    da equipa, tudo com UPDATEs baseados em subconsultas.
+    """
+    CustomUser = apps.get_model('core', 'CustomUser')
+
+    CustomUser.objects.filter(invited_by_code__isnull=False).exclude(invited_by_code='').update(
+        invited_by=Subquery(
+            CustomUser.objects.filter(my_invitation_code=OuterRef('invited_by_code')).values('pk')[:1]
+        )
+    )
+
+    def team_count(**filters):
+        counts = (
+            CustomUser.objects.filter(invited_by=OuterRef('pk'), **filters)
+            .order_by().values('invited_by').annotate(c=Count('pk')).values('c')
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    CustomUser.objects.update(
+        team_size=team_count(),
+        invested_team_size=team_count(current_product__isnull=False),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='invested_team_size',
+            field=models.IntegerField(default=0, verbose_name='Convidados que Investiram'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='invited_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invitees', to=settings.AUTH_USER_MODEL, verbose_name='Convidado Por'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='team_size',
+            field=models.IntegerField(default=0, verbose_name='Total de Convidados'),
+        ),
+        migrations.RunPython(link_referrals, migrations.RunPython.noop),
+    ]
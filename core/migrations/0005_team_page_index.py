@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0004_referral_foreign_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['invited_by', '-date_joined', '-id'], name='core_user_team_page_idx'),
+        ),
+    ]
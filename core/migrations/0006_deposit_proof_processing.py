@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_team_page_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deposit',
+            name='proof_original_size',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Tamanho Enviado (bytes)'),
+        ),
+        migrations.AddField(
+            model_name='deposit',
+            name='proof_processed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Comprovativo Processado em'),
+        ),
+        migrations.AddField(
+            model_name='deposit',
+            name='proof_size',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Tamanho Guardado (bytes)'),
+        ),
+        migrations.AddField(
+            model_name='deposit',
+            name='proof_thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='deposit_proofs/thumbs/', verbose_name='Miniatura do Comprovativo'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_deposit_proof_processing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Tarefa')),
+                ('queue', models.CharField(default='default', max_length=30, verbose_name='Fila')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Argumentos')),
+                ('status', models.CharField(choices=[('queued', 'Em fila'), ('running', 'Em execução'), ('done', 'Concluída'), ('failed', 'Falhou')], default='queued', max_length=10, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='Máximo de Tentativas')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Executar a Partir de')),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100, verbose_name='Worker')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Reservada Em')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Último Erro')),
+                ('duration_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Duração (ms)')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Criada Em')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminada Em')),
+            ],
+            options={
+                'verbose_name': 'Tarefa em Segundo Plano',
+                'verbose_name_plural': 'Tarefas em Segundo Plano',
+                'ordering': ['-created'],
+                'indexes': [models.Index(condition=models.Q(('status', 'queued')), fields=['queue', 'run_after'], name='core_job_queued_idx'), models.Index(condition=models.Q(('status', 'running')), fields=['locked_at'], name='core_job_running_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0007_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['-date_joined', '-id'], name='core_user_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(fields=['-timestamp', '-id'], name='core_dep_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['-created', '-id'], name='core_ledger_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='luckywheelspin',
+            index=models.Index(fields=['-spin_time', '-id'], name='core_spin_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['-creation_date', '-id'], name='core_task_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawal',
+            index=models.Index(fields=['-timestamp', '-id'], name='core_wdr_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import DatabaseError, migrations, models, transaction
+
+BACKFILL_CHUNK = 5000
+TRIGRAM_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS core_search_value_trgm_idx "
+    "ON core_searchentry USING gin (value gin_trgm_ops)"
+)
+
+
+def backfill(apps, schema_editor):
+    """
+    Preenche o índice de pesquisa para os usuários existentes, em lotes.
+    """
+    from core.search import collect
+
+    CustomUser = apps.get_model('core', 'CustomUser')
+    UserBankAccount = apps.get_model('core', 'UserBankAccount')
+    SearchEntry = apps.get_model('core', 'SearchEntry')
+    using = schema_editor.connection.alias
+    last_pk = 0
+    while True:
+        ids = list(
+            CustomUser.objects.using(using).filter(pk__gt=last_pk)
+            .order_by('pk').values_list('pk', flat=True)[:BACKFILL_CHUNK]
+        )
+        if not ids:
+            return
+        entries = collect(ids, user_model=CustomUser, account_model=UserBankAccount, using=using)
+        SearchEntry.objects.using(using).bulk_create([
+            SearchEntry(user_id=user_id, kind=kind, value=value)
+            for user_id, pairs in entries.items() for kind, value in pairs
+        ])
+        last_pk = ids[-1]
+
+
+def add_trigram_index(apps, schema_editor):
+    """
+    No Postgres, índice GIN de trigramas para pesquisar qualquer parte do valor.
+    Sem permissão para criar a extensão pg_trgm, a pesquisa fica só pelo início.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            schema_editor.execute(TRIGRAM_INDEX_SQL)
+    except DatabaseError:
+        pass
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS core_search_value_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_admin_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('phone', 'Telefone'), ('username', 'Nome de Usuário'), ('iban', 'IBAN'), ('code', 'Código de Convite'), ('name', 'Nome Completo')], max_length=10, verbose_name='Tipo')),
+                ('value', models.CharField(db_index=True, max_length=255, verbose_name='Valor Normalizado')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Entrada de Pesquisa',
+                'verbose_name_plural': 'Entradas de Pesquisa',
+                'constraints': [models.UniqueConstraint(fields=('user', 'kind', 'value'), name='core_search_entry_unique')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.RunPython(add_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_admin_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deposit',
+            name='proof_reduced',
+            field=models.ImageField(blank=True, null=True, upload_to='deposit_proofs/reduced/', verbose_name='Cópia Reduzida do Comprovativo'),
+        ),
+        migrations.AlterField(
+            model_name='deposit',
+            name='proof_size',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Tamanho da Cópia de Revisão (bytes)'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:34
+
+from django.db import migrations, models
+
+BACKFILL_CHUNK = 5000
+
+
+def backfill_emails(apps, schema_editor):
+    """
+    Acrescenta ao índice de pesquisa o e-mail dos usuários que o têm, em lotes.
+    """
+    from core.search import normalize_email
+
+    CustomUser = apps.get_model('core', 'CustomUser')
+    SearchEntry = apps.get_model('core', 'SearchEntry')
+    using = schema_editor.connection.alias
+    last_pk = 0
+    while True:
+        rows = list(
+            CustomUser.objects.using(using).filter(pk__gt=last_pk, email__contains='@')
+            .order_by('pk').values_list('pk', 'email')[:BACKFILL_CHUNK]
+        )
+        if not rows:
+            return
+        SearchEntry.objects.using(using).bulk_create(
+            [SearchEntry(user_id=pk, kind='email', value=normalize_email(email)[:255]) for pk, email in rows],
+            ignore_conflicts=True,
+        )
+        last_pk = rows[-1][0]
+
+
+def remove_emails(apps, schema_editor):
+    SearchEntry = apps.get_model('core', 'SearchEntry')
+    SearchEntry.objects.using(schema_editor.connection.alias).filter(kind='email').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_deposit_proof_reduced_copy'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchentry',
+            name='kind',
+            field=models.CharField(choices=[('phone', 'Telefone'), ('username', 'Nome de Usuário'), ('iban', 'IBAN'), ('code', 'Código de Convite'), ('name', 'Nome Completo'), ('email', 'E-mail')], max_length=10, verbose_name='Tipo'),
+        ),
+        migrations.RunPython(backfill_emails, remove_emails),
+    ]
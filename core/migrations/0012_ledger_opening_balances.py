@@ -0,0 +1,114 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:37
+
+from collections import defaultdict
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+BACKFILL_CHUNK = 2000
+# Tipos com totais estimados pela migração 0002 e a conta que cada um movimenta.
+ESTIMATED_TYPES = {
+    'deposit': 'balance',
+    'withdrawal': 'balance',
+    'withdrawal_refund': 'balance',
+    'product_purchase': 'balance',
+    'task_income': 'balance',
+    'referral_bonus': 'bonus_balance',
+    'lucky_wheel': 'balance',
+}
+
+
+def open_ledger(apps, schema_editor):
+    """
+    Torna o livro-razão coerente com os totais e com os saldos, em lotes de usuários:
+    por tipo, um movimento com a parte dos totais estimada pela migração 0002
+    (histórico anterior ao livro-razão) que não tem movimentos; por conta, um
+    saldo de abertura com a diferença entre o saldo e a soma dos movimentos.
+    Depois disto a soma dos movimentos de cada tipo é o total e a de cada conta é o saldo.
+    """
+    CustomUser = apps.get_model('core', 'CustomUser')
+    LedgerEntry = apps.get_model('core', 'LedgerEntry')
+    UserLedgerTotals = apps.get_model('core', 'UserLedgerTotals')
+    using = schema_editor.connection.alias
+    last_pk = 0
+    while True:
+        users = list(
+            CustomUser.objects.using(using).filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'date_joined', 'balance', 'bonus_balance')[:BACKFILL_CHUNK]
+        )
+        if not users:
+            return
+        ids = [user[0] for user in users]
+        by_type = defaultdict(Decimal)
+        by_account = defaultdict(Decimal)
+        sums = (
+            LedgerEntry.objects.using(using).filter(user_id__in=ids)
+            .values('user_id', 'entry_type', 'account').annotate(total=Sum('amount'))
+            .values_list('user_id', 'entry_type', 'account', 'total')
+        )
+        for user_id, entry_type, account, amount in sums:
+            by_type[(user_id, entry_type)] += amount
+            by_account[(user_id, account)] += amount
+        totals = UserLedgerTotals.objects.using(using).in_bulk(ids)
+
+        entries = []
+        changed_totals, new_totals = [], []
+        for user_id, joined, balance, bonus_balance in users:
+            def add(entry_type, account, amount, description):
+                # Com a data de registo: ficam no fim do histórico do usuário.
+                entries.append(LedgerEntry(
+                    user_id=user_id, entry_type=entry_type, account=account,
+                    amount=amount, description=description, created=joined,
+                ))
+                by_account[(user_id, account)] += amount
+
+            user_totals = totals.get(user_id)
+            if user_totals is not None:
+                for entry_type, account in ESTIMATED_TYPES.items():
+                    missing = getattr(user_totals, entry_type) - by_type[(user_id, entry_type)]
+                    if missing:
+                        add(entry_type, account, missing, "Histórico anterior ao livro-razão (estimativa)")
+
+            opening = Decimal('0.00')
+            for account, current in (('balance', balance), ('bonus_balance', bonus_balance)):
+                difference = current - by_account[(user_id, account)]
+                if difference:
+                    add('opening_balance', account, difference, "Saldo de abertura do livro-razão")
+                    opening += difference
+            if opening:
+                if user_totals is None:
+                    new_totals.append(UserLedgerTotals(user_id=user_id, opening_balance=opening))
+                else:
+                    user_totals.opening_balance += opening
+                    changed_totals.append(user_totals)
+
+        LedgerEntry.objects.using(using).bulk_create(entries, batch_size=1000)
+        UserLedgerTotals.objects.using(using).bulk_create(new_totals, batch_size=1000)
+        UserLedgerTotals.objects.using(using).bulk_update(changed_totals, ['opening_balance'], batch_size=1000)
+        last_pk = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_search_entry_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userledgertotals',
+            name='adjustment',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Total de Ajustes Manuais'),
+        ),
+        migrations.AddField(
+            model_name='userledgertotals',
+            name='opening_balance',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Saldo de Abertura'),
+        ),
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='entry_type',
+            field=models.CharField(choices=[('deposit', 'Depósito Aprovado'), ('withdrawal', 'Retirada'), ('withdrawal_refund', 'Reembolso de Retirada'), ('product_purchase', 'Compra de Produto'), ('task_income', 'Renda de Tarefa'), ('referral_bonus', 'Bónus de Convite'), ('lucky_wheel', 'Prémio da Roda da Sorte'), ('adjustment', 'Ajuste Manual'), ('opening_balance', 'Saldo de Abertura')], max_length=20, verbose_name='Tipo de Movimento'),
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
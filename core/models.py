@@ -2,7 +2,7 @@
 # microsof_2025_platform/core/models.py
 
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
 from django.utils import timezone
 from decimal import Decimal
 import random
@@ -11,6 +11,8 @@ import re
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from . import invitation_codes
+
 # CustomUser Manager para adicionar métodos personalizados e sobrescrever create_user
 class CustomUserManager(BaseUserManager):
     """
@@ -30,10 +32,7 @@ class CustomUserManager(BaseUserManager):
         
         user = self.model(username=normalized_phone_number_for_db, phone_number=normalized_phone_number_for_db, **extra_fields)
         user.set_password(password)
-        
-        if not user.my_invitation_code:
-            user.my_invitation_code = self.generate_unique_invitation_code()
-
+        # O código de convite é derivado da chave primária em CustomUser.save()
         user.save(using=self._db)
         return user
 
@@ -48,7 +47,26 @@ class CustomUserManager(BaseUserManager):
             
         return self.create_user(username, password, **extra_fields)
 
+    def assign_invitation_codes(self, users, batch_size=1000):
+        """
+        Modo em massa: atribui o código de convite (derivado da chave primária)
+        a usuários já gravados, por exemplo depois de um bulk_create, com um
+        único bulk_update por lote e sem nenhuma consulta de verificação.
+        """
+        pending = [user for user in users if user.pk and not user.my_invitation_code]
+        for user in pending:
+            user.my_invitation_code = invitation_codes.encode(user.pk)
+        self.bulk_update(pending, ['my_invitation_code'], batch_size=batch_size)
+        # O bulk_update não envia signals: o índice de pesquisa é atualizado aqui.
+        from .search import index_users
+        index_users([user.pk for user in pending], self.db)
+        return len(pending)
+
     def generate_unique_invitation_code(self):
+        """
+        Gerador aleatório antigo, com verificação na base de dados. Só é usado
+        se o código derivado da chave primária colidir com um código antigo.
+        """
         length = 10
         characters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
         while True:
@@ -81,6 +99,17 @@ class CustomUser(AbstractUser):
     )
     my_invitation_code = models.CharField(max_length=20, unique=True, blank=True, null=True, verbose_name="Meu Código de Convite")
     invited_by_code = models.CharField(max_length=20, blank=True, null=True, verbose_name="Convidado Pelo Código")
+    invited_by = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='invitees',
+        verbose_name="Convidado Por"
+    )
+    # Contadores da equipa, mantidos por core.referrals na mesma transação que os altera
+    team_size = models.IntegerField(default=0, verbose_name="Total de Convidados")
+    invested_team_size = models.IntegerField(default=0, verbose_name="Convidados que Investiram")
     referral_income = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), verbose_name="Ganhos de Convite")
     can_spin_lucky_wheel = models.BooleanField(default=False, verbose_name="Pode Rodar Roleta da Sorte")
     daily_spins_remaining = models.IntegerField(default=0, verbose_name="Giros Diários Restantes")
@@ -97,11 +126,44 @@ class CustomUser(AbstractUser):
     class Meta:
         verbose_name = "Usuário"
         verbose_name_plural = "Usuários"
+        indexes = [
+            # Contagem e listagem de referidos (home_view, team_view)
+            models.Index(fields=['invited_by_code'], name='core_user_invited_by_idx'),
+            # Listagem paginada por cursor da equipa (team_view)
+            models.Index(fields=['invited_by', '-date_joined', '-id'], name='core_user_team_page_idx'),
+            # Ordenação e filtro por data das listagens do admin
+            models.Index(fields=['-date_joined', '-id'], name='core_user_joined_idx'),
+        ]
         
     def save(self, *args, **kwargs):
-        if not self.my_invitation_code:
-            self.my_invitation_code = CustomUser.objects.generate_unique_invitation_code()
-        super().save(*args, **kwargs)
+        if self.my_invitation_code:
+            return super().save(*args, **kwargs)
+        using = kwargs.get('using') or router.db_for_write(CustomUser, instance=self)
+        created = self._state.adding
+        # INSERT, código e índice de pesquisa na mesma transação: um único commit por registo.
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            self._assign_invitation_code(using)
+            from .search import index_new_user, index_users
+            if created:
+                index_new_user(self, using)
+            else:
+                index_users([self.pk], using)
+
+    def _assign_invitation_code(self, using):
+        # O código é uma permutação com chave da chave primária: único entre os
+        # códigos derivados, gravado sem consultas de verificação. Só um código
+        # aleatório antigo pode ser igual; nesse caso a restrição unique falha,
+        # o savepoint desfaz só o UPDATE e usa-se o gerador antigo.
+        manager = CustomUser.objects.db_manager(using)
+        code = invitation_codes.encode(self.pk)
+        try:
+            with transaction.atomic(using=using):
+                manager.filter(pk=self.pk).update(my_invitation_code=code)
+        except IntegrityError:
+            code = manager.generate_unique_invitation_code()
+            manager.filter(pk=self.pk).update(my_invitation_code=code)
+        self.my_invitation_code = code
 
 # NOVO MODELO: UserProfile para dados do perfil e banco principal
 class UserProfile(models.Model):
@@ -123,8 +185,9 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 @receiver(post_save, sender=CustomUser)
-def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
+def save_user_profile(sender, instance, created, **kwargs):
+    # Na criação o perfil acabou de ser inserido por create_user_profile.
+    if not created and hasattr(instance, 'profile'):
         instance.profile.save()
 
 # Produto de Investimento
@@ -171,6 +234,13 @@ class Deposit(models.Model):
     proof_image = models.ImageField(upload_to='deposit_proofs/', blank=True, null=True, verbose_name="Comprovativo")
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending', verbose_name="Status")
     timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Data/Hora")
+    # Preenchidos pelo processamento em segundo plano do comprovativo (core/proofs.py)
+    # O ficheiro enviado (proof_image) fica sempre como prova; a cópia reduzida só serve a revisão.
+    proof_reduced = models.ImageField(upload_to='deposit_proofs/reduced/', blank=True, null=True, verbose_name="Cópia Reduzida do Comprovativo")
+    proof_thumbnail = models.ImageField(upload_to='deposit_proofs/thumbs/', blank=True, null=True, verbose_name="Miniatura do Comprovativo")
+    proof_original_size = models.PositiveIntegerField(null=True, blank=True, verbose_name="Tamanho Enviado (bytes)")
+    proof_size = models.PositiveIntegerField(null=True, blank=True, verbose_name="Tamanho da Cópia de Revisão (bytes)")
+    proof_processed_at = models.DateTimeField(null=True, blank=True, verbose_name="Comprovativo Processado em")
 
     def __str__(self):
         return f"Depósito de {self.user.username} - Kz {self.amount} ({self.status})"
@@ -179,6 +249,14 @@ class Deposit(models.Model):
         verbose_name = "Depósito"
         verbose_name_plural = "Depósitos"
         ordering = ['-timestamp']
+        indexes = [
+            # Histórico do usuário por estado (income_view)
+            models.Index(fields=['user', 'status', '-timestamp'], name='core_dep_user_status_ts_idx'),
+            # Fila de revisão do admin: só os pendentes
+            models.Index(fields=['-timestamp'], condition=models.Q(status='Pending'), name='core_dep_pending_ts_idx'),
+            # Lista do admin (ordem -timestamp, -id) e filtro por data
+            models.Index(fields=['-timestamp', '-id'], name='core_dep_ts_idx'),
+        ]
 
 # Modelo para as contas bancárias do usuário (para retirada)
 class UserBankAccount(models.Model):
@@ -219,6 +297,14 @@ class Withdrawal(models.Model):
         verbose_name = "Retirada"
         verbose_name_plural = "Retiradas"
         ordering = ['-timestamp']
+        indexes = [
+            # Histórico do usuário por estado (income_view)
+            models.Index(fields=['user', 'status', '-timestamp'], name='core_wdr_user_status_ts_idx'),
+            # Fila de revisão do admin: só os pendentes
+            models.Index(fields=['-timestamp'], condition=models.Q(status='Pending'), name='core_wdr_pending_ts_idx'),
+            # Lista do admin (ordem -timestamp, -id) e filtro por data
+            models.Index(fields=['-timestamp', '-id'], name='core_wdr_ts_idx'),
+        ]
 
 # Modelo para Tarefas, agora referenciando o modelo 'Product'
 class Task(models.Model):
@@ -236,6 +322,15 @@ class Task(models.Model):
         verbose_name = "Tarefa"
         verbose_name_plural = "Tarefas"
         ordering = ['-creation_date']
+        indexes = [
+            # Tarefas ativas/concluídas do usuário (income_view, tasks_view). São índices
+            # parciais porque o Django compila `is_completed=False` como `NOT is_completed`,
+            # que um índice composto (user, is_completed) não consegue aproveitar.
+            models.Index(fields=['user', '-creation_date'], condition=models.Q(is_completed=False), name='core_task_user_open_idx'),
+            models.Index(fields=['user', '-completion_date'], condition=models.Q(is_completed=True), name='core_task_user_done_idx'),
+            # Lista do admin (ordem -creation_date, -id) e filtro por data
+            models.Index(fields=['-creation_date', '-id'], name='core_task_created_idx'),
+        ]
 
 # Modelo para Informações de Suporte (Contatos e Regras)
 class SupportInfo(models.Model):
@@ -284,3 +379,184 @@ class LuckyWheelSpin(models.Model):
         # CORREÇÃO AQUI: 'verbose_plural_name' foi alterado para 'verbose_name_plural'
         verbose_name_plural = "Giros da Roda da Sorte"
         ordering = ['-spin_time']
+        indexes = [
+            models.Index(fields=['user', '-spin_time'], name='core_spin_user_time_idx'),
+            # Lista do admin (ordem -spin_time, -id) e filtro por data
+            models.Index(fields=['-spin_time', '-id'], name='core_spin_time_idx'),
+        ]
+
+# --- Livro-razão (ledger) de movimentos de saldo ---
+
+class LedgerEntry(models.Model):
+    """
+    Registo imutável (apenas inserção) de cada movimento de saldo de um usuário.
+    O valor é positivo para créditos e negativo para débitos.
+    """
+    DEPOSIT = 'deposit'
+    WITHDRAWAL = 'withdrawal'
+    WITHDRAWAL_REFUND = 'withdrawal_refund'
+    PRODUCT_PURCHASE = 'product_purchase'
+    TASK_INCOME = 'task_income'
+    REFERRAL_BONUS = 'referral_bonus'
+    LUCKY_WHEEL = 'lucky_wheel'
+    ADJUSTMENT = 'adjustment'
+    OPENING_BALANCE = 'opening_balance'
+    ENTRY_TYPE_CHOICES = [
+        (DEPOSIT, 'Depósito Aprovado'),
+        (WITHDRAWAL, 'Retirada'),
+        (WITHDRAWAL_REFUND, 'Reembolso de Retirada'),
+        (PRODUCT_PURCHASE, 'Compra de Produto'),
+        (TASK_INCOME, 'Renda de Tarefa'),
+        (REFERRAL_BONUS, 'Bónus de Convite'),
+        (LUCKY_WHEEL, 'Prémio da Roda da Sorte'),
+        (ADJUSTMENT, 'Ajuste Manual'),
+        (OPENING_BALANCE, 'Saldo de Abertura'),
+    ]
+
+    BALANCE = 'balance'
+    BONUS_BALANCE = 'bonus_balance'
+    ACCOUNT_CHOICES = [
+        (BALANCE, 'Saldo'),
+        (BONUS_BALANCE, 'Saldo Bônus'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='ledger_entries', verbose_name="Usuário")
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPE_CHOICES, verbose_name="Tipo de Movimento")
+    account = models.CharField(max_length=20, choices=ACCOUNT_CHOICES, default=BALANCE, verbose_name="Conta")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Valor")
+    description = models.CharField(max_length=255, blank=True, default='', verbose_name="Descrição")
+    created = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Data/Hora")
+
+    def __str__(self):
+        return f"{self.get_entry_type_display()} - Kz {self.amount}"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Movimentos do livro-razão não podem ser alterados.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Movimentos do livro-razão não podem ser apagados.")
+
+    class Meta:
+        verbose_name = "Movimento de Saldo"
+        verbose_name_plural = "Movimentos de Saldo"
+        ordering = ['-created']
+        indexes = [
+            models.Index(fields=['user', 'created'], name='core_ledger_user_created_idx'),
+            # Lista do admin (ordem -created, -id) e filtro por data
+            models.Index(fields=['-created', '-id'], name='core_ledger_created_idx'),
+        ]
+
+
+class UserLedgerTotals(models.Model):
+    """
+    Totais acumulados por usuário e por tipo de movimento, mantidos na mesma
+    transação que insere o LedgerEntry correspondente.
+    Cada coluna é a soma (com sinal) dos movimentos daquele tipo.
+    """
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='ledger_totals', verbose_name="Usuário")
+    deposit = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Total de Depósitos")
+    withdrawal = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Total de Retiradas")
+    withdrawal_refund = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Total de Reembolsos")
+    product_purchase = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Total de Compras de Produto")
+    task_income = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Total de Renda de Tarefas")
+    referral_bonus = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Total de Bónus de Convite")
+    lucky_wheel = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Total de Prémios da Roleta")
+    adjustment = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Total de Ajustes Manuais")
+    opening_balance = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Saldo de Abertura")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado Em")
+
+    def __str__(self):
+        return f"Totais de {self.user_id}"
+
+    class Meta:
+        verbose_name = "Totais do Livro-Razão"
+        verbose_name_plural = "Totais do Livro-Razão"
+
+
+# --- Fila de tarefas em segundo plano ---
+
+class Job(models.Model):
+    """
+    Tarefa em segundo plano guardada na própria base de dados (core/jobs.py),
+    executada pelo comando `runworker`. Como é inserida na mesma transação do
+    pedido, só fica visível para o worker se o pedido fizer commit.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Em fila'),
+        (RUNNING, 'Em execução'),
+        (DONE, 'Concluída'),
+        (FAILED, 'Falhou'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name="Tarefa")
+    queue = models.CharField(max_length=30, default='default', verbose_name="Fila")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Argumentos")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, verbose_name="Status")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentativas")
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name="Máximo de Tentativas")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Executar a Partir de")
+    locked_by = models.CharField(max_length=100, blank=True, default='', verbose_name="Worker")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Reservada Em")
+    last_error = models.TextField(blank=True, default='', verbose_name="Último Erro")
+    duration_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name="Duração (ms)")
+    created = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Criada Em")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Terminada Em")
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Tarefa em Segundo Plano"
+        verbose_name_plural = "Tarefas em Segundo Plano"
+        ordering = ['-created']
+        indexes = [
+            # Reserva de tarefas pelo worker: só as que estão em fila
+            models.Index(fields=['queue', 'run_after'], condition=models.Q(status='queued'), name='core_job_queued_idx'),
+            # Recuperação de tarefas de workers que morreram a meio
+            models.Index(fields=['locked_at'], condition=models.Q(status='running'), name='core_job_running_idx'),
+        ]
+
+
+# --- Índice de pesquisa do admin ---
+
+class SearchEntry(models.Model):
+    """
+    Valor normalizado (telefone, IBAN, código de convite, nome, e-mail) pelo qual um
+    usuário pode ser encontrado no admin, mantido por core/search.py. A pesquisa
+    pelo início do valor usa o índice de `value`; no Postgres com pg_trgm há
+    também um índice de trigramas para pesquisar qualquer parte do valor.
+    """
+    PHONE = 'phone'
+    USERNAME = 'username'
+    IBAN = 'iban'
+    CODE = 'code'
+    NAME = 'name'
+    EMAIL = 'email'
+    KIND_CHOICES = [
+        (PHONE, 'Telefone'),
+        (USERNAME, 'Nome de Usuário'),
+        (IBAN, 'IBAN'),
+        (CODE, 'Código de Convite'),
+        (NAME, 'Nome Completo'),
+        (EMAIL, 'E-mail'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='search_entries', verbose_name="Usuário")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name="Tipo")
+    value = models.CharField(max_length=255, db_index=True, verbose_name="Valor Normalizado")
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.value}"
+
+    class Meta:
+        verbose_name = "Entrada de Pesquisa"
+        verbose_name_plural = "Entradas de Pesquisa"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'kind', 'value'], name='core_search_entry_unique'),
+        ]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/paginators.py
+
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Abaixo deste número de linhas (estimado) o COUNT(*) exato é barato e é usado.
+EXACT_COUNT_LIMIT = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginador do admin que evita o `COUNT(*)` exato em tabelas grandes no
+    Postgres: sem filtros usa a estimativa do catálogo (`pg_class.reltuples`,
+    atualizada pelo autovacuum/ANALYZE); com filtros usa a estimativa de linhas
+    do planeador (`EXPLAIN`). Se a estimativa ficar abaixo de EXACT_COUNT_LIMIT
+    conta-se de forma exata. Noutras bases de dados a contagem é sempre exata.
+
+    O total mostrado é aproximado, por isso a última página pode vir vazia ou
+    incompleta; a navegação pelas primeiras páginas não é afetada.
+    """
+    exact_count_limit = EXACT_COUNT_LIMIT
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            estimate = self._estimate(queryset, connection)
+            if estimate is not None and estimate >= self.exact_count_limit:
+                return estimate
+        return super().count
+
+    def _estimate(self, queryset, connection):
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+                # -1: tabela ainda sem estatísticas (nunca analisada).
+                return row[0] if row and row[0] >= 0 else None
+
+            sql, params = queryset.order_by().query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/proofs.py
+
+import io
+import logging
+import os
+from dataclasses import dataclass
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import jobs
+from .models import Deposit
+
+logger = logging.getLogger(__name__)
+
+# Lado maior da cópia guardada do comprovativo (legível para conferir valores e IBAN).
+MAX_SIDE = 1600
+JPEG_QUALITY = 80
+# Miniatura mostrada na lista do admin.
+THUMBNAIL_SIDE = 320
+THUMBNAIL_QUALITY = 70
+
+
+@dataclass
+class ProofResult:
+    original_bytes: int = 0
+    # Bytes da cópia aberta na revisão: a reduzida ou, se não compensar, o original.
+    stored_bytes: int = 0
+    thumbnail_bytes: int = 0
+
+    @property
+    def bytes_saved(self):
+        # Poupados em cada abertura do comprovativo no admin (o original fica guardado).
+        return self.original_bytes - self.stored_bytes
+
+
+def schedule(deposit_id):
+    """
+    Põe o processamento do comprovativo na fila `media` (core/jobs.py): o
+    pedido de depósito responde sem esperar pelo Pillow. A fila `media` é
+    servida por um worker com acesso ao mesmo MEDIA_ROOT do serviço web.
+    """
+    jobs.enqueue(process_proof_job, deposit_id=deposit_id)
+
+
+@jobs.job(queue='media', max_attempts=3)
+def process_proof_job(deposit_id):
+    result = process_proof(deposit_id)
+    if result:
+        logger.info("Comprovativo do depósito #%s: cópia de revisão com %s bytes a menos.", deposit_id, result.bytes_saved)
+
+
+def _encode_jpeg(image, quality):
+    buffer = io.BytesIO()
+    # Sem `exif=`: a cópia gravada não leva metadados (GPS, modelo do telefone...).
+    image.save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def process_proof(deposit_id):
+    """
+    Gera a cópia reduzida (sem EXIF, 1600 px) e a miniatura de revisão do
+    comprovativo de um depósito. O ficheiro enviado nunca é alterado nem
+    apagado: é a prova do pagamento. Se a cópia reduzida não for mais pequena
+    do que o original (uma captura de ecrã pequena, por exemplo), não é
+    gravada e a revisão usa o original. Devolve um ProofResult, ou None se
+    não houver nada a fazer (sem imagem ou já processada).
+    """
+    deposit = Deposit.objects.filter(pk=deposit_id).only('proof_image', 'proof_processed_at').first()
+    if deposit is None or not deposit.proof_image or deposit.proof_processed_at:
+        return None
+
+    storage = deposit.proof_image.storage
+    original_name = deposit.proof_image.name
+    result = ProofResult(original_bytes=storage.size(original_name))
+
+    try:
+        with storage.open(original_name, 'rb') as source:
+            image = Image.open(source)
+            # Num JPEG, o descodificador lê logo numa escala reduzida (muito mais rápido em fotos de 12 MP).
+            image.draft('RGB', (MAX_SIDE, MAX_SIDE))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGB')
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        # DecompressionBombError (imagem acima de 2 × Image.MAX_IMAGE_PIXELS) não é um
+        # OSError: sem ela aqui a tarefa falharia em todas as tentativas e o depósito
+        # ficaria "em processamento" para sempre.
+        logger.warning(
+            "Comprovativo do depósito #%s não é uma imagem válida ou é grande demais; fica só o ficheiro enviado.",
+            deposit_id,
+        )
+        Deposit.objects.filter(pk=deposit_id).update(
+            proof_original_size=result.original_bytes, proof_size=result.original_bytes,
+            proof_processed_at=timezone.now(),
+        )
+        return None
+
+    image.thumbnail((MAX_SIDE, MAX_SIDE), Image.Resampling.LANCZOS)
+    reduced = _encode_jpeg(image, JPEG_QUALITY)
+    image.thumbnail((THUMBNAIL_SIDE, THUMBNAIL_SIDE), Image.Resampling.LANCZOS)
+    thumbnail = _encode_jpeg(image, THUMBNAIL_QUALITY)
+
+    base = os.path.splitext(os.path.basename(original_name))[0]
+    thumbnail_name = storage.save(f'deposit_proofs/thumbs/{base}.jpg', ContentFile(thumbnail))
+    reduced_name = None
+    if len(reduced) < result.original_bytes:
+        reduced_name = storage.save(f'deposit_proofs/reduced/{base}.jpg', ContentFile(reduced))
+        result.stored_bytes = len(reduced)
+    else:
+        result.stored_bytes = result.original_bytes
+    result.thumbnail_bytes = len(thumbnail)
+
+    # UPDATE só das colunas do comprovativo (não sobrescreve o estado se o admin
+    # aprovar o depósito entretanto) e só se ninguém o processou primeiro.
+    updated = Deposit.objects.filter(pk=deposit_id, proof_processed_at__isnull=True).update(
+        proof_reduced=reduced_name,
+        proof_thumbnail=thumbnail_name,
+        proof_original_size=result.original_bytes,
+        proof_size=result.stored_bytes,
+        proof_processed_at=timezone.now(),
+    )
+    if not updated:
+        storage.delete(thumbnail_name)
+        if reduced_name:
+            storage.delete(reduced_name)
+        return None
+    return result
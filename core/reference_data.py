@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/reference_data.py
+
+from django.utils.functional import SimpleLazyObject
+
+from .models import Bank, SupportInfo
+from .versioned_cache import VersionedData
+
+# Tabelas com poucas linhas que quase nunca mudam: ficam em memória em cada
+# processo e são invalidadas ao gravar/apagar no admin (core/versioned_cache.py).
+# Cada processo confirma a versão na cache partilhada no máximo a cada
+# REFERENCE_DATA_RECHECK_SECONDS; com a DatabaseCache de produção essa
+# confirmação é uma consulta, e as leituras entre confirmações não fazem nenhuma.
+_banks = VersionedData(
+    'banks',
+    load=lambda: list(Bank.objects.filter(is_active=True).order_by('name')),
+    build=tuple,
+).watch(Bank)
+
+_support_info = VersionedData(
+    'support_info',
+    # Uma lista (e não o objeto ou None) para que "não há linha" também fique em cache.
+    load=lambda: list(SupportInfo.objects.order_by('pk')[:1]),
+    build=lambda rows: rows[0] if rows else None,
+).watch(SupportInfo)
+
+
+def active_banks():
+    """
+    Bancos ativos para depósito.
+    """
+    return list(_banks.get())
+
+
+def support_info():
+    """
+    As informações de suporte da plataforma (a primeira linha), ou None.
+    """
+    return _support_info.get()
+
+
+def support_info_with_version():
+    """
+    (versão, support_info()): a versão é a chave da cache do fragmento de
+    template com as informações de suporte.
+    """
+    return _support_info.get_with_version()
+
+
+async def asupport_info_with_version():
+    """
+    support_info_with_version() para as views assíncronas.
+    """
+    return await _support_info.aget_with_version()
+
+
+def reference_data(request):
+    """
+    Context processor: `support_info` e `active_banks` em todos os templates.
+    São avaliados só se o template os usar.
+    """
+    return {
+        'support_info': SimpleLazyObject(support_info),
+        'active_banks': SimpleLazyObject(active_banks),
+    }
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/referrals.py
+
+import datetime
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .models import CustomUser, Product
+
+
+def add_team_member(referrer_id):
+    """
+    Conta um novo convidado na equipa do referenciador (no registo).
+    """
+    CustomUser.objects.filter(pk=referrer_id).update(team_size=F('team_size') + 1)
+
+
+def mark_invested(user_ids):
+    """
+    Os usuários passaram de "sem produto" para "com produto": soma um
+    convidado investidor na equipa dos respetivos referenciadores.
+    """
+    _shift_invested(user_ids, +1)
+
+
+def assign_product(user_id, product, activated_at):
+    """
+    Atribui o produto ao usuário. "Primeiro investimento" é decidido pela
+    própria base de dados (UPDATE ... WHERE current_product IS NULL) e não pelo
+    request.user lido no início do pedido: de duas ativações simultâneas só uma
+    altera a linha e conta o investidor na equipa do referenciador.
+    Devolve True se foi o primeiro investimento.
+    """
+    users = CustomUser.objects.filter(pk=user_id)
+    changes = {'current_product': product, 'level_activation_date': activated_at}
+    with transaction.atomic():
+        first = bool(users.filter(current_product__isnull=True).update(**changes))
+        if first:
+            mark_invested([user_id])
+        else:
+            users.update(**changes)
+    return first
+
+
+def change_referrer(user, old_referrer_id, was_invested):
+    """
+    O referenciador do usuário mudou (admin): sai da equipa antiga como estava
+    (`was_invested`) e entra na nova como está agora, mesmo que o produto
+    tenha mudado no mesmo formulário.
+    """
+    moves = (
+        (old_referrer_id, -1, was_invested),
+        (user.invited_by_id, +1, user.current_product_id is not None),
+    )
+    with transaction.atomic():
+        for referrer_id, sign, invested in moves:
+            if not referrer_id:
+                continue
+            changes = {'team_size': F('team_size') + sign}
+            if invested:
+                changes['invested_team_size'] = F('invested_team_size') + sign
+            CustomUser.objects.filter(pk=referrer_id).update(**changes)
+
+
+def mark_not_invested(user_ids):
+    """
+    Os usuários deixaram de ter produto ativo (investimento concluído):
+    desconta-os da equipa investidora dos referenciadores.
+    """
+    _shift_invested(user_ids, -1)
+
+
+def _shift_invested(user_ids, sign):
+    if not user_ids:
+        return
+    referrer_ids = (
+        CustomUser.objects.filter(pk__in=list(user_ids), invited_by__isnull=False)
+        .values_list('invited_by_id', flat=True)
+    )
+    # Agrupa os referenciadores pelo número de convidados afetados: um UPDATE por valor distinto.
+    referrers_by_count = defaultdict(list)
+    for referrer_id, count in Counter(referrer_ids).items():
+        referrers_by_count[count].append(referrer_id)
+
+    with transaction.atomic():
+        for count, ids in referrers_by_count.items():
+            CustomUser.objects.filter(pk__in=ids).update(
+                invested_team_size=F('invested_team_size') + sign * count
+            )
+
+
+def _team_count(**filters):
+    counts = (
+        CustomUser.objects.filter(invited_by=OuterRef('pk'), **filters)
+        .order_by().values('invited_by').annotate(c=Count('pk')).values('c')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def reconcile_team_counters(batch_size=1000):
+    """
+    Recalcula team_size e invested_team_size a partir dos convidados reais e
+    corrige só os usuários em que os contadores divergem (alterações feitas por
+    fora das views e do admin, como UPDATEs manuais). Devolve quantos foram corrigidos.
+    """
+    drifted = list(
+        CustomUser.objects.annotate(actual_team=_team_count(), actual_invested=_team_count(current_product__isnull=False))
+        .filter(~Q(team_size=F('actual_team')) | ~Q(invested_team_size=F('actual_invested')))
+        .values_list('pk', flat=True)
+    )
+    for start in range(0, len(drifted), batch_size):
+        CustomUser.objects.filter(pk__in=drifted[start:start + batch_size]).update(
+            team_size=_team_count(),
+            invested_team_size=_team_count(current_product__isnull=False),
+        )
+    return len(drifted)
+
+
+# --- Manutenção pelos signals ---
+
+@receiver(pre_delete, sender=CustomUser, dispatch_uid='core.referrals.user_deleted')
+def _user_deleted(sender, instance, using=None, **kwargs):
+    # Relê a linha (dentro da transação do delete): a instância pode estar
+    # desatualizada, como o request.user de um pedido antigo.
+    row = CustomUser.objects.using(using).filter(pk=instance.pk).values_list('invited_by_id', 'current_product_id').first()
+    if not row or not row[0]:
+        return
+    referrer_id, product_id = row
+    changes = {'team_size': F('team_size') - 1}
+    if product_id:
+        changes['invested_team_size'] = F('invested_team_size') - 1
+    CustomUser.objects.using(using).filter(pk=referrer_id).update(**changes)
+
+
+@receiver(pre_delete, sender=Product, dispatch_uid='core.referrals.product_deleted')
+def _product_deleted(sender, instance, **kwargs):
+    # O on_delete=SET_NULL limpa o produto dos usuários sem signals: descontam-se antes.
+    mark_not_invested(CustomUser.objects.filter(current_product=instance).values_list('pk', flat=True))
+
+
+# Quantidade fixa de convidados por página na página da equipa.
+TEAM_PAGE_SIZE = 50
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def encode_cursor(invitee):
+    """
+    Cursor opaco "<microssegundos>.<id>" da posição (date_joined, id) de um convidado.
+    """
+    micros = (invitee.date_joined - _EPOCH) // datetime.timedelta(microseconds=1)
+    return f"{micros}.{invitee.pk}"
+
+
+def decode_cursor(cursor):
+    """
+    Devolve (date_joined, id) de um cursor, ou None se for inválido.
+    """
+    try:
+        micros, pk = cursor.split('.')
+        return _EPOCH + datetime.timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def team_page(user, after=None, invested=None, page_size=TEAM_PAGE_SIZE):
+    """
+    Uma página de convidados do usuário, do mais recente para o mais antigo,
+    com paginação por cursor (keyset) sobre (date_joined, id): cada página é uma
+    procura no índice a partir do cursor, por isso o custo não cresce com a profundidade.
+    `invested` filtra por convidados com (True) ou sem (False) produto ativo.
+    Devolve (convidados, cursor_da_próxima_página_ou_None).
+    """
+    invitees = (
+        CustomUser.objects.filter(invited_by=user)
+        .select_related('current_product')
+        .only('username', 'date_joined', 'current_product__level_name')
+        .order_by('-date_joined', '-pk')
+    )
+    if invested is not None:
+        invitees = invitees.filter(current_product__isnull=not invested)
+
+    position = decode_cursor(after) if after else None
+    if position:
+        date_joined, pk = position
+        # O primeiro termo (date_joined <= cursor) permite ao planeador começar a leitura
+        # do índice na posição do cursor; o OR sozinho obrigaria a percorrer as páginas anteriores.
+        invitees = invitees.filter(
+            Q(date_joined__lte=date_joined),
+            Q(date_joined__lt=date_joined) | Q(pk__lt=pk),
+        )
+
+    rows = list(invitees[:page_size + 1])
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/search.py
+
+import re
+import time
+import unicodedata
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CustomUser, SearchEntry, UserBankAccount, UserProfile
+
+# Campos do CustomUser que entram no índice de pesquisa.
+INDEXED_USER_FIELDS = {'username', 'phone_number', 'my_invitation_code', 'email'}
+# Índice GIN de trigramas criado pela migração 0009 quando o pg_trgm existe.
+TRIGRAM_INDEX = 'core_search_value_trgm_idx'
+# Com menos caracteres um trigrama não ajuda: pesquisa-se só pelo início.
+TRIGRAM_MIN_LENGTH = 3
+# Sem o índice (migração 0009 por aplicar ou pg_trgm ainda por instalar), volta-se
+# a procurá-lo depois deste intervalo, sem ser preciso reiniciar o processo.
+TRIGRAM_RECHECK_SECONDS = 300
+
+
+def _fold(value):
+    # Maiúsculas e sem acentos ("João" -> "JOAO").
+    value = unicodedata.normalize('NFKD', value)
+    return ''.join(char for char in value if not unicodedata.combining(char)).upper()
+
+
+def normalize_compact(value):
+    """
+    Códigos e IBANs: só letras e dígitos, em maiúsculas ("ao06 0040-00" -> "AO06004000").
+    """
+    return re.sub(r'[^0-9A-Z]', '', _fold(value or ''))
+
+
+def normalize_name(value):
+    """
+    Nomes: palavras em maiúsculas, sem acentos, separadas por um só espaço.
+    """
+    return ' '.join(re.findall(r'[0-9A-Z]+', _fold(value or '')))
+
+
+def normalize_phone(value):
+    """
+    Telefones: só os dígitos, sem o indicativo +244 nem o 0 inicial (como no registo).
+    """
+    digits = re.sub(r'\D', '', value or '')
+    if digits.startswith('2449'):
+        return digits[3:]
+    if digits.startswith('09'):
+        return digits[1:]
+    return digits
+
+
+def normalize_email(value):
+    """
+    E-mails: sem espaços à volta, em maiúsculas e sem acentos, com o @ e a pontuação.
+    """
+    return _fold((value or '').strip())
+
+
+def entries_for(username, phone_number, invitation_code, full_name=None, ibans=(), email=None):
+    """
+    Os pares (tipo, valor normalizado) que tornam um usuário pesquisável.
+    """
+    entries = set()
+    phone = normalize_phone(phone_number)
+    if phone:
+        entries.add((SearchEntry.PHONE, phone))
+    # O username é o telefone, exceto em contas criadas à mão (ex.: "admin").
+    if username and normalize_phone(username) != phone:
+        entries.add((SearchEntry.USERNAME, normalize_compact(username)))
+    if invitation_code:
+        entries.add((SearchEntry.CODE, normalize_compact(invitation_code)))
+    if normalize_name(full_name):
+        entries.add((SearchEntry.NAME, normalize_name(full_name)[:255]))
+    for iban in ibans:
+        if normalize_compact(iban):
+            entries.add((SearchEntry.IBAN, normalize_compact(iban)))
+    if email and '@' in email:
+        entries.add((SearchEntry.EMAIL, normalize_email(email)[:255]))
+    return {(kind, value) for kind, value in entries if value}
+
+
+def collect(user_ids, user_model=CustomUser, account_model=UserBankAccount, using=None):
+    """
+    `{user_id: {(tipo, valor), ...}}` para os usuários dados, com duas consultas.
+    Os modelos são parâmetros para que a migração use os modelos históricos.
+    """
+    accounts = {}
+    for user_id, iban in account_model.objects.using(using).filter(user_id__in=user_ids).values_list('user_id', 'iban'):
+        accounts.setdefault(user_id, []).append(iban)
+    users = user_model.objects.using(using).filter(pk__in=user_ids).values_list(
+        'pk', 'username', 'phone_number', 'my_invitation_code', 'profile__full_name', 'profile__iban', 'email',
+    )
+    return {
+        pk: entries_for(username, phone, code, full_name, [profile_iban or '', *accounts.get(pk, ())], email)
+        for pk, username, phone, code, full_name, profile_iban, email in users
+    }
+
+
+def index_users(user_ids, using=None):
+    """
+    Sincroniza as entradas de pesquisa dos usuários dados: lê o estado atual e
+    só apaga/insere o que mudou (gravar um usuário sem mudar estes campos não escreve nada).
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    using = using or router.db_for_write(SearchEntry)
+    wanted = collect(user_ids, using=using)
+    current = {}
+    for pk, user_id, kind, value in SearchEntry.objects.using(using).filter(user_id__in=user_ids).values_list('pk', 'user_id', 'kind', 'value'):
+        current[(user_id, kind, value)] = pk
+
+    desired = {(user_id, kind, value) for user_id, entries in wanted.items() for kind, value in entries}
+    stale = [pk for key, pk in current.items() if key not in desired]
+    missing = [SearchEntry(user_id=user_id, kind=kind, value=value) for user_id, kind, value in desired - current.keys()]
+    if not stale and not missing:
+        return
+    with transaction.atomic(using=using):
+        if stale:
+            SearchEntry.objects.using(using).filter(pk__in=stale).delete()
+        SearchEntry.objects.using(using).bulk_create(missing)
+
+
+def index_new_user(user, using=None):
+    """
+    Entradas de um usuário acabado de registar (sem perfil preenchido nem
+    contas bancárias, sem entradas antigas): um único INSERT, sem leituras.
+    """
+    entries = entries_for(user.username, user.phone_number, user.my_invitation_code, email=user.email)
+    SearchEntry.objects.using(using).bulk_create(
+        [SearchEntry(user_id=user.pk, kind=kind, value=value) for kind, value in entries]
+    )
+
+
+# {alias: (existe, time.monotonic() da verificação)}
+_trigram_checks = {}
+
+
+def _query_trigram_index(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [TRIGRAM_INDEX])
+        return cursor.fetchone() is not None
+
+
+def _has_trigram_index(alias):
+    # Depois de encontrado, o índice conta até ao fim do processo; enquanto não
+    # existir, volta a ser procurado a cada TRIGRAM_RECHECK_SECONDS.
+    if connections[alias].vendor != 'postgresql':
+        return False
+    now = time.monotonic()
+    found, checked_at = _trigram_checks.get(alias, (False, None))
+    if not found and (checked_at is None or now - checked_at >= TRIGRAM_RECHECK_SECONDS):
+        found = _query_trigram_index(alias)
+        _trigram_checks[alias] = (found, now)
+    return found
+
+
+def _match(value, alias):
+    if _has_trigram_index(alias) and len(value) >= TRIGRAM_MIN_LENGTH:
+        # LIKE '%valor%' servido pelo índice GIN de trigramas.
+        return Q(value__contains=value)
+    if connections[alias].vendor == 'postgresql':
+        # LIKE 'valor%' servido pelo índice varchar_pattern_ops que o Django cria para db_index.
+        return Q(value__startswith=value)
+    # O LIKE do SQLite ignora maiúsculas e não usa o índice; um intervalo usa.
+    return Q(value__gte=value, value__lt=value + '\U0010ffff')
+
+
+def search_values(term):
+    """
+    As formas normalizadas de um termo de pesquisa (como código/IBAN, como nome e,
+    se só tiver dígitos e pontuação, como telefone). Um termo com @ é um e-mail.
+    """
+    if '@' in term:
+        return {normalize_email(term)} - {''}
+    values = {normalize_compact(term), normalize_name(term)}
+    if re.fullmatch(r'[\d\s+().-]+', term):
+        values.add(normalize_phone(term))
+    return {value for value in values if value}
+
+
+def matching_users(term, using=None):
+    """
+    Subconsulta com os ids dos usuários cujo telefone, IBAN, código de convite,
+    nome ou e-mail começa pelo termo (ou o contém, no Postgres com pg_trgm).
+    """
+    alias = using or router.db_for_read(SearchEntry)
+    condition = Q()
+    for value in search_values(term):
+        condition |= _match(value, alias)
+    if not condition:
+        return SearchEntry.objects.none().values('user_id')
+    return SearchEntry.objects.using(alias).filter(condition).values('user_id')
+
+
+# --- Manutenção pelos signals ---
+
+def _schedule(user_id, using):
+    transaction.on_commit(lambda: index_users([user_id], using), using=using)
+
+
+@receiver(post_save, sender=CustomUser, dispatch_uid='core.search.user_saved')
+def _user_saved(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not INDEXED_USER_FIELDS & set(update_fields)):
+        return
+    # Sem código, CustomUser.save() indexa o usuário depois de o atribuir.
+    if instance.my_invitation_code:
+        index_users([instance.pk], using)
+
+
+@receiver(post_save, sender=UserProfile, dispatch_uid='core.search.profile_saved')
+def _profile_saved(sender, instance, created, raw=False, using=None, **kwargs):
+    # O perfil vazio criado com o usuário não acrescenta nada ao índice.
+    if raw or (created and not (instance.full_name or instance.iban)):
+        return
+    index_users([instance.user_id], using)
+
+
+@receiver(post_save, sender=UserBankAccount, dispatch_uid='core.search.account_saved')
+def _account_saved(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        index_users([instance.user_id], using)
+
+
+@receiver(post_delete, sender=UserBankAccount, dispatch_uid='core.search.account_deleted')
+def _account_deleted(sender, instance, using=None, **kwargs):
+    # Depois do commit: se a conta saiu por cascata do próprio usuário, este já
+    # não existe e não há nada a reindexar.
+    _schedule(instance.user_id, using)
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/synthetic.py
+
+import dataclasses
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import invitation_codes, referrals, search
+from .models import (
+    Bank, CustomUser, Deposit, LuckyWheelPrize, LuckyWheelSpin, Product, SearchEntry,
+    SupportInfo, Task, UserLedgerTotals, UserProfile, Withdrawal,
+)
+
+# Palavra-passe de todos os usuários sintéticos (o hash é calculado uma só vez).
+DEFAULT_PASSWORD = 'senha123'
+# Telefones sintéticos: 90 + 7 dígitos (prefixo sem operadora em Angola, até 10 milhões de usuários).
+PHONE_PREFIX = '90'
+
+PRODUCTS = [
+    # (nível, valor mínimo, renda diária, duração em dias)
+    ('VIP 1', Decimal('5000.00'), Decimal('250.00'), 30),
+    ('VIP 2', Decimal('15000.00'), Decimal('800.00'), 30),
+    ('VIP 3', Decimal('40000.00'), Decimal('2200.00'), 45),
+    ('VIP 4', Decimal('100000.00'), Decimal('5800.00'), 60),
+    ('VIP 5', Decimal('250000.00'), Decimal('15000.00'), 90),
+]
+BANKS = [('BAI', 'Plataforma Lda', 'AO06004000000000000000001'), ('BFA', 'Plataforma Lda', 'AO06000600000000000000002'), ('BIC', 'Plataforma Lda', 'AO06005100000000000000003')]
+PRIZES = [(Decimal('0.00'), 60), (Decimal('50.00'), 25), (Decimal('200.00'), 10), (Decimal('1000.00'), 4), (Decimal('5000.00'), 1)]
+
+
+@dataclasses.dataclass
+class Shape:
+    """
+    Forma da distribuição dos dados sintéticos (médias por usuário e proporções).
+    """
+    referral_ratio: float = 0.8          # usuários que chegaram por convite
+    referral_skew: float = 0.5           # probabilidade de o convite vir de quem já convidou (equipas grandes)
+    invested_ratio: float = 0.4          # usuários com produto ativo
+    completed_tasks_per_user: float = 1.0
+    deposits_per_user: float = 2.0
+    withdrawals_per_user: float = 1.0
+    spins_per_user: float = 3.0
+    pending_ratio: float = 0.1           # depósitos/retiradas ainda por aprovar
+    history_days: int = 180              # antiguidade máxima das contas
+
+
+def _count(rng, mean):
+    # Número inteiro com a média pedida (exponencial arredondada: muitos com poucos, alguns com muitos).
+    if mean <= 0:
+        return 0
+    return int(rng.expovariate(1 / mean) + 0.5)
+
+
+def seed_reference_data():
+    """
+    Produtos, bancos, prémios e informação de suporte (idempotente).
+    """
+    products = []
+    for order, (name, minimum, daily, days) in enumerate(PRODUCTS, start=1):
+        product, _ = Product.objects.get_or_create(
+            level_name=name,
+            defaults={'min_deposit_amount': minimum, 'daily_income': daily, 'duration_days': days, 'order': order},
+        )
+        products.append(product)
+    banks = [
+        Bank.objects.get_or_create(name=name, defaults={'account_name': holder, 'iban': iban})[0]
+        for name, holder, iban in BANKS
+    ]
+    if not LuckyWheelPrize.objects.exists():
+        for value, weight in PRIZES:
+            LuckyWheelPrize.objects.create(value=value, weight=weight, daily_spins_allowed=1)
+    if not SupportInfo.objects.exists():
+        SupportInfo.objects.create(
+            whatsapp_number='244900000000', telegram_username='suporte',
+            platform_info="Informações da plataforma. " * 40, platform_rules="Regras da plataforma. " * 80,
+        )
+    return products, banks, list(LuckyWheelPrize.objects.filter(is_active=True))
+
+
+def update_team_counters():
+    """
+    Recalcula team_size e invested_team_size dos usuários gerados.
+    """
+    referrals.reconcile_team_counters()
+
+
+class _Generator:
+    """
+    Estado de uma geração: gerador aleatório, dados de referência, ids já
+    existentes (possíveis referenciadores) e o próximo id a atribuir.
+    """
+
+    def __init__(self, rng, shape, products, banks, prizes, total):
+        self.rng = rng
+        self.shape = shape
+        self.products = products
+        self.banks = banks
+        self.prizes = prizes
+        self.total = total
+        self.password = make_password(DEFAULT_PASSWORD)
+        self.now = timezone.now()
+        self.oldest = self.now - datetime.timedelta(days=shape.history_days)
+        self.today = timezone.localdate()
+        # Usuários que já existem também podem convidar (geração incremental).
+        self.ids = list(CustomUser.objects.order_by('pk').values_list('pk', flat=True))
+        # Um id por cada convite feito: escolher daqui dá mais convites a quem já convidou
+        # (ligação preferencial), o que gera algumas equipas muito grandes, como na realidade.
+        self.referrers = []
+        self.first_pk = self.next_pk = (CustomUser.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        self.replaced = {}
+        self.first_phone = CustomUser.objects.filter(username__startswith=PHONE_PREFIX).count()
+        self.created = 0
+
+    def _referrer(self):
+        rng = self.rng
+        if not self.ids or rng.random() >= self.shape.referral_ratio:
+            return None
+        if self.referrers and rng.random() < self.shape.referral_skew:
+            return rng.choice(self.referrers)
+        return rng.choice(self.ids)
+
+    def users(self, count):
+        """
+        Um lote de usuários com ids atribuídos aqui: o código de convite é
+        calculado antes da inserção, sem o UPDATE de `assign_invitation_codes`.
+        """
+        rng, products = self.rng, self.products
+        span = self.now - self.oldest
+        users = []
+        for _ in range(count):
+            pk, phone = self.next_pk, f'{PHONE_PREFIX}{self.first_phone + self.created:07d}'
+            referrer = self._referrer()
+            product = rng.choice(products) if products and rng.random() < self.shape.invested_ratio else None
+            joined = self.oldest + span * ((self.created + 1) / self.total)
+            users.append(CustomUser(
+                pk=pk, username=phone, phone_number=phone, password=self.password, date_joined=joined,
+                my_invitation_code=invitation_codes.encode(pk),
+                invited_by_id=referrer,
+                current_product=product,
+                level_activation_date=joined if product else None,
+                balance=Decimal(rng.randrange(0, 200000)),
+            ))
+            if referrer:
+                self.referrers.append(referrer)
+            self.ids.append(pk)
+            self.next_pk += 1
+            self.created += 1
+
+        # Códigos aleatórios antigos podem coincidir com um código derivado do id.
+        taken = set(CustomUser.objects.filter(
+            my_invitation_code__in=[user.my_invitation_code for user in users]
+        ).values_list('my_invitation_code', flat=True))
+        for user in users:
+            if user.my_invitation_code in taken:
+                user.my_invitation_code = self.replaced[user.pk] = CustomUser.objects.generate_unique_invitation_code()
+
+        # O código usado no convite é o do referenciador: derivado do id para os usuários
+        # gerados aqui; lido da base de dados para os que já existiam.
+        existing = {user.invited_by_id for user in users if user.invited_by_id and user.invited_by_id < self.first_pk}
+        codes = dict(CustomUser.objects.filter(pk__in=existing).values_list('pk', 'my_invitation_code')) if existing else {}
+        codes.update(self.replaced)
+        for user in users:
+            if user.invited_by_id:
+                user.invited_by_code = codes.get(user.invited_by_id) or invitation_codes.encode(user.invited_by_id)
+        return users
+
+    def activity(self, users):
+        """
+        Tarefas, depósitos, retiradas, giros e totais do livro-razão dos usuários do lote.
+        """
+        rng, shape, products = self.rng, self.shape, self.products
+        rows = {Task: [], Deposit: [], Withdrawal: [], LuckyWheelSpin: [], UserLedgerTotals: []}
+        for user in users:
+            product = user.current_product
+            task_income = Decimal('0.00')
+            if product:
+                rows[Task].append(Task(user_id=user.pk, product=product, last_income_calculation_date=self.today))
+            for _ in range(_count(rng, shape.completed_tasks_per_user)):
+                done = rng.choice(products)
+                rows[Task].append(Task(user_id=user.pk, product=done, is_completed=True, completion_date=self.now))
+                task_income += done.daily_income * done.duration_days
+
+            deposited = Decimal('0.00')
+            for _ in range(_count(rng, shape.deposits_per_user)):
+                amount = rng.choice(products).min_deposit_amount
+                status = 'Pending' if rng.random() < shape.pending_ratio else 'Approved'
+                deposited += amount if status == 'Approved' else 0
+                rows[Deposit].append(Deposit(user_id=user.pk, bank=rng.choice(self.banks), amount=amount, status=status))
+
+            withdrawn = Decimal('0.00')
+            for _ in range(_count(rng, shape.withdrawals_per_user)):
+                amount = Decimal(rng.randrange(2000, 50000))
+                status = 'Pending' if rng.random() < shape.pending_ratio else 'Approved'
+                withdrawn += amount if status == 'Approved' else 0
+                rows[Withdrawal].append(Withdrawal(
+                    user_id=user.pk, amount=amount, tax_percentage=Decimal('5.00'),
+                    amount_received=(amount * Decimal('0.95')).quantize(Decimal('0.01')), status=status,
+                ))
+
+            won = Decimal('0.00')
+            for _ in range(_count(rng, shape.spins_per_user)):
+                prize = rng.choice(self.prizes) if self.prizes else None
+                won += prize.value if prize else 0
+                rows[LuckyWheelSpin].append(LuckyWheelSpin(user_id=user.pk, prize_won=prize))
+
+            rows[UserLedgerTotals].append(UserLedgerTotals(
+                user_id=user.pk, deposit=deposited, withdrawal=-withdrawn,
+                task_income=task_income, lucky_wheel=won,
+                product_purchase=-product.min_deposit_amount if product else Decimal('0.00'),
+            ))
+        return rows
+
+
+def seed(users, seed=2025, shape=None, chunk_size=5000, progress=None):
+    """
+    Conjunto de dados reprodutível (a mesma semente gera os mesmos dados):
+    dados de referência, usuários com árvores de convite, perfis, contadores
+    de equipa e atividade. Tudo é gravado com bulk_create em lotes de
+    `chunk_size` usuários, sem os signals post_save (os perfis são criados
+    aqui, em massa). Se já existirem usuários, os novos juntam-se a eles.
+
+    `progress(etapa, feitos, total, linhas)` é chamado depois de cada lote.
+    Devolve o número de linhas por modelo e o tempo gasto.
+    """
+    shape = shape or Shape()
+    started = time.perf_counter()
+    products, banks, prizes = seed_reference_data()
+    generator = _Generator(random.Random(seed), shape, products, banks, prizes, users)
+
+    counts = {'users': 0, 'tasks': 0, 'deposits': 0, 'withdrawals': 0, 'spins': 0}
+    labels = {Task: 'tasks', Deposit: 'deposits', Withdrawal: 'withdrawals', LuckyWheelSpin: 'spins'}
+    while counts['users'] < users:
+        batch = generator.users(min(chunk_size, users - counts['users']))
+        activity = generator.activity(batch)
+        with transaction.atomic():
+            # Referenciadores de outro lote já foram gravados; os do mesmo lote vêm antes (ids menores).
+            CustomUser.objects.bulk_create(batch)
+            UserProfile.objects.bulk_create([UserProfile(user_id=user.pk) for user in batch])
+            # Sem signals: as entradas de pesquisa (telefone e código) são geradas aqui.
+            SearchEntry.objects.bulk_create([
+                SearchEntry(user_id=user.pk, kind=kind, value=value)
+                for user in batch
+                for kind, value in search.entries_for(user.username, user.phone_number, user.my_invitation_code)
+            ])
+            for model, objs in activity.items():
+                model.objects.bulk_create(objs)
+        counts['users'] += len(batch)
+        for model, label in labels.items():
+            counts[label] += len(activity[model])
+        if progress:
+            # Cada usuário tem também um perfil, uma linha de totais e duas entradas de pesquisa.
+            rows = 5 * counts['users'] + sum(counts[label] for label in labels.values())
+            progress('usuários', counts['users'], users, rows)
+
+    # Ids atribuídos à mão: a sequência do Postgres tem de avançar para os registos seguintes.
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [CustomUser]):
+            cursor.execute(sql)
+    update_team_counters()
+    if progress:
+        progress('contadores de equipa', users, users, 0)
+    return {**counts, 'seconds': round(time.perf_counter() - started, 2)}
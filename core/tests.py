@@ -1,3 +1,1406 @@
-from django.test import TestCase
+import datetime
+import importlib
+import io
+import json
+import math
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import Counter
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib import admin
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import F, Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import (
+    approvals, async_views, balance, catalog, income, invitation_codes, jobs, ledger, lucky_wheel, metrics,
+    proofs, reference_data, referrals, search, synthetic, urls, versioned_cache,
+)
+from .admin import CustomUserAdmin, DepositAdmin
+from .paginators import EstimatedCountPaginator
+from .models import (
+    Bank, CustomUser, Deposit, Job, LedgerEntry, LuckyWheelPrize, LuckyWheelSpin, Product, SearchEntry,
+    SupportInfo, Task, UserBankAccount, UserLedgerTotals, UserProfile, Withdrawal,
+)
+
+
+MONDAY = datetime.date(2026, 10, 12)
+SATURDAY = datetime.date(2026, 10, 17)
+
+
+def at_noon(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time(12)))
+
+
+class IncomeAccrualTests(TestCase):
+
+    def setUp(self):
+        self.product = Product.objects.create(
+            level_name='VIP 1', min_deposit_amount=Decimal('5000.00'), daily_income=Decimal('250.00'), duration_days=30,
+        )
+        self.count = 0
+
+    def _investor(self, activated, last_income=None, **extra):
+        self.count += 1
+        user = CustomUser.objects.create_user(
+            f'92350{self.count:04d}', password='senha123',
+            current_product=self.product, level_activation_date=at_noon(activated), **extra,
+        )
+        Task.objects.create(user=user, product=self.product, last_income_calculation_date=last_income)
+        return user
+
+    def _balance(self, user):
+        user.refresh_from_db()
+        return user.balance
+
+    def test_second_run_on_the_same_day_credits_nothing(self):
+        user = self._investor(MONDAY - datetime.timedelta(days=5), last_income=MONDAY - datetime.timedelta(days=3))
+        first = income.accrue_daily_income(day=MONDAY)
+        second = income.accrue_daily_income(day=MONDAY)
+        self.assertEqual((first.credited, second.credited, second.processed), (1, 0, 0))
+        self.assertEqual(self._balance(user), Decimal('250.00'))
+        self.assertEqual(LedgerEntry.objects.filter(user=user, entry_type=LedgerEntry.TASK_INCOME).count(), 1)
+        self.assertEqual(UserLedgerTotals.objects.get(user=user).task_income, Decimal('250.00'))
+        self.assertEqual(Task.objects.get(user=user).last_income_calculation_date, MONDAY)
+
+    def test_weekend_only_credits_tasks_never_credited(self):
+        credited_before = self._investor(SATURDAY - datetime.timedelta(days=5), last_income=SATURDAY - datetime.timedelta(days=1))
+        never_credited = self._investor(SATURDAY - datetime.timedelta(days=1))
+        result = income.accrue_daily_income(day=SATURDAY)
+        self.assertEqual(result.credited, 1)
+        self.assertEqual(self._balance(credited_before), Decimal('0.00'))
+        self.assertEqual(self._balance(never_credited), Decimal('250.00'))
+
+    def test_expired_task_is_completed_without_credit(self):
+        referrer = CustomUser.objects.create_user('923509999', password='senha123')
+        expired = self._investor(MONDAY - datetime.timedelta(days=30), invited_by=referrer)
+        CustomUser.objects.filter(pk=referrer.pk).update(team_size=1, invested_team_size=1)
+        active = self._investor(MONDAY - datetime.timedelta(days=29))
+
+        result = income.accrue_daily_income(day=MONDAY)
+        self.assertEqual((result.credited, result.completed), (1, 1))
+        expired.refresh_from_db()
+        referrer.refresh_from_db()
+        self.assertEqual((expired.balance, expired.current_product_id, expired.level_activation_date), (Decimal('0.00'), None, None))
+        self.assertTrue(Task.objects.get(user=expired).is_completed)
+        self.assertIsNotNone(Task.objects.get(user=expired).completion_date)
+        self.assertEqual(referrer.invested_team_size, 0)
+        self.assertEqual(self._balance(active), Decimal('250.00'))
+
+    def test_chunk_boundaries(self):
+        users = [self._investor(MONDAY - datetime.timedelta(days=2)) for _ in range(7)]
+        # Dois do mesmo usuário no mesmo lote somam-se num só UPDATE.
+        Task.objects.create(user=users[0], product=self.product)
+        result = income.accrue_daily_income(day=MONDAY, chunk_size=3)
+        self.assertEqual((result.chunks, result.credited), (3, 8))
+        self.assertEqual(self._balance(users[0]), Decimal('500.00'))
+        self.assertEqual([self._balance(user) for user in users[1:]], [Decimal('250.00')] * 6)
+        # Um lote exato (chunk_size igual ao número de tarefas) não deixa um lote vazio a mais.
+        Task.objects.update(last_income_calculation_date=None)
+        self.assertEqual(income.accrue_daily_income(day=MONDAY, chunk_size=8).chunks, 1)
+
+
+class LedgerTests(TestCase):
+
+    def setUp(self):
+        self.users = [CustomUser.objects.create_user(f'92360000{i}', password='senha123') for i in range(3)]
+        self.ids = [user.pk for user in self.users]
+
+    def _totals(self, user_id, column):
+        return getattr(UserLedgerTotals.objects.get(user_id=user_id), column)
+
+    def test_record_inserts_entry_and_updates_totals(self):
+        ledger.record(self.ids[0], LedgerEntry.DEPOSIT, Decimal('5000.00'))
+        ledger.record(self.ids[0], LedgerEntry.DEPOSIT, Decimal('1500.00'))
+        ledger.record(self.ids[0], LedgerEntry.WITHDRAWAL, Decimal('-2000.00'))
+        self.assertEqual(LedgerEntry.objects.filter(user_id=self.ids[0]).count(), 3)
+        self.assertEqual(self._totals(self.ids[0], 'deposit'), Decimal('6500.00'))
+        self.assertEqual(self._totals(self.ids[0], 'withdrawal'), Decimal('-2000.00'))
+
+        entry = LedgerEntry.objects.filter(user_id=self.ids[0]).first()
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
+
+    def test_record_many_sums_per_user_in_one_update(self):
+        ledger.record(self.ids[1], LedgerEntry.TASK_INCOME, Decimal('100.00'))
+        entries = [
+            (self.ids[0], Decimal('250.00'), 'a'),
+            (self.ids[0], Decimal('300.00'), 'b'),
+            (self.ids[1], Decimal('800.00'), 'c'),
+        ]
+        with CaptureQueriesContext(connection) as captured:
+            ledger.record_many(LedgerEntry.TASK_INCOME, entries)
+        self.assertEqual(len([query for query in captured if query['sql'].startswith('UPDATE')]), 1)
+        self.assertEqual(self._totals(self.ids[0], 'task_income'), Decimal('550.00'))
+        self.assertEqual(self._totals(self.ids[1], 'task_income'), Decimal('900.00'))
+        self.assertFalse(UserLedgerTotals.objects.filter(user_id=self.ids[2]).exists())
+        self.assertEqual(LedgerEntry.objects.filter(entry_type=LedgerEntry.TASK_INCOME).count(), 4)
+
+    def test_increment_by_user_applies_a_different_amount_per_row(self):
+        sums = {self.ids[0]: Decimal('10.50'), self.ids[1]: Decimal('0.25')}
+        CustomUser.objects.filter(pk__in=self.ids).update(balance=F('balance') + ledger.increment_by_user(sums))
+        balances = dict(CustomUser.objects.filter(pk__in=self.ids).values_list('pk', 'balance'))
+        self.assertEqual([balances[pk] for pk in self.ids], [Decimal('10.50'), Decimal('0.25'), Decimal('0.00')])
+
+    def test_backfill_estimates_totals_from_history(self):
+        backfill = importlib.import_module('core.migrations.0002_ledger').backfill_totals
+        user = self.users[0]
+        vip1 = Product.objects.create(level_name='VIP 1', min_deposit_amount=Decimal('5000.00'), daily_income=Decimal('250.00'), duration_days=30)
+        vip2 = Product.objects.create(level_name='VIP 2', min_deposit_amount=Decimal('15000.00'), daily_income=Decimal('800.00'), duration_days=30)
+        Deposit.objects.create(user=user, amount=Decimal('20000.00'), status='Approved')
+        Deposit.objects.create(user=user, amount=Decimal('1000.00'), status='Pending')
+        Withdrawal.objects.create(user=user, amount=Decimal('2000.00'), amount_received=Decimal('1900.00'), status='Approved')
+        Withdrawal.objects.create(user=user, amount=Decimal('500.00'), amount_received=Decimal('475.00'), status='Rejected')
+        # Só a tarefa concluída conta para a renda estimada: 250 x 30 dias.
+        Task.objects.create(user=user, product=vip1, is_completed=True)
+        Task.objects.create(user=user, product=vip2, is_completed=False)
+        CustomUser.objects.filter(pk=user.pk).update(referral_income=Decimal('300.00'))
+        prize = LuckyWheelPrize.objects.create(value=Decimal('100.00'))
+        LuckyWheelSpin.objects.create(user=user, prize_won=prize)
+        LuckyWheelSpin.objects.create(user=user, prize_won=None)
+
+        backfill(django_apps, None)
+        totals = UserLedgerTotals.objects.get(user=user)
+        self.assertEqual(
+            (totals.deposit, totals.withdrawal, totals.withdrawal_refund, totals.product_purchase,
+             totals.task_income, totals.referral_bonus, totals.lucky_wheel),
+            (Decimal('20000.00'), Decimal('-2500.00'), Decimal('500.00'), Decimal('-20000.00'),
+             Decimal('7500.00'), Decimal('300.00'), Decimal('100.00')),
+        )
+        # Usuários sem histórico não recebem linha.
+        self.assertEqual(UserLedgerTotals.objects.count(), 1)
+
+    def _assert_ledger_matches(self, user):
+        user.refresh_from_db()
+        totals = UserLedgerTotals.objects.get(user=user)
+        entries = LedgerEntry.objects.filter(user=user)
+        for entry_type, _ in LedgerEntry.ENTRY_TYPE_CHOICES:
+            total = entries.filter(entry_type=entry_type).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+            self.assertEqual(total, getattr(totals, entry_type), entry_type)
+        for account, _ in LedgerEntry.ACCOUNT_CHOICES:
+            total = entries.filter(account=account).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+            self.assertEqual(total, getattr(user, account), account)
+
+    def test_opening_entries_reconcile_history_with_totals_and_balances(self):
+        user, newcomer = self.users[0], self.users[1]
+        product = Product.objects.create(level_name='VIP 1', min_deposit_amount=Decimal('5000.00'), daily_income=Decimal('250.00'), duration_days=30)
+        Deposit.objects.create(user=user, amount=Decimal('20000.00'), status='Approved')
+        Task.objects.create(user=user, product=product, is_completed=True)
+        CustomUser.objects.filter(pk=user.pk).update(
+            balance=Decimal('21900.00'), bonus_balance=Decimal('300.00'), referral_income=Decimal('300.00'),
+        )
+        CustomUser.objects.filter(pk=newcomer.pk).update(balance=Decimal('50.00'))
+        importlib.import_module('core.migrations.0002_ledger').backfill_totals(django_apps, None)
+        # Movimentos reais gravados entre a migração 0002 e esta.
+        balance.credit(user.pk, Decimal('400.00'), LedgerEntry.DEPOSIT)
+
+        open_ledger = importlib.import_module('core.migrations.0012_ledger_opening_balances').open_ledger
+        editor = types.SimpleNamespace(connection=connection)
+        open_ledger(django_apps, editor)
+        for account in (user, newcomer):
+            self._assert_ledger_matches(account)
+        self.assertEqual(UserLedgerTotals.objects.get(user=newcomer).opening_balance, Decimal('50.00'))
+        # 21900 + 400 de saldo contra 20400 + 7500 - 5000 de histórico.
+        opening = LedgerEntry.objects.get(user=user, entry_type=LedgerEntry.OPENING_BALANCE, account=LedgerEntry.BALANCE)
+        self.assertEqual(opening.amount, Decimal('-600.00'))
+
+        count = LedgerEntry.objects.count()
+        open_ledger(django_apps, editor)
+        self.assertEqual(LedgerEntry.objects.count(), count)
+
+    def test_admin_balance_edits_are_recorded_as_adjustments(self):
+        user = self.users[0]
+        balance.credit(user.pk, Decimal('1000.00'), LedgerEntry.DEPOSIT)
+        user.refresh_from_db()
+        user.balance = Decimal('1250.00')
+        user.bonus_balance = Decimal('-20.00')
+        form = types.SimpleNamespace(
+            changed_data=['balance', 'bonus_balance'],
+            initial={'balance': Decimal('1000.00'), 'bonus_balance': Decimal('0.00')},
+        )
+        request = types.SimpleNamespace(user=self.users[2])
+        CustomUserAdmin(CustomUser, admin.site).save_model(request, user, form, change=True)
+
+        adjustments = dict(LedgerEntry.objects.filter(user=user, entry_type=LedgerEntry.ADJUSTMENT).values_list('account', 'amount'))
+        self.assertEqual(adjustments, {LedgerEntry.BALANCE: Decimal('250.00'), LedgerEntry.BONUS_BALANCE: Decimal('-20.00')})
+        self.assertEqual(self._totals(user.pk, 'adjustment'), Decimal('230.00'))
+        self._assert_ledger_matches(user)
+
+
+class BalanceServiceTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('923700001', password='senha123', balance=Decimal('5000.00'))
+
+    def _user(self):
+        return CustomUser.objects.get(pk=self.user.pk)
+
+    def test_debit_down_to_exactly_zero(self):
+        balance.debit(self.user.pk, Decimal('3000.00'), LedgerEntry.PRODUCT_PURCHASE, description='VIP 1')
+        balance.debit(self.user.pk, Decimal('2000.00'), LedgerEntry.PRODUCT_PURCHASE)
+        self.assertEqual(self._user().balance, Decimal('0.00'))
+        self.assertEqual(
+            sorted(LedgerEntry.objects.filter(user=self.user).values_list('amount', flat=True)),
+            [Decimal('-3000.00'), Decimal('-2000.00')],
+        )
+        self.assertEqual(UserLedgerTotals.objects.get(user=self.user).product_purchase, Decimal('-5000.00'))
+
+    def test_insufficient_balance_writes_nothing(self):
+        with self.assertRaises(balance.InsufficientBalance):
+            balance.debit(self.user.pk, Decimal('5000.01'), LedgerEntry.WITHDRAWAL)
+        # O saldo principal não cobre débitos do saldo bónus (e vice-versa).
+        with self.assertRaises(balance.InsufficientBalance):
+            balance.debit(self.user.pk, Decimal('1.00'), LedgerEntry.WITHDRAWAL, account=LedgerEntry.BONUS_BALANCE)
+        user = self._user()
+        self.assertEqual((user.balance, user.bonus_balance), (Decimal('5000.00'), Decimal('0.00')))
+        self.assertFalse(LedgerEntry.objects.filter(user=self.user).exists())
+        self.assertFalse(UserLedgerTotals.objects.filter(user=self.user).exists())
+
+    def test_concurrent_debits_cannot_overdraw(self):
+        # Dois pedidos que leram o mesmo saldo: o segundo UPDATE já não cumpre balance >= valor.
+        stale = CustomUser.objects.get(pk=self.user.pk)
+        balance.debit(self.user.pk, Decimal('4000.00'), LedgerEntry.WITHDRAWAL)
+        self.assertGreaterEqual(stale.balance, Decimal('4000.00'))
+        with self.assertRaises(balance.InsufficientBalance):
+            balance.debit(stale.pk, Decimal('4000.00'), LedgerEntry.WITHDRAWAL)
+        self.assertEqual(self._user().balance, Decimal('1000.00'))
+
+    def test_tally_field_follows_referral_bonus_only(self):
+        balance.credit(self.user.pk, Decimal('100.00'), LedgerEntry.REFERRAL_BONUS, account=LedgerEntry.BONUS_BALANCE)
+        balance.credit(self.user.pk, Decimal('250.00'), LedgerEntry.TASK_INCOME)
+        balance.credit_many(LedgerEntry.REFERRAL_BONUS, [(self.user.pk, Decimal('50.00'), '')], account=LedgerEntry.BONUS_BALANCE)
+        user = self._user()
+        self.assertEqual(
+            (user.balance, user.bonus_balance, user.referral_income),
+            (Decimal('5250.00'), Decimal('150.00'), Decimal('150.00')),
+        )
+        self.assertEqual(UserLedgerTotals.objects.get(user=self.user).referral_bonus, Decimal('150.00'))
+
+    def test_credit_to_missing_user_raises(self):
+        with self.assertRaises(CustomUser.DoesNotExist):
+            balance.credit(self.user.pk + 1000, Decimal('1.00'), LedgerEntry.DEPOSIT)
+        self.assertFalse(LedgerEntry.objects.exists())
+
+
+class DepositApprovalTests(TestCase):
+
+    def setUp(self):
+        self.users = [CustomUser.objects.create_user(f'92380000{i}', password='senha123') for i in range(2)]
+        amounts = [('Pending', 0, '5000.00'), ('Pending', 0, '2500.00'), ('Approved', 0, '7000.00'),
+                   ('Pending', 1, '1000.00'), ('Rejected', 1, '9000.00')]
+        for status, index, amount in amounts:
+            Deposit.objects.create(user=self.users[index], amount=Decimal(amount), status=status)
+
+    def _balances(self):
+        return [CustomUser.objects.get(pk=user.pk).balance for user in self.users]
+
+    def test_second_run_credits_nothing(self):
+        self.assertEqual(approvals.approve_deposits(Deposit.objects.all(), chunk_size=2), (3, 2))
+        self.assertEqual(self._balances(), [Decimal('7500.00'), Decimal('1000.00')])
+        self.assertEqual(approvals.approve_deposits(Deposit.objects.all(), chunk_size=2), (0, 5))
+        self.assertEqual(self._balances(), [Decimal('7500.00'), Decimal('1000.00')])
+        self.assertEqual(LedgerEntry.objects.filter(entry_type=LedgerEntry.DEPOSIT).count(), 3)
+        self.assertEqual(approvals.reject_deposits(Deposit.objects.all()), (0, 5))
+
+    def test_stale_read_never_double_credits(self):
+        # Sem bloqueio de linhas, a leitura pode ainda ver como pendente um
+        # depósito que outra sessão acabou de aprovar (e creditar).
+        deposit = Deposit.objects.filter(status='Pending').first()
+        Deposit.objects.filter(pk=deposit.pk).update(status='Approved')
+        stale = [(deposit.pk, deposit.user_id, deposit.amount)]
+        reads = iter([stale])
+        real = approvals._lock_pending
+        with mock.patch('core.approvals._lock_pending', side_effect=lambda model, ids: next(reads, None) or real(model, ids)) as lock:
+            self.assertEqual(approvals.approve_deposits(Deposit.objects.filter(pk=deposit.pk)), (0, 1))
+        self.assertEqual(lock.call_count, 2)
+        self.assertEqual(self._balances(), [Decimal('0.00'), Decimal('0.00')])
+        self.assertFalse(LedgerEntry.objects.exists())
+
+
+class WithdrawalApprovalTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('923900001', password='senha123')
+        for status, amount in [('Pending', '2000.00'), ('Pending', '3000.00'), ('Approved', '4000.00')]:
+            Withdrawal.objects.create(user=self.user, amount=Decimal(amount), amount_received=Decimal(amount), status=status)
+
+    def _balance(self):
+        return CustomUser.objects.get(pk=self.user.pk).balance
+
+    def test_rejecting_twice_refunds_once(self):
+        self.assertEqual(approvals.reject_withdrawals(Withdrawal.objects.all(), chunk_size=2), (2, 1))
+        self.assertEqual(self._balance(), Decimal('5000.00'))
+        self.assertEqual(approvals.reject_withdrawals(Withdrawal.objects.all(), chunk_size=2), (0, 3))
+        self.assertEqual(self._balance(), Decimal('5000.00'))
+        self.assertEqual(LedgerEntry.objects.filter(entry_type=LedgerEntry.WITHDRAWAL_REFUND).count(), 2)
+        self.assertEqual(UserLedgerTotals.objects.get(user=self.user).withdrawal_refund, Decimal('5000.00'))
+        # Rejeitadas não voltam a ser aprovadas.
+        self.assertEqual(approvals.approve_withdrawals(Withdrawal.objects.all()), (0, 3))
+
+    def test_stale_read_never_double_refunds(self):
+        withdrawal = Withdrawal.objects.filter(status='Pending').first()
+        Withdrawal.objects.filter(pk=withdrawal.pk).update(status='Rejected')
+        reads = iter([[(withdrawal.pk, withdrawal.user_id, withdrawal.amount)]])
+        real = approvals._lock_pending
+        with mock.patch('core.approvals._lock_pending', side_effect=lambda model, ids: next(reads, None) or real(model, ids)):
+            self.assertEqual(approvals.reject_withdrawals(Withdrawal.objects.filter(pk=withdrawal.pk)), (0, 1))
+        self.assertEqual(self._balance(), Decimal('0.00'))
+
+    def test_lot_that_keeps_changing_raises(self):
+        withdrawal = Withdrawal.objects.filter(status='Pending').first()
+        Withdrawal.objects.filter(pk=withdrawal.pk).update(status='Rejected')
+        with mock.patch('core.approvals._lock_pending', return_value=[(withdrawal.pk, withdrawal.user_id, withdrawal.amount)]):
+            with self.assertRaises(approvals.ConcurrentSettlement):
+                approvals.reject_withdrawals(Withdrawal.objects.filter(pk=withdrawal.pk))
+        self.assertEqual(self._balance(), Decimal('0.00'))
+
+
+@skipUnless(connection.vendor == 'sqlite', "Os planos de execução verificados são os do SQLite (EXPLAIN QUERY PLAN).")
+class HotQueryIndexTests(TestCase):
+    """
+    Garante que as consultas das views mais usadas continuam a usar índices.
+    Cada view é executada e cada SELECT capturado sobre as tabelas abaixo
+    passa por EXPLAIN QUERY PLAN; um SCAN sem índice faz o teste falhar.
+    """
+    HOT_TABLES = ('core_customuser', 'core_task', 'core_deposit', 'core_withdrawal', 'core_luckywheelspin')
+    FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(level_name='VIP 1', min_deposit_amount=Decimal('1000.00'), daily_income=Decimal('50.00'))
+        cls.user = CustomUser.objects.create_user('923000001', 'senha123', current_product=cls.product, level_activation_date=timezone.now())
+        CustomUser.objects.create_user('923000002', 'senha123', invited_by_code=cls.user.my_invitation_code)
+        Task.objects.create(user=cls.user, product=cls.product)
+        Task.objects.create(user=cls.user, product=cls.product, is_completed=True, completion_date=timezone.now())
+        Deposit.objects.create(user=cls.user, amount=Decimal('2000.00'), status='Approved')
+        Withdrawal.objects.create(user=cls.user, amount=Decimal('1500.00'), amount_received=Decimal('1425.00'), status='Approved')
+        prize = LuckyWheelPrize.objects.create(value=Decimal('100.00'))
+        LuckyWheelSpin.objects.create(user=cls.user, prize_won=prize)
+
+    def assertNoFullScans(self, queries):
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or not any(f'"{table}"' in sql for table in self.HOT_TABLES):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                for row in cursor.fetchall():
+                    match = self.FULL_SCAN.match(row[-1])
+                    if match and match.group(1) in self.HOT_TABLES:
+                        self.fail(f"Consulta sem índice em {match.group(1)}:\n{sql}")
+
+    def assertViewUsesIndexes(self, url_name):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        self.assertNoFullScans(ctx.captured_queries)
+
+    def test_home_view(self):
+        self.assertViewUsesIndexes('home')
+
+    def test_income_view(self):
+        self.assertViewUsesIndexes('income')
+
+    def test_tasks_view(self):
+        self.assertViewUsesIndexes('tasks')
+
+    def test_team_view(self):
+        self.assertViewUsesIndexes('team')
+
+    def test_admin_pending_queues(self):
+        with CaptureQueriesContext(connection) as ctx:
+            list(Deposit.objects.filter(status='Pending').order_by('-timestamp')[:100])
+            list(Withdrawal.objects.filter(status='Pending').order_by('-timestamp')[:100])
+        self.assertNoFullScans(ctx.captured_queries)
+        for model, index in ((Deposit, 'core_dep_pending_ts_idx'), (Withdrawal, 'core_wdr_pending_ts_idx')):
+            plan = model.objects.filter(status='Pending').order_by('-timestamp').explain()
+            self.assertIn(index, plan)
+
+
+class LuckyWheelSamplerTests(SimpleTestCase):
+    """
+    A tabela alias deve reproduzir exatamente a distribuição dos pesos.
+    """
+    DRAWS = 2_000_000
+
+    def assertMatchesWeights(self, weights, draws=DRAWS, seed=2025):
+        table = lucky_wheel.AliasTable(list(range(len(weights))), weights)
+        rng = random.Random(seed)
+        observed = Counter(table.sample(rng) for _ in range(draws))
+        total = sum(weights)
+        positive = [i for i, weight in enumerate(weights) if weight > 0]
+        self.assertEqual(set(observed), set(positive))
+
+        # Teste do qui-quadrado; valor crítico a p = 0.001 pela aproximação de Wilson-Hilferty.
+        chi2 = sum((observed[i] - draws * weights[i] / total) ** 2 / (draws * weights[i] / total) for i in positive)
+        dof = len(positive) - 1
+        if dof:
+            critical = dof * (1 - 2 / (9 * dof) + 3.09 * math.sqrt(2 / (9 * dof))) ** 3
+            self.assertLess(chi2, critical, f"Distribuição observada {dict(observed)} difere dos pesos {weights}.")
+
+    def test_skewed_weights(self):
+        self.assertMatchesWeights([500, 250, 150, 70, 25, 5])
+
+    def test_many_prizes_with_zero_weight(self):
+        self.assertMatchesWeights([0, 1, 3, 0, 7, 13, 1, 40, 2, 0, 9, 1000])
+
+    def test_single_and_empty_tables(self):
+        self.assertEqual(lucky_wheel.AliasTable(['único'], [4]).sample(), 'único')
+        self.assertIsNone(lucky_wheel.AliasTable(['nada'], [0]).sample())
+
+
+class LuckyWheelPrizeTableTests(TestCase):
+
+    def test_table_is_rebuilt_when_prizes_change(self):
+        small = LuckyWheelPrize.objects.create(value=Decimal('10.00'), weight=1)
+        self.assertEqual(lucky_wheel.prize_table().items, [small])
+        with self.assertNumQueries(0):
+            lucky_wheel.draw_prize()
+
+        small.is_active = False
+        small.save()
+        big = LuckyWheelPrize.objects.create(value=Decimal('500.00'), weight=3)
+        self.assertEqual(lucky_wheel.prize_table().items, [big])
+        self.assertEqual(lucky_wheel.draw_prize(), big)
+
+
+class LuckyWheelDailyResetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        LuckyWheelPrize.objects.create(value=Decimal('50.00'), weight=1, daily_spins_allowed=2)
+        cls.user = CustomUser.objects.create_user(
+            '923000010', 'senha123',
+            daily_spins_remaining=0, last_spin_date=timezone.localdate() - datetime.timedelta(days=1),
+        )
+
+    def test_viewing_the_wheel_does_not_write(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('lucky_wheel'))
+        self.assertEqual(response.context['remaining_spins'], 2)
+        writes = [q['sql'] for q in ctx.captured_queries if not q['sql'].startswith('SELECT')]
+        self.assertEqual(writes, [])
+
+    def test_spin_applies_the_new_day_reset(self):
+        lucky_wheel.spin(self.user.pk)
+        lucky_wheel.spin(self.user.pk)
+        with self.assertRaises(lucky_wheel.NoSpinsLeft):
+            lucky_wheel.spin(self.user.pk)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_spin_date, timezone.localdate())
+        self.assertEqual(self.user.daily_spins_remaining, 0)
+        self.assertEqual(self.user.balance, Decimal('100.00'))
+
+
+class LuckyWheelSpinConcurrencyTests(TransactionTestCase):
+    """
+    Vários pedidos de giro em paralelo para o mesmo usuário nunca passam do limite diário.
+    """
+    SPINS_ALLOWED = 3
+    REQUESTS = 12
+
+    def test_concurrent_spins_do_not_exceed_daily_limit(self):
+        LuckyWheelPrize.objects.create(value=Decimal('100.00'), weight=1)
+        user = CustomUser.objects.create_user(
+            '923000009', 'senha123',
+            daily_spins_remaining=self.SPINS_ALLOWED, last_spin_date=timezone.localdate(),
+        )
+        results = []
+        barrier = threading.Barrier(self.REQUESTS)
+
+        def worker():
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        lucky_wheel.spin(user.pk)
+                        results.append('ok')
+                    except lucky_wheel.NoSpinsLeft:
+                        results.append('recusado')
+                    except OperationalError:
+                        # SQLite: a base está bloqueada por outro escritor; o pedido tenta de novo.
+                        continue
+                    return
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.REQUESTS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        user.refresh_from_db()
+        self.assertEqual(results.count('ok'), self.SPINS_ALLOWED)
+        self.assertEqual(results.count('recusado'), self.REQUESTS - self.SPINS_ALLOWED)
+        self.assertEqual(user.daily_spins_remaining, 0)
+        self.assertEqual(user.balance, Decimal('100.00') * self.SPINS_ALLOWED)
+        self.assertEqual(LuckyWheelSpin.objects.filter(user=user).count(), self.SPINS_ALLOWED)
+        self.assertEqual(ledger.totals_for(user).lucky_wheel, Decimal('100.00') * self.SPINS_ALLOWED)
+
+
+@jobs.job(max_attempts=2)
+def failing_job(message):
+    raise RuntimeError(message)
+
+
+@jobs.job()
+def noop_job():
+    pass
+
+
+class JobQueueTests(TestCase):
+
+    def test_job_runs_once_and_records_duration(self):
+        job = jobs.enqueue(noop_job)
+        leases = jobs.claim(['default'], 5, 'teste')
+        self.assertEqual(leases, [jobs.Lease(job.pk, 'teste', 1)])
+        self.assertEqual(jobs.claim(['default'], 5, 'outro'), [])
+        outcome = jobs.execute(leases[0])
+        job.refresh_from_db()
+        self.assertTrue(outcome.ok)
+        self.assertFalse(outcome.lost)
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
+        self.assertIsNotNone(job.duration_ms)
+
+    def test_failed_job_is_retried_with_backoff_then_fails(self):
+        job = jobs.enqueue(failing_job, message="erro")
+        [lease] = jobs.claim(['default'], 1, 'teste')
+        self.assertTrue(jobs.execute(lease).retry)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn("RuntimeError: erro", job.last_error)
+        # Ainda em espera: não é reservada.
+        self.assertEqual(jobs.claim(['default'], 1, 'teste'), [])
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        [lease] = jobs.claim(['default'], 1, 'teste')
+        self.assertFalse(jobs.execute(lease).retry)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_jobs_from_other_queues_are_not_claimed(self):
+        jobs.enqueue(noop_job)
+        self.assertEqual(jobs.claim(['media'], 5, 'teste'), [])
+
+    def test_requeued_run_does_not_complete_the_new_one(self):
+        job = jobs.enqueue(noop_job)
+        [slow] = jobs.claim(['default'], 1, 'worker-a')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - jobs.STALE_AFTER * 2)
+        self.assertEqual(jobs.requeue_stale(), 1)
+        [again] = jobs.claim(['default'], 1, 'worker-a')
+        self.assertEqual(again.attempt, 2)
+
+        # A primeira execução (do mesmo worker, até) acaba e já não é dona da tarefa.
+        self.assertTrue(jobs.execute(slow).lost)
+        self.assertEqual(jobs.heartbeat([slow]), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.attempts), (Job.RUNNING, 'worker-a', 2))
+
+        outcome = jobs.execute(again)
+        self.assertFalse(outcome.lost)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+
+    def test_heartbeat_keeps_slow_job_reserved(self):
+        job = jobs.enqueue(noop_job)
+        leases = jobs.claim(['default'], 1, 'teste')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - jobs.STALE_AFTER * 2)
+        self.assertEqual(jobs.heartbeat(leases), 1)
+        self.assertEqual(jobs.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+
+
+class RunWorkerTests(TransactionTestCase):
+
+    def test_burst_runs_queued_jobs(self):
+        # As tarefas correm nas threads do worker, com outras ligações à base de dados.
+        for _ in range(3):
+            jobs.enqueue(noop_job)
+        jobs.enqueue(failing_job, message="erro")
+        stderr = io.StringIO()
+        call_command('runworker', '--burst', '--poll-interval', '0.01', stdout=io.StringIO(), stderr=stderr)
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 3)
+        self.assertIn("nova tentativa agendada", stderr.getvalue())
+
+
+class ReferralCounterTests(TestCase):
+
+    def setUp(self):
+        self.product = Product.objects.create(level_name='VIP 1', min_deposit_amount=Decimal('5000.00'), daily_income=Decimal('250.00'))
+        self.upgrade = Product.objects.create(level_name='VIP 2', min_deposit_amount=Decimal('5000.00'), daily_income=Decimal('300.00'), order=1)
+        self.referrer = CustomUser.objects.create_user('923400001', password='senha123')
+        self.other_referrer = CustomUser.objects.create_user('923400002', password='senha123')
+        self.invitee = CustomUser.objects.create_user('923400003', password='senha123', invited_by=self.referrer, balance=Decimal('20000.00'))
+        referrals.add_team_member(self.referrer.pk)
+
+    def _counters(self, user):
+        user.refresh_from_db()
+        return user.team_size, user.invested_team_size
+
+    def test_concurrent_first_activations_count_once(self):
+        # Dois pedidos que leram o usuário sem produto: só o primeiro UPDATE o encontra assim.
+        self.assertTrue(referrals.assign_product(self.invitee.pk, self.product, timezone.now()))
+        self.assertFalse(referrals.assign_product(self.invitee.pk, self.upgrade, timezone.now()))
+        self.assertEqual(self._counters(self.referrer), (1, 1))
+
+        self.client.force_login(self.invitee)
+        CustomUser.objects.filter(pk=self.invitee.pk).update(current_product=None)
+        CustomUser.objects.filter(pk=self.referrer.pk).update(invested_team_size=0)
+        for product in (self.product, self.upgrade):
+            self.client.post(reverse('activate_product'), {'product_id': product.pk})
+        self.assertEqual(self._counters(self.referrer), (1, 1))
+        self.assertEqual(self._counters(self.invitee)[0], 0)
+
+    def test_admin_referrer_change_and_deletion_keep_counters(self):
+        referrals.assign_product(self.invitee.pk, self.product, timezone.now())
+        self.invitee.refresh_from_db()
+        self.invitee.invited_by = self.other_referrer
+        self.invitee.current_product = None
+        form = types.SimpleNamespace(
+            changed_data=['invited_by', 'current_product'],
+            initial={'invited_by': self.referrer.pk, 'current_product': self.product.pk},
+        )
+        CustomUserAdmin(CustomUser, admin.site).save_model(None, self.invitee, form, change=True)
+        self.assertEqual(self._counters(self.referrer), (0, 0))
+        self.assertEqual(self._counters(self.other_referrer), (1, 0))
+
+        referrals.assign_product(self.invitee.pk, self.product, timezone.now())
+        self.assertEqual(self._counters(self.other_referrer), (1, 1))
+        self.invitee.delete()
+        self.assertEqual(self._counters(self.other_referrer), (0, 0))
+
+    def test_product_deletion_and_reconcile(self):
+        referrals.assign_product(self.invitee.pk, self.product, timezone.now())
+        self.product.delete()
+        self.assertEqual(self._counters(self.referrer), (1, 0))
+
+        # Alteração por fora das views e do admin: só a reconciliação a apanha.
+        CustomUser.objects.filter(pk=self.invitee.pk).update(invited_by=self.other_referrer)
+        self.assertEqual(referrals.reconcile_team_counters(), 2)
+        self.assertEqual(self._counters(self.referrer), (0, 0))
+        self.assertEqual(self._counters(self.other_referrer), (1, 0))
+        self.assertEqual(referrals.reconcile_team_counters(), 0)
+
+
+class TeamPageTests(TestCase):
+
+    def setUp(self):
+        self.product = Product.objects.create(level_name='VIP 1', min_deposit_amount=Decimal('5000.00'), daily_income=Decimal('250.00'))
+        self.referrer = CustomUser.objects.create_user('923450001', password='senha123')
+        # Sete convidados, os quatro primeiros com o mesmo date_joined.
+        joined = timezone.now().replace(microsecond=123456)
+        self.invitees = []
+        for index in range(7):
+            invitee = CustomUser.objects.create_user(f'92345010{index}', password='senha123', invited_by=self.referrer)
+            CustomUser.objects.filter(pk=invitee.pk).update(date_joined=joined - datetime.timedelta(minutes=max(index - 3, 0)))
+            self.invitees.append(invitee)
+        self.client.force_login(self.referrer)
+
+    NO_INVITEES = '<p class="text-white-50 text-center">Você ainda não convidou nenhum usuário.</p>'
+    EMPTY_PAGE = '<p class="text-white-50 text-center">Nenhum convidado nesta lista.</p>'
+
+    def _walk(self, invested=None, page_size=2):
+        seen, cursor = [], None
+        while True:
+            page, cursor = referrals.team_page(self.referrer, after=cursor, invested=invested, page_size=page_size)
+            seen.extend(invitee.pk for invitee in page)
+            if cursor is None:
+                return seen
+
+    def test_cursor_round_trip(self):
+        invitee = CustomUser.objects.get(pk=self.invitees[0].pk)
+        self.assertEqual(referrals.decode_cursor(referrals.encode_cursor(invitee)), (invitee.date_joined, invitee.pk))
+
+    def test_malformed_cursor(self):
+        for cursor in ('', 'abc', '1.2.3', 'x.1', '1.', '99999999999999999999999.1', None):
+            self.assertIsNone(referrals.decode_cursor(cursor), cursor)
+        response = self.client.get(reverse('team'), {'after': 'lixo'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['invited_users']), 7)
+        self.assertTrue(response.context['is_first_page'])
+
+    def test_tied_date_joined_pages_have_no_gaps_or_duplicates(self):
+        expected = list(
+            CustomUser.objects.filter(invited_by=self.referrer).order_by('-date_joined', '-pk').values_list('pk', flat=True)
+        )
+        for page_size in (1, 2, 3, 7):
+            self.assertEqual(self._walk(page_size=page_size), expected)
+
+    def test_empty_filter_is_not_no_invitees(self):
+        response = self.client.get(reverse('team'), {'filter': 'invested'})
+        self.assertEqual(list(response.context['invited_users']), [])
+        self.assertContains(response, self.EMPTY_PAGE)
+        self.assertNotContains(response, self.NO_INVITEES)
+
+        response = self.client.get(reverse('team'))
+        self.assertNotContains(response, self.EMPTY_PAGE)
+        self.assertNotContains(response, self.NO_INVITEES)
+
+    def test_user_without_invitees(self):
+        self.client.force_login(CustomUser.objects.create_user('923450002', password='senha123'))
+        for params in ({}, {'filter': 'not_invested'}):
+            self.assertContains(self.client.get(reverse('team'), params), self.NO_INVITEES)
+
+
+class DepositProofTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = self.settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = CustomUser.objects.create_user('923300001', password='senha123')
+
+    def _deposit(self, name, content):
+        return Deposit.objects.create(user=self.user, amount=Decimal('5000.00'), proof_image=SimpleUploadedFile(name, content))
+
+    def _image(self, size, image_format, **options):
+        buffer = io.BytesIO()
+        Image.frombytes('RGB', size, random.Random(1).randbytes(size[0] * size[1] * 3)).save(buffer, image_format, **options)
+        return buffer.getvalue()
+
+    def test_oversized_photo_keeps_original_and_adds_reduced_copy(self):
+        exif = Image.Exif()
+        exif[0x0110] = 'Telefone de teste'  # Model
+        content = self._image((2400, 1800), 'JPEG', quality=95, exif=exif)
+        deposit = self._deposit('foto.jpg', content)
+
+        result = proofs.process_proof(deposit.pk)
+        deposit.refresh_from_db()
+        with deposit.proof_image.open('rb') as original:
+            self.assertEqual(original.read(), content)
+        with Image.open(deposit.proof_reduced.path) as reduced:
+            self.assertEqual(max(reduced.size), proofs.MAX_SIDE)
+            self.assertEqual(len(reduced.getexif()), 0)
+        with Image.open(deposit.proof_thumbnail.path) as thumbnail:
+            self.assertLessEqual(max(thumbnail.size), proofs.THUMBNAIL_SIDE)
+        self.assertEqual((deposit.proof_original_size, deposit.proof_size), (len(content), result.stored_bytes))
+        self.assertGreater(result.bytes_saved, 0)
+        self.assertIsNone(proofs.process_proof(deposit.pk))
+
+        preview = DepositAdmin(Deposit, admin.site).proof_preview(deposit)
+        self.assertIn(deposit.proof_image.url, preview)
+        self.assertIn(deposit.proof_reduced.url, preview)
+
+    def test_small_image_is_reviewed_from_the_original(self):
+        # Uma captura de ecrã simples: o PNG é mais pequeno do que qualquer JPEG dela.
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 400), 'white').save(buffer, 'PNG')
+        content = buffer.getvalue()
+        deposit = self._deposit('ecra.png', content)
+        result = proofs.process_proof(deposit.pk)
+        deposit.refresh_from_db()
+        self.assertFalse(deposit.proof_reduced)
+        self.assertTrue(deposit.proof_thumbnail)
+        self.assertEqual((result.stored_bytes, deposit.proof_size), (len(content), len(content)))
+        self.assertIn(deposit.proof_image.url, DepositAdmin(Deposit, admin.site).proof_preview(deposit))
+
+    def test_non_image_is_kept_as_uploaded(self):
+        deposit = self._deposit('recibo.pdf', b'%PDF-1.4 comprovativo')
+        with self.assertLogs('core.proofs', 'WARNING'):
+            self.assertIsNone(proofs.process_proof(deposit.pk))
+        deposit.refresh_from_db()
+        self.assertIsNotNone(deposit.proof_processed_at)
+        self.assertFalse(deposit.proof_reduced)
+        self.assertFalse(deposit.proof_thumbnail)
+        with deposit.proof_image.open('rb') as original:
+            self.assertEqual(original.read(), b'%PDF-1.4 comprovativo')
+
+
+    def test_decompression_bomb_is_kept_as_uploaded(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 400), 'white').save(buffer, 'PNG')
+        deposit = self._deposit('enorme.png', buffer.getvalue())
+        # Acima de 2 × MAX_IMAGE_PIXELS o Pillow recusa abrir a imagem.
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000), self.assertLogs('core.proofs', 'WARNING'):
+            self.assertIsNone(proofs.process_proof_job(deposit_id=deposit.pk))
+        deposit.refresh_from_db()
+        self.assertIsNotNone(deposit.proof_processed_at)
+        self.assertFalse(deposit.proof_reduced)
+        self.assertFalse(deposit.proof_thumbnail)
+        self.assertNotIn("(em processamento)", DepositAdmin(Deposit, admin.site).proof_preview(deposit))
+
+class InvitationCodeTests(TestCase):
+
+    def test_encode_decode_round_trip(self):
+        for number in (0, 1, 35, 36, 12345, 10 ** 9, invitation_codes.DOMAIN - 1):
+            code = invitation_codes.encode(number)
+            self.assertEqual(len(code), invitation_codes.CODE_LENGTH)
+            self.assertTrue(set(code) <= set(invitation_codes.ALPHABET))
+            self.assertEqual(invitation_codes.decode(code), number)
+        with self.assertRaises(ValueError):
+            invitation_codes.encode(invitation_codes.DOMAIN)
+        self.assertIsNone(invitation_codes.decode('abc'))
+        self.assertIsNone(invitation_codes.decode('ABCDEFGHI-'))
+
+    def test_codes_are_unique_and_assigned_without_lookups(self):
+        self.assertEqual(len({invitation_codes.encode(number) for number in range(1, 20001)}), 20000)
+        with CaptureQueriesContext(connection) as captured:
+            users = [CustomUser.objects.create_user(f'92310000{i}', password='senha123') for i in range(5)]
+        self.assertFalse([query['sql'] for query in captured if query['sql'].startswith('SELECT')])
+        for user in users:
+            user.refresh_from_db()
+            self.assertEqual(user.my_invitation_code, invitation_codes.encode(user.pk))
+            self.assertTrue(SearchEntry.objects.filter(user=user, kind=SearchEntry.CODE, value=user.my_invitation_code).exists())
+
+    def test_collision_with_legacy_code_uses_random_fallback(self):
+        legacy = CustomUser.objects.create_user('923200001', password='senha123')
+        # Um código aleatório antigo igual ao que o próximo usuário receberia.
+        CustomUser.objects.filter(pk=legacy.pk).update(my_invitation_code=invitation_codes.encode(legacy.pk + 1))
+        user = CustomUser.objects.create_user('923200002', password='senha123')
+        self.assertEqual(user.pk, legacy.pk + 1)
+        user.refresh_from_db()
+        self.assertNotEqual(user.my_invitation_code, invitation_codes.encode(user.pk))
+        self.assertEqual(len(user.my_invitation_code), invitation_codes.CODE_LENGTH)
+        self.assertTrue(SearchEntry.objects.filter(user=user, kind=SearchEntry.CODE, value=user.my_invitation_code).exists())
+
+
+class SyntheticDatasetTests(TestCase):
+
+    def test_seed_is_reproducible_and_consistent(self):
+        summary = synthetic.seed(60, seed=7, chunk_size=25)
+        self.assertEqual(summary['users'], 60)
+        self.assertEqual(UserProfile.objects.count(), 60)
+
+        users = list(CustomUser.objects.order_by('pk'))
+        for user in users:
+            self.assertEqual(user.my_invitation_code, invitation_codes.encode(user.pk))
+            self.assertEqual(user.team_size, CustomUser.objects.filter(invited_by=user).count())
+            if user.invited_by_id:
+                self.assertLess(user.invited_by_id, user.pk)
+                self.assertEqual(user.invited_by_code, invitation_codes.encode(user.invited_by_id))
+
+        # A mesma semente gera a mesma árvore de convites e a mesma atividade.
+        tree = [(user.username, user.invited_by.username if user.invited_by else None) for user in users]
+        counts = {key: summary[key] for key in ('tasks', 'deposits', 'withdrawals', 'spins')}
+        CustomUser.objects.all().delete()
+        again = synthetic.seed(60, seed=7, chunk_size=25)
+        self.assertEqual({key: again[key] for key in counts}, counts)
+        self.assertEqual(
+            [(user.username, user.invited_by.username if user.invited_by else None)
+             for user in CustomUser.objects.select_related('invited_by').order_by('pk')],
+            tree,
+        )
+
+
+# Consultas de um GET autenticado com sessões em cookies assinados: uma para o
+# usuário (AuthenticationMiddleware), que as views reutilizam, mais as da view.
+QUERY_BUDGETS = {
+    'home': 1,
+    'profile': 3,
+    'deposit': 1,
+    'withdrawal': 2,
+    'add_bank_account': 1,
+    'products': 1,
+    'investment_levels': 1,
+    'tasks': 2,
+    'team': 2,
+    'lucky_wheel': 1,
+    'support': 1,
+    'income': 5,
+}
+
+
+# URLconf dos testes das views assíncronas: as rotas de core.urls com as páginas
+# de leitura trocadas pelas de core/async_views.py, como com SERVER_MODE=asgi.
+ASYNC_READ_VIEWS = {
+    'home': async_views.home_view,
+    'support': async_views.support_view,
+    'products': async_views.products_view,
+    'tasks': async_views.tasks_view,
+    'investment_levels': async_views.investment_levels_view,
+}
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_READ_VIEWS.get(pattern.name, pattern.callback), name=pattern.name)
+    for pattern in urls.urlpatterns
+]
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+class ViewQueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.seed(40, seed=3)
+        cls.user = CustomUser.objects.order_by('-team_size', 'pk').first()
+        UserBankAccount.objects.create(user=cls.user, bank_name='BAI', account_name='Teste', iban='AO06000000000000000000099')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_views_stay_within_query_budget(self):
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(view=name):
+                self.client.get(reverse(name))  # aquece as caches de catálogo e dados de referência
+                with CaptureQueriesContext(connection) as captured:
+                    response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(
+                    len(captured), budget,
+                    "\n".join(query['sql'] for query in captured.captured_queries),
+                )
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_database_sessions_add_one_query(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(QUERY_BUDGETS['home'] + 1):
+            self.client.get(reverse('home'))
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+class AsyncReadViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.seed(40, seed=3)
+        cls.user = CustomUser.objects.filter(current_product__isnull=False, task__is_completed=False).order_by('pk').first()
+
+    def _context(self, name):
+        response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    def test_async_views_match_sync_views(self):
+        # O cliente de testes corre as views assíncronas num event loop: uma
+        # consulta síncrona dentro delas falharia aqui com SynchronousOnlyOperation.
+        self.client.force_login(self.user)
+        keys = {
+            'home': ['referral_count'],
+            'support': ['support_info'],
+            'products': ['products'],
+            'tasks': ['nivel', 'renda_diaria', 'rental_date'],
+            'investment_levels': ['investment_levels', 'user_balance', 'current_product_id'],
+        }
+        for name, names in keys.items():
+            with self.subTest(view=name):
+                expected = self._context(name)
+                with self.settings(ROOT_URLCONF='core.tests'), self.assertNumQueries(QUERY_BUDGETS[name]):
+                    actual = self._context(name)
+                for key in names:
+                    self.assertEqual(actual[key], expected[key], key)
+                self.assertEqual(actual['user'], self.user)
+
+    @override_settings(ROOT_URLCONF='core.tests', METRICS_DIR='')
+    async def test_async_views_report_their_queries(self):
+        # As consultas do ORM assíncrono correm noutra thread (sync_to_async).
+        metrics._histograms.clear()
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('tasks'))
+        self.assertEqual(response.status_code, 200)
+        counts, total = metrics._histograms[('http_request_db_queries', 'tasks', 'GET')]
+        self.assertEqual(sum(counts), 1)
+        self.assertGreater(total, 0)
+        self.assertGreater(metrics._histograms[('http_request_db_duration_seconds', 'tasks', 'GET')][1], 0)
+
+    @override_settings(ROOT_URLCONF='core.tests')
+    async def test_anonymous_users_are_redirected(self):
+        response = await self.async_client.get(reverse('tasks'))
+        self.assertRedirects(response, f"{reverse('login')}?next={reverse('tasks')}", fetch_redirect_response=False)
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.enterContext(override_settings(METRICS_DIR=self.directory, METRICS_TOKEN='segredo'))
+        metrics._histograms.clear()
+        metrics._requests.clear()
+        self.addCleanup(metrics._histograms.clear)
+        self.addCleanup(metrics._requests.clear)
+
+    def _write(self, pid, route, count):
+        snapshot = {'histograms': [], 'requests': [[[route, 'GET', '2xx'], count]]}
+        with open(os.path.join(self.directory, f'{pid}.json'), 'w') as handle:
+            json.dump(snapshot, handle)
+
+    def test_middleware_records_route_status_and_queries(self):
+        self.client.get(reverse('login'))
+        self.client.get(reverse('login'))
+        self.client.get('/nao-existe/')
+        self.assertEqual(metrics._requests[('login', 'GET', '2xx')], 2)
+        self.assertEqual(metrics._requests[('unmatched', 'GET', '4xx')], 1)
+        counts, total = metrics._histograms[('http_request_duration_seconds', 'login', 'GET')]
+        self.assertEqual(sum(counts), 2)
+        self.assertGreater(total, 0)
+        self.assertGreater(metrics._histograms[('http_request_template_duration_seconds', 'login', 'GET')][1], 0)
+
+    def test_render_prometheus_histograms_are_cumulative(self):
+        for queries in (0, 2, 4, 200):
+            stats = metrics._RequestStats()
+            stats.queries = queries
+            metrics.record('home', 'GET', 200, 0.02, stats)
+        metrics.record('home', 'GET', 302, 0.02, metrics._RequestStats())
+        text = metrics.render_prometheus()
+
+        self.assertIn('# TYPE http_requests_total counter\n', text)
+        self.assertIn('http_requests_total{view="home",method="GET",status="2xx"} 4\n', text)
+        self.assertIn('http_requests_total{view="home",method="GET",status="3xx"} 1\n', text)
+        self.assertIn('# TYPE http_request_db_queries histogram\n', text)
+        labels = 'view="home",method="GET"'
+        for bound, expected in [('0', 2), ('1', 2), ('2', 3), ('5', 4), ('89', 4), ('+Inf', 5)]:
+            self.assertIn(f'http_request_db_queries_bucket{{{labels},le="{bound}"}} {expected}\n', text)
+        self.assertIn(f'http_request_db_queries_sum{{{labels}}} 206.000000\n', text)
+        self.assertIn(f'http_request_db_queries_count{{{labels}}} 5\n', text)
+        self.assertTrue(text.endswith('\n'))
+
+    def test_dead_workers_files_are_pruned(self):
+        finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+        dead_pid = int(finished.stdout)
+        self._write(os.getppid(), 'home', 3)
+        self._write(dead_pid, 'home', 100)
+        metrics.record('home', 'GET', 200, 0.01, metrics._RequestStats())
+
+        self.assertIn('http_requests_total{view="home",method="GET",status="2xx"} 4\n', metrics.render_prometheus())
+        self.assertNotIn(f'{dead_pid}.json', os.listdir(self.directory))
+
+        metrics.forget_process(os.getppid())
+        self.assertNotIn(f'{os.getppid()}.json', os.listdir(self.directory))
+
+    def test_metrics_access(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer errado').status_code, 404)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+
+        self.client.force_login(CustomUser.objects.create_user('923460001', password='senha123'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(CustomUser.objects.create_user('923460002', password='senha123', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_empty_token_never_matches(self):
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+
+def other_process(data):
+    # Outra cópia de VersionedData com o mesmo nome e a mesma cache partilhada,
+    # como a de outro worker do gunicorn, com a sua própria cópia em memória.
+    return versioned_cache.VersionedData(data._name, load=data._load, build=data._build)
+
+
+def later(seconds):
+    return mock.patch('time.monotonic', return_value=time.monotonic() + seconds)
+
+
+@override_settings(REFERENCE_DATA_RECHECK_SECONDS=60)
+class CatalogCacheTests(TestCase):
+
+    def setUp(self):
+        self.product = Product.objects.create(level_name='VIP 1', min_deposit_amount=Decimal('5000.00'), daily_income=Decimal('250.00'))
+
+    def test_save_and_delete_reach_other_processes_after_recheck(self):
+        worker = other_process(catalog._catalog)
+        self.assertEqual([p.level_name for p in catalog._active(worker.get())], ['VIP 1'])
+
+        Product.objects.create(level_name='VIP 2', min_deposit_amount=Decimal('15000.00'), daily_income=Decimal('800.00'), order=1)
+        # O processo que grava vê a alteração logo; o outro só depois do intervalo.
+        self.assertEqual([p.level_name for p in catalog.active_products()], ['VIP 1', 'VIP 2'])
+        self.assertEqual([p.level_name for p in catalog._active(worker.get())], ['VIP 1'])
+        with later(61):
+            self.assertEqual([p.level_name for p in catalog._active(worker.get())], ['VIP 1', 'VIP 2'])
+
+        self.product.delete()
+        with later(122):
+            self.assertEqual([p.level_name for p in catalog._active(worker.get())], ['VIP 2'])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'core_test_cache'}})
+    def test_database_cache_costs_one_query_per_recheck(self):
+        call_command('createcachetable', verbosity=0)
+        catalog.active_products()
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                catalog.active_products()
+        with later(61), self.assertNumQueries(1):
+            for _ in range(10):
+                catalog.active_products()
+
+
+    def test_purchase_uses_current_price_and_state(self):
+        user = CustomUser.objects.create_user('923470001', password='senha123', balance=Decimal('20000.00'))
+        self.client.force_login(user)
+        # A cópia em memória fica com o preço antigo, como a de outro worker antes do intervalo.
+        catalog.active_products()
+        Product.objects.filter(pk=self.product.pk).update(min_deposit_amount=Decimal('7000.00'))
+        self.assertEqual(catalog.get_product(self.product.pk).min_deposit_amount, Decimal('5000.00'))
+
+        self.client.post(reverse('activate_product'), {'product_id': self.product.pk})
+        user.refresh_from_db()
+        self.assertEqual(user.balance, Decimal('13000.00'))
+        self.assertEqual(user.current_product_id, self.product.pk)
+
+        upgrade = Product.objects.create(level_name='VIP 2', min_deposit_amount=Decimal('1000.00'), daily_income=Decimal('50.00'), order=1)
+        catalog.active_products()
+        Product.objects.filter(pk=upgrade.pk).update(is_active=False)
+        response = self.client.post(reverse('activate_product'), {'product_id': upgrade.pk}, follow=True)
+        self.assertContains(response, "O produto selecionado não existe.")
+        user.refresh_from_db()
+        self.assertEqual((user.balance, user.current_product_id), (Decimal('13000.00'), self.product.pk))
+
+    def test_purchase_rejects_malformed_product_id(self):
+        self.assertEqual(catalog.products_for_purchase('abc'), (None, None))
+        self.assertEqual(catalog.products_for_purchase(self.product.pk), (self.product, None))
+
+@override_settings(REFERENCE_DATA_RECHECK_SECONDS=60)
+class ReferenceDataCacheTests(TestCase):
+
+    def test_support_info_changes_reach_other_processes_after_recheck(self):
+        info = SupportInfo.objects.create(whatsapp_number='923000000')
+        worker = other_process(reference_data._support_info)
+        self.assertEqual(worker.get().whatsapp_number, '923000000')
+
+        info.whatsapp_number = '923999999'
+        info.save()
+        self.assertEqual(reference_data.support_info().whatsapp_number, '923999999')
+        self.assertEqual(worker.get().whatsapp_number, '923000000')
+        with later(61):
+            self.assertEqual(worker.get().whatsapp_number, '923999999')
+
+        info.delete()
+        self.assertIsNone(reference_data.support_info())
+        with later(122):
+            self.assertIsNone(worker.get())
+
+    def test_bank_changes_reach_other_processes_after_recheck(self):
+        bank = Bank.objects.create(name='BAI', account_name='Titular', iban='AO06000000000000000000001')
+        worker = other_process(reference_data._banks)
+        self.assertEqual([b.name for b in worker.get()], ['BAI'])
+        bank.is_active = False
+        bank.save()
+        self.assertEqual(reference_data.active_banks(), [])
+        with later(61):
+            self.assertEqual(worker.get(), ())
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'core_test_cache'}})
+    def test_database_cache_costs_one_query_per_recheck(self):
+        call_command('createcachetable', verbosity=0)
+        SupportInfo.objects.create(whatsapp_number='923000000')
+        reference_data._banks.invalidate()  # descarta a cópia local deixada por outros testes
+        reference_data.support_info()
+        reference_data.active_banks()
+        with self.assertNumQueries(0):
+            reference_data.support_info()
+            reference_data.active_banks()
+        with later(61), self.assertNumQueries(2):
+            reference_data.support_info()
+            reference_data.active_banks()
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+class TemplateFragmentCacheTests(TestCase):
+
+    def setUp(self):
+        synthetic.seed_reference_data()
+        caches['fragments'].clear()
+        self.client.force_login(CustomUser.objects.create_user('923000002', password='senha123'))
+
+    def test_support_fragment_follows_support_info_version(self):
+        response = self.client.get(reverse('support'))
+        key = make_template_fragment_key('support_info', [response.context['support_version']])
+        self.assertIsNotNone(caches['fragments'].get(key))
+
+        info = SupportInfo.objects.get()
+        info.platform_rules = 'Regra nova: retiradas só aos dias úteis.'
+        info.save()
+        self.assertContains(self.client.get(reverse('support')), 'Regra nova: retiradas só aos dias úteis.')
+
+    def test_investment_level_fragments_keep_csrf_token_out(self):
+        first = self.client.get(reverse('investment_levels'))
+        second = self.client.get(reverse('investment_levels'))
+        token = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+        self.assertNotEqual(token.findall(first.content.decode()), token.findall(second.content.decode()))
+
+        product = Product.objects.order_by('order').first()
+        product.daily_income = Decimal('777.00')
+        product.save()
+        self.assertContains(self.client.get(reverse('investment_levels')), 'Kz 777,00')
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+class IncomeViewQueryTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('923000001', password='senha123')
+        self.client.force_login(self.user)
+
+    def _income_queries(self):
+        self.client.get(reverse('income'))
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('income'))
+        return len(captured), response
+
+    def test_query_count_does_not_grow_with_history(self):
+        empty, _ = self._income_queries()
+        self.assertLessEqual(empty, QUERY_BUDGETS['income'])
+
+        product = Product.objects.create(level_name='VIP 1', min_deposit_amount=Decimal('5000.00'), daily_income=Decimal('250.00'))
+        banks = [Bank.objects.create(name=f'Banco {i}', account_name='Titular', iban=f'AO0600000000000000000000{i}') for i in range(3)]
+        for i in range(15):
+            Deposit.objects.create(user=self.user, bank=banks[i % 3], amount=Decimal('5000.00'), status='Approved')
+            Withdrawal.objects.create(user=self.user, amount=Decimal('2000.00'), amount_received=Decimal('1900.00'), status='Approved')
+            Task.objects.create(user=self.user, product=product, is_completed=True, completion_date=timezone.now())
+            ledger.record(self.user.pk, LedgerEntry.TASK_INCOME, Decimal('250.00'))
+            ledger.record(self.user.pk, LedgerEntry.REFERRAL_BONUS, Decimal('100.00'), account=LedgerEntry.BONUS_BALANCE)
+
+        busy, response = self._income_queries()
+        self.assertEqual(busy, empty)
+        self.assertEqual(response.context['total_task_earnings'], Decimal('3750.00'))
+        self.assertEqual(response.context['total_referral_earnings'], Decimal('1500.00'))
+        self.assertContains(response, 'Banco 2')
+
+
+class AdminChangelistQueryTests(TestCase):
+    MODELS = ['customuser', 'deposit', 'withdrawal', 'task', 'luckywheelspin', 'ledgerentry', 'userledgertotals', 'userbankaccount']
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser('923999999', password='senha123')
+        self.client.force_login(self.admin)
+
+    def _changelist_queries(self):
+        counts = {}
+        for model in self.MODELS:
+            url = reverse(f'admin:core_{model}_changelist')
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts[model] = len(captured)
+        return counts
+
+    def test_query_count_does_not_depend_on_rows_per_page(self):
+        synthetic.seed(5, seed=1)
+        for user in CustomUser.objects.all()[:5]:
+            UserBankAccount.objects.create(user=user, bank_name='BAI', account_name='Teste', iban=f'AO0600000000000000000{user.pk:04d}')
+            ledger.record(user.pk, LedgerEntry.DEPOSIT, Decimal('10.00'))
+        few = self._changelist_queries()
+
+        synthetic.seed(60, seed=2)
+        for user in CustomUser.objects.filter(bank_accounts__isnull=True)[:60]:
+            UserBankAccount.objects.create(user=user, bank_name='BFA', account_name='Teste', iban=f'AO0600000000000000000{user.pk:04d}')
+            ledger.record(user.pk, LedgerEntry.DEPOSIT, Decimal('10.00'))
+        self.assertEqual(self._changelist_queries(), few)
+
+    def test_small_tables_are_counted_exactly(self):
+        synthetic.seed(12, seed=4)
+        queryset = CustomUser.objects.order_by('pk')
+        self.assertEqual(EstimatedCountPaginator(queryset, 5).count, queryset.count())
+        pending = Deposit.objects.filter(status='Pending')
+        self.assertEqual(EstimatedCountPaginator(pending, 5).count, pending.count())
+
+
+class AdminSearchIndexTests(TestCase):
+    def _found(self, term):
+        return set(CustomUser.objects.filter(pk__in=search.matching_users(term)).values_list('username', flat=True))
+
+    def test_index_follows_user_profile_and_bank_accounts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = CustomUser.objects.create_user('+244923456789', password='senha123')
+            CustomUser.objects.create_user('923000000', password='senha123')
+        self.assertEqual(self._found('+244 923 45'), {'923456789'})
+        self.assertEqual(self._found(user.my_invitation_code.lower()), {'923456789'})
+
+        user.profile.full_name = 'João da Silva'
+        user.profile.save()
+        self.assertEqual(self._found('joao da'), {'923456789'})
+
+        account = UserBankAccount.objects.create(user=user, bank_name='BAI', account_name='João', iban='AO06 0040 0000 1234 5678 9012 3')
+        self.assertEqual(self._found('ao0600400000'), {'923456789'})
+        with self.captureOnCommitCallbacks(execute=True):
+            account.delete()
+        self.assertEqual(self._found('AO0600400000'), set())
+
+    def test_bulk_seeded_users_are_indexed(self):
+        synthetic.seed(10, seed=3)
+        user = CustomUser.objects.order_by('pk').last()
+        self.assertEqual(self._found(user.phone_number), {user.username})
+        self.assertEqual(SearchEntry.objects.filter(user=user, kind=SearchEntry.CODE).get().value, user.my_invitation_code)
+
+    def test_admin_search_uses_the_index(self):
+        admin_user = CustomUser.objects.create_superuser('923999999', password='senha123')
+        self.client.force_login(admin_user)
+        synthetic.seed(20, seed=5)
+        user = CustomUser.objects.filter(withdrawal__isnull=False).order_by('pk').first()
+        UserBankAccount.objects.create(user=user, bank_name='BAI', account_name='Teste', iban='AO06004000009999999999999')
+
+        response = self.client.get(reverse('admin:core_customuser_changelist'), {'q': user.phone_number[:7]})
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            set(CustomUser.objects.filter(phone_number__startswith=user.phone_number[:7])),
+        )
+        response = self.client.get(reverse('admin:core_withdrawal_changelist'), {'q': 'ao06 0040 0000 9999'})
+        self.assertEqual({w.user_id for w in response.context['cl'].result_list}, {user.pk})
+
+    def test_email_is_searchable(self):
+        admin_user = CustomUser.objects.create_superuser('923999998', password='senha123')
+        user = CustomUser.objects.create_user('923456700', password='senha123')
+        CustomUser.objects.create_user('923456701', password='senha123', email='outra@exemplo.ao')
+        user.email = 'Maria.Silva@Exemplo.ao'
+        user.save()
+        self.assertEqual(self._found('maria.silva@exemplo.ao'), {'923456700'})
+        self.assertEqual(self._found('maria.silva@'), {'923456700'})
+        self.assertEqual(self._found('@exemplo.ao'), set())
+
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:core_customuser_changelist'), {'q': ' MARIA.SILVA@exemplo.ao '})
+        self.assertEqual(list(response.context['cl'].result_list), [user])
+
+        # Contas anteriores ao índice de e-mails: preenchidas pela migração 0011.
+        SearchEntry.objects.filter(kind=SearchEntry.EMAIL).delete()
+        importlib.import_module('core.migrations.0011_search_entry_email').backfill_emails(
+            django_apps, types.SimpleNamespace(connection=connection),
+        )
+        self.assertEqual(self._found('maria.silva@exemplo.ao'), {'923456700'})
+        self.assertEqual(self._found('outra@'), {'923456701'})
+
+    def test_spins_can_be_filtered_by_prize(self):
+        self.client.force_login(CustomUser.objects.create_superuser('923999997', password='senha123'))
+        user = CustomUser.objects.create_user('923456702', password='senha123')
+        small = LuckyWheelPrize.objects.create(value=Decimal('100.00'), name='Pequeno')
+        big = LuckyWheelPrize.objects.create(value=Decimal('5000.00'), name='Grande')
+        spins = [LuckyWheelSpin.objects.create(user=user, prize_won=prize) for prize in (small, big, big)]
+        response = self.client.get(reverse('admin:core_luckywheelspin_changelist'), {'prize_won__id__exact': big.pk})
+        self.assertEqual(set(response.context['cl'].result_list), set(spins[1:]))
+
+    def test_missing_trigram_index_is_looked_up_again(self):
+        checks = iter([False, True])
+        with mock.patch.object(connection, 'vendor', 'postgresql'), \
+                mock.patch('core.search._query_trigram_index', side_effect=lambda alias: next(checks)) as query, \
+                mock.patch.dict(search._trigram_checks, clear=True):
+            self.assertFalse(search._has_trigram_index('default'))
+            self.assertFalse(search._has_trigram_index('default'))
+            self.assertEqual(query.call_count, 1)
+            with later(search.TRIGRAM_RECHECK_SECONDS):
+                self.assertTrue(search._has_trigram_index('default'))
+            # Encontrado, já não volta a ser procurado.
+            with later(search.TRIGRAM_RECHECK_SECONDS * 10):
+                self.assertTrue(search._has_trigram_index('default'))
+            self.assertEqual(query.call_count, 2)
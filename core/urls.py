@@ -1,7 +1,12 @@
 # microsoft_2025_platform/core/urls.py
 
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Páginas só de leitura: com SERVER_MODE=asgi são servidas pelas versões
+# assíncronas (core/async_views.py), com WSGI pelas síncronas.
+read_views = async_views if settings.SERVER_MODE == 'asgi' else views
 
 urlpatterns = [
     # Rotas de Autenticação
@@ -10,7 +15,7 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     
     # Rota Principal (Home)
-    path('', views.home_view, name='home'),
+    path('', read_views.home_view, name='home'),
     
     # Rotas de Perfil do Usuário
     path('profile/', views.profile_view, name='profile'),
@@ -25,12 +30,12 @@ urlpatterns = [
     path('withdrawal/', views.withdrawal_view, name='withdrawal'),
 
     # Rotas de Produtos e Tarefas
-    path('products/', views.products_view, name='products'),
+    path('products/', read_views.products_view, name='products'),
     path('products/activate/', views.activate_product_view, name='activate_product'),
-    path('tasks/', views.tasks_view, name='tasks'),
+    path('tasks/', read_views.tasks_view, name='tasks'),
     
     # Rota para Níveis de Investimento (CORRIGIDO)
-    path('investment_levels/', views.investment_levels_view, name='investment_levels'),
+    path('investment_levels/', read_views.investment_levels_view, name='investment_levels'),
     
     # Rotas de Equipa (Convites)
     path('team/', views.team_view, name='team'),
@@ -40,8 +45,11 @@ urlpatterns = [
     path('lucky-wheel/spin/', views.spin_lucky_wheel, name='spin_lucky_wheel'),
 
     # Rota de Suporte
-    path('support/', views.support_view, name='support'),
+    path('support/', read_views.support_view, name='support'),
 
     # Rota de Renda
     path('income/', views.income_view, name='income'),
+
+    # Métricas no formato do Prometheus (protegidas)
+    path('metrics', views.metrics_view, name='metrics'),
 ]
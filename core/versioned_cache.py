@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# microsof_2025_platform/core/versioned_cache.py
+
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+# Tempo de vida dos dados na cache partilhada; a versão em si não expira.
+DATA_TIMEOUT = 60 * 60 * 24
+
+
+class VersionedData:
+    """
+    Dados de referência (tabelas pequenas que quase nunca mudam) guardados em
+    três níveis: uma cópia em memória em cada processo, uma cópia na cache
+    partilhada do Django e a base de dados.
+
+    A cache partilhada guarda também uma versão (um token aleatório); gravar ou
+    apagar um dos modelos observados grava uma versão nova. Cada processo só
+    confirma a versão da sua cópia local no máximo uma vez a cada
+    REFERENCE_DATA_RECHECK_SECONDS: entre confirmações uma leitura não toca na
+    cache nem na base de dados. A confirmação é uma leitura da cache partilhada,
+    ou seja, uma consulta com a DatabaseCache de produção. O processo que grava
+    vê a alteração logo; os outros workers, no máximo esse intervalo depois.
+
+    `load()` lê os dados da base de dados (tem de devolver algo serializável);
+    `build(dados)`, opcional, transforma-os no valor mantido em memória.
+    """
+
+    def __init__(self, name, load, build=None, timeout=DATA_TIMEOUT):
+        self.version_key = f'core:{name}:version'
+        self._name = name
+        self._load = load
+        self._build = build or (lambda data: data)
+        self._timeout = timeout
+        # (versão, valor, momento da última confirmação da versão): substituído
+        # de uma só vez, por isso é seguro entre threads.
+        self._local = (None, None, 0.0)
+
+    def version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            # add() não sobrescreve uma versão gravada entretanto por outro processo.
+            cache.add(self.version_key, uuid.uuid4().hex, timeout=None)
+            version = cache.get(self.version_key)
+        return version
+
+    def get(self):
+        return self.get_with_version()[1]
+
+    def _fresh(self):
+        # A cópia local, se a versão foi confirmada há menos de REFERENCE_DATA_RECHECK_SECONDS.
+        version, value, checked_at = self._local
+        if version is not None and time.monotonic() - checked_at < settings.REFERENCE_DATA_RECHECK_SECONDS:
+            return version, value
+        return None
+
+    def _keep(self, version, value):
+        self._local = (version, value, time.monotonic())
+        return version, value
+
+    def get_with_version(self):
+        """
+        (versão, valor): a versão serve de chave às caches de fragmentos de
+        template feitos a partir destes dados, sem uma segunda leitura da cache.
+        """
+        fresh = self._fresh()
+        if fresh:
+            return fresh
+        version = self.version()
+        local_version, value, _ = self._local
+        if local_version == version:
+            return self._keep(version, value)
+        data_key = f'core:{self._name}:{version}:data'
+        data = cache.get(data_key)
+        if data is None:
+            data = self._load()
+            cache.set(data_key, data, self._timeout)
+        return self._keep(version, self._build(data))
+
+    async def aversion(self):
+        version = await cache.aget(self.version_key)
+        if version is None:
+            await cache.aadd(self.version_key, uuid.uuid4().hex, timeout=None)
+            version = await cache.aget(self.version_key)
+        return version
+
+    async def aget(self):
+        return (await self.aget_with_version())[1]
+
+    async def aget_with_version(self):
+        """
+        get_with_version() para as views assíncronas: a cache pelo seu API
+        assíncrono e `load()` (ORM síncrono) numa thread.
+        """
+        fresh = self._fresh()
+        if fresh:
+            return fresh
+        version = await self.aversion()
+        local_version, value, _ = self._local
+        if local_version == version:
+            return self._keep(version, value)
+        data_key = f'core:{self._name}:{version}:data'
+        data = await cache.aget(data_key)
+        if data is None:
+            data = await sync_to_async(self._load)()
+            await cache.aset(data_key, data, self._timeout)
+        return self._keep(version, self._build(data))
+
+    def invalidate(self):
+        cache.set(self.version_key, uuid.uuid4().hex, timeout=None)
+        # Este processo relê já, sem esperar pelo intervalo de confirmação.
+        self._local = (None, None, 0.0)
+
+    def watch(self, *models):
+        """
+        Invalida os dados quando uma instância de um destes modelos é gravada ou apagada.
+        """
+        for model in models:
+            for signal in (post_save, post_delete):
+                signal.connect(
+                    self._changed, sender=model, weak=False,
+                    dispatch_uid=f'{self.version_key}:{model._meta.label}:{signal is post_save}',
+                )
+        return self
+
+    def _changed(self, sender, **kwargs):
+        # Invalida já (o próprio processo vê a alteração) e de novo depois do
+        # commit: entre os dois momentos outro processo pode ter voltado a
+        # guardar na cache as linhas antigas.
+        self.invalidate()
+        transaction.on_commit(self.invalidate)
@@ -2,15 +2,16 @@
 # microsof_2025_platform/core/views.py
 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
 from django.utils import timezone
 import datetime
+import hmac
 from decimal import Decimal
-import random
-from django.db.models import Sum
 
 # Importação dos formulários
 from .forms import (
@@ -24,16 +25,14 @@ from .forms import (
     UserPasswordChangeForm,
 )
 # Importação dos modelos
+from . import balance, catalog, ledger, lucky_wheel, metrics, proofs, reference_data, referrals
 from .models import (
     CustomUser,
-    Bank,
+    LedgerEntry,
     Deposit,
     UserBankAccount,
     Product,
     Task,
-    SupportInfo,
-    LuckyWheelPrize,
-    LuckyWheelSpin,
     Withdrawal,
     UserProfile,
 )
@@ -52,16 +51,17 @@ def register_view(request):
             with transaction.atomic():
                 user = form.save()
                 
-                invited_by_code = form.cleaned_data.get('invited_by_code')
-                if invited_by_code:
+                # O formulário já ligou o novo usuário ao utilizador que o convidou
+                referrer_id = user.invited_by_id
+                if referrer_id:
                     try:
-                        # Procura pelo utilizador que convidou
-                        referrer = CustomUser.objects.get(my_invitation_code=invited_by_code)
                         bonus_amount = Decimal('100.00')
-                        referrer.bonus_balance += bonus_amount
-                        # CORREÇÃO APLICADA AQUI: Adicionar o bônus também ao referral_income para rastreamento total
-                        referrer.referral_income += bonus_amount 
-                        referrer.save()
+                        # O bónus entra no bonus_balance e também no referral_income (rastreamento total)
+                        balance.credit(
+                            referrer_id, bonus_amount, LedgerEntry.REFERRAL_BONUS,
+                            account=LedgerEntry.BONUS_BALANCE, description=f"Convite de {user.username}",
+                        )
+                        referrals.add_team_member(referrer_id)
                         messages.success(request, f"Parabéns! Você recebeu um bónus de Kz {bonus_amount} por convidar {user.username}.")
                     except CustomUser.DoesNotExist:
                         messages.error(request, "Código de convite inválido fornecido (problema interno).")
@@ -126,10 +126,13 @@ def home_view(request):
     View da página inicial do usuário.
     Exibe informações do utilizador, como o produto ativo e o número de referidos.
     """
-    user = CustomUser.objects.get(pk=request.user.pk)
+    # O usuário já foi carregado pelo AuthenticationMiddleware (uma vez por pedido).
+    user = request.user
+    if user.current_product_id:
+        user.current_product = catalog.get_product(user.current_product_id)
     
-    # Conta os referidos que têm o código de convite do utilizador atual
-    referral_count = CustomUser.objects.filter(invited_by_code=user.my_invitation_code).count() if user.my_invitation_code else 0
+    # Número de referidos, lido do contador mantido em core.referrals
+    referral_count = user.team_size
 
     context = {
         'user': user,
@@ -143,8 +146,8 @@ def deposit_view(request):
     View para o depósito de fundos.
     Permite ao utilizador submeter uma solicitação de depósito.
     """
-    banks = Bank.objects.filter(is_active=True)
-    if not banks.exists():
+    banks = reference_data.active_banks()
+    if not banks:
         messages.warning(request, "Nenhum banco disponível para depósito no momento. Tente mais tarde.")
         return redirect('home')
 
@@ -156,6 +159,9 @@ def deposit_view(request):
                 deposit.user = request.user
                 deposit.status = 'Pending'
                 deposit.save()
+                if deposit.proof_image:
+                    # O ficheiro já foi gravado em blocos; o Pillow corre depois do commit, fora do pedido.
+                    proofs.schedule(deposit.pk)
             messages.success(request, "Sua solicitação de depósito foi enviada e está pendente de aprovação.")
             return redirect('deposit')
         else:
@@ -169,12 +175,10 @@ def deposit_view(request):
     else:
         form = DepositForm()
     
-    support_info = SupportInfo.objects.first()
-    
+    # `support_info` vem do context processor core.reference_data (em cache).
     context = {
         'form': form,
         'banks': banks,
-        'support_info': support_info,
     }
     return render(request, 'core/deposit.html', context)
 
@@ -189,10 +193,10 @@ def withdrawal_view(request):
     withdrawal_tax_percentage = Decimal('5.0')  # Taxa de 5%
     withdrawal_min_amount = Decimal('1500.00')  # Saque mínimo
 
-    # Contas bancárias ativas do usuário
-    user_bank_accounts = UserBankAccount.objects.filter(user=user, is_active=True)
+    # Contas bancárias ativas do usuário (lidas uma só vez)
+    user_bank_accounts = list(UserBankAccount.objects.filter(user=user, is_active=True))
 
-    if not user_bank_accounts.exists():
+    if not user_bank_accounts:
         messages.warning(request, "Você precisa adicionar uma conta bancária ativa antes de fazer uma retirada.")
         return redirect('add_bank_account')
 
@@ -208,25 +212,28 @@ def withdrawal_view(request):
             elif amount > user.balance:
                 messages.error(request, "Saldo insuficiente para esta retirada.")
             else:
-                with transaction.atomic():
-                    # Lógica de cálculo
-                    tax_percentage_decimal = withdrawal_tax_percentage / 100
-                    tax_amount = amount * tax_percentage_decimal
-                    amount_received = amount - tax_amount
-
-                    # Atualiza o saldo do usuário
-                    user.balance -= amount
-                    user.save()
-
-                    # Cria o objeto de retirada no banco de dados
-                    Withdrawal.objects.create(
-                        user=user,
-                        user_bank_account=selected_account,
-                        amount=amount,
-                        tax_percentage=withdrawal_tax_percentage,  # Armazena a porcentagem, não o decimal
-                        amount_received=amount_received,
-                        status='Pending'
-                    )
+                # Lógica de cálculo
+                tax_percentage_decimal = withdrawal_tax_percentage / 100
+                tax_amount = amount * tax_percentage_decimal
+                amount_received = amount - tax_amount
+
+                try:
+                    with transaction.atomic():
+                        # Debita o saldo apenas se ainda for suficiente (UPDATE condicional)
+                        balance.debit(user.pk, amount, LedgerEntry.WITHDRAWAL)
+
+                        # Cria o objeto de retirada no banco de dados
+                        Withdrawal.objects.create(
+                            user=user,
+                            user_bank_account=selected_account,
+                            amount=amount,
+                            tax_percentage=withdrawal_tax_percentage,  # Armazena a porcentagem, não o decimal
+                            amount_received=amount_received,
+                            status='Pending'
+                        )
+                except balance.InsufficientBalance:
+                    messages.error(request, "Saldo insuficiente para esta retirada.")
+                else:
                     messages.success(request, f"Sua solicitação de retirada de Kz {amount:.2f} foi enviada. Você receberá Kz {amount_received:.2f}.")
                     return redirect('withdrawal')
         else:
@@ -242,7 +249,7 @@ def withdrawal_view(request):
         'user_bank_accounts': user_bank_accounts,
         'current_balance': user.balance,
         'withdrawal_tax_percentage': withdrawal_tax_percentage,
-        'has_bank_account': user_bank_accounts.exists(),
+        'has_bank_account': bool(user_bank_accounts),
     }
     return render(request, 'core/withdrawal.html', context)
 
@@ -284,10 +291,9 @@ def support_view(request):
     """
     View para a página de suporte.
     """
-    support_info = SupportInfo.objects.first()
-    context = {
-        'support_info': support_info
-    }
+    # A versão é a chave da cache do fragmento com as informações (templates/core/support.html).
+    version, support_info = reference_data.support_info_with_version()
+    context = {'support_info': support_info, 'support_version': version}
     return render(request, 'core/support.html', context)
 
 
@@ -295,83 +301,29 @@ def support_view(request):
 def income_view(request):
     """
     View para a página de renda do usuário.
-    Verifica se a renda diária deve ser calculada e atualiza o saldo do utilizador.
-    Também busca e exibe o histórico de depósitos, retiradas e tarefas concluídas.
+    Apenas leitura: a renda diária é creditada pelo comando `accrue_income`.
+    Busca e exibe o histórico de depósitos, retiradas e tarefas concluídas.
     """
+    # O usuário do pedido foi lido da base de dados no início deste pedido: o saldo já é o atual.
     user = request.user
-    
-    # Recarrega o usuário para ter o saldo mais recente
-    user.refresh_from_db() 
-
-    tasks = Task.objects.filter(user=user, is_completed=False)
-    today = timezone.localdate()
-    is_weekend = today.weekday() >= 5 # 5 é sábado, 6 é domingo
-
-    for task in tasks:
-        if not task.last_income_calculation_date or (task.last_income_calculation_date < today and not is_weekend):
-            if user.level_activation_date:
-                activation_date = user.level_activation_date.date()
-                end_date = activation_date + datetime.timedelta(days=task.product.duration_days)
-                
-                if today >= end_date:
-                    with transaction.atomic():
-                        task.is_completed = True
-                        task.completion_date = timezone.now()
-                        task.save()
-                    
-                        if user.current_product == task.product:
-                            user.current_product = None
-                            user.level_activation_date = None
-                            user.save()
-                        messages.info(request, f"Seu investimento '{task.product.level_name}' foi concluído.")
-                    continue
-
-                daily_income_amount = task.product.daily_income
-                with transaction.atomic():
-                    user.balance += daily_income_amount
-                    user.save()
-                    task.last_income_calculation_date = today
-                    task.save()
-                    messages.success(request, f"Renda diária de Kz {daily_income_amount:.2f} do produto '{task.product.level_name}' adicionada ao seu saldo!")
-    
+
     # --- Dados para o Resumo de Ganhos ---
-    # É importante recalcular o usuário após qualquer save() dentro do loop acima
-    user.refresh_from_db() 
+    # Os totais vêm do livro-razão (UserLedgerTotals), mantidos a cada movimento de saldo.
+    totals = ledger.totals_for(user)
     current_balance = user.balance
-    total_referral_earnings = user.referral_income # Assumindo que referral_income no CustomUser armazena o total
-    
-    # Calcular Total de Ganhos por Tarefas (Soma da renda diária de todas as tarefas *dias concluídos*)
-    # Isso pode ser complexo se precisar somar a renda de tarefas que foram ativadas em dias diferentes.
-    # Por simplicidade, vamos somar a renda diária total de produtos ativos multiplicado pela duração
-    # Se uma tarefa for concluída, ela contribui para os ganhos totais.
-    
-    # Soma de ganhos de tarefas concluídas (renda total do produto)
-    completed_tasks_total_earnings = Decimal('0.00')
-    all_completed_tasks = Task.objects.filter(user=user, is_completed=True)
-    for task_completed in all_completed_tasks:
-        if task_completed.product:
-            # Multiplica a renda diária pela duração total para o ganho total daquela tarefa
-            completed_tasks_total_earnings += task_completed.product.daily_income * task_completed.product.duration_days
-
-    # Soma da renda diária de tarefas ATIVAS (para o dia atual)
-    active_tasks_daily_income = Task.objects.filter(user=user, is_completed=False).aggregate(Sum('product__daily_income'))['product__daily_income__sum'] or Decimal('0.00')
-    
-    # Para o "Total de Ganhos por Tarefas", o mais preciso seria somar todas as rendas que já foram ADICIONADAS ao saldo
-    # Isso exigiria um modelo de `IncomeTransaction` ou similar.
-    # Como não temos um modelo de transações de renda diária, vamos somar as rendas dos produtos das tarefas CONCLUÍDAS
-    # e, para as ativas, pode-se considerar o que já foi acumulado ou a renda diária total *até agora*.
-    # Por agora, para 'total_task_earnings', usaremos a soma dos ganhos totais dos produtos das tarefas concluídas.
-    # Se precisar de um histórico mais granular, um novo modelo de transação de renda seria ideal.
-    
-    total_task_earnings = completed_tasks_total_earnings # Total de ganhos de tarefas já concluídas
+    total_referral_earnings = totals.referral_bonus
+    total_task_earnings = totals.task_income
 
 
     # --- Histórico de Transações Recentes ---
-    recent_deposits = Deposit.objects.filter(user=user, status='Approved').order_by('-timestamp')[:10] # Últimos 10
+    # O banco vem no mesmo SELECT (o template mostra `deposit.bank.name` em cada linha)
+    recent_deposits = Deposit.objects.filter(user=user, status='Approved').select_related('bank').order_by('-timestamp')[:10] # Últimos 10
     recent_withdrawals = Withdrawal.objects.filter(user=user, status='Approved').order_by('-timestamp')[:10] # Últimos 10
     
     # Para tarefas, você pode querer mostrar tarefas recém-concluídas
-    completed_tasks_for_history = Task.objects.filter(user=user, is_completed=True).order_by('-completion_date')[:10]
+    completed_tasks_for_history = catalog.attach_products(
+        list(Task.objects.filter(user=user, is_completed=True).order_by('-completion_date')[:10])
+    )
 
 
     context = {
@@ -391,7 +343,7 @@ def products_view(request):
     """
     View para exibir a lista de produtos (níveis de investimento).
     """
-    products = Product.objects.filter(is_active=True).order_by('order')
+    products = catalog.active_products()
     form = SelectProductForm()
     
     context = {
@@ -413,42 +365,53 @@ def activate_product_view(request):
             messages.error(request, "ID do produto não fornecido.")
             return redirect('investment_levels')
 
-        try:
-            selected_product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
-            messages.error(request, "O produto selecionado não existe.")
-            return redirect('investment_levels')
-
         user = request.user
 
-        if user.current_product and selected_product.order <= user.current_product.order:
-            messages.error(request, f"Você já possui um produto ativo. Você só pode fazer upgrade para um nível superior.")
-            return redirect('investment_levels')
-        
-        # A lógica foi corrigida para permitir o upgrade
-        # O valor para comprar o nível vem do saldo principal (balance).
-        if user.balance < selected_product.min_deposit_amount:
+        try:
+            with transaction.atomic():
+                # Preço, ordem e estado lidos da base de dados dentro da transação do
+                # débito, e não do catálogo em memória (que noutros workers pode estar
+                # até REFERENCE_DATA_RECHECK_SECONDS atrasado): cobra-se o preço atual
+                # e um produto acabado de desativar já não pode ser comprado.
+                selected_product, current_product = catalog.products_for_purchase(product_id, user.current_product_id)
+                if selected_product is None:
+                    messages.error(request, "O produto selecionado não existe.")
+                    return redirect('investment_levels')
+
+                if current_product and selected_product.order <= current_product.order:
+                    messages.error(request, f"Você já possui um produto ativo. Você só pode fazer upgrade para um nível superior.")
+                    return redirect('investment_levels')
+
+                # A lógica foi corrigida para permitir o upgrade
+                # O valor para comprar o nível vem do saldo principal (balance).
+                if user.balance < selected_product.min_deposit_amount:
+                    messages.error(request, f"Saldo insuficiente. Você precisa de Kz {selected_product.min_deposit_amount} para ativar este produto.")
+                    return redirect('investment_levels')
+
+                # Deduz o valor do saldo do utilizador (UPDATE condicional) e atribui o produto
+                balance.debit(
+                    user.pk, selected_product.min_deposit_amount, LedgerEntry.PRODUCT_PURCHASE,
+                    description=selected_product.level_name,
+                )
+                # Atribui o produto; o contador do referenciador só sobe no primeiro investimento
+                user.current_product = selected_product
+                user.level_activation_date = timezone.now()
+                referrals.assign_product(user.pk, selected_product, user.level_activation_date)
+
+                # Cria uma tarefa para rastrear o novo investimento
+                Task.objects.create(
+                    user=user,
+                    product=selected_product,
+                    is_completed=False,
+                    last_income_calculation_date=timezone.localdate()
+                )
+        except balance.InsufficientBalance:
             messages.error(request, f"Saldo insuficiente. Você precisa de Kz {selected_product.min_deposit_amount} para ativar este produto.")
             return redirect('investment_levels')
 
-        with transaction.atomic():
-            # Deduz o valor do saldo do utilizador e atribui o produto
-            user.balance -= selected_product.min_deposit_amount
-            user.current_product = selected_product
-            user.level_activation_date = timezone.now()
-            user.save()
-
-            # Cria uma tarefa para rastrear o novo investimento
-            Task.objects.create(
-                user=user,
-                product=selected_product,
-                is_completed=False,
-                last_income_calculation_date=timezone.localdate()
-            )
-            
-            # CORREÇÃO DO ERRO AQUI
-            messages.success(request, f"Produto '{selected_product.level_name}' ativado com sucesso! Você agora receberá renda diária.")
-            return redirect('income')
+        # CORREÇÃO DO ERRO AQUI
+        messages.success(request, f"Produto '{selected_product.level_name}' ativado com sucesso! Você agora receberá renda diária.")
+        return redirect('income')
     
     return redirect('investment_levels')
 
@@ -462,17 +425,36 @@ def team_view(request):
     """
     user = request.user
     
-    invited_users = CustomUser.objects.filter(invited_by_code=user.my_invitation_code).order_by('-date_joined') if user.my_invitation_code else CustomUser.objects.none()
+    # Filtro opcional ('invested' / 'not_invested') e cursor da página atual
+    team_filter = request.GET.get('filter', '')
+    invested = {'invested': True, 'not_invested': False}.get(team_filter)
+    # Um cursor inválido é ignorado e mostra-se a primeira página.
+    cursor = request.GET.get('after')
+    if cursor and referrals.decode_cursor(cursor) is None:
+        cursor = None
+    invited_users, next_cursor = referrals.team_page(user, after=cursor, invested=invested)
     
-    total_invited_users = invited_users.count()
+    # Contadores da equipa mantidos em core.referrals (sem COUNT na base de dados)
+    total_invited_users = user.team_size
     
-    invested_users_count = invited_users.filter(current_product__isnull=False).count()
+    invested_users_count = user.invested_team_size
     
     non_invested_users_count = total_invited_users - invested_users_count
 
+    # A mensagem "ainda não convidou" depende de haver convidados, não de a página
+    # atual (filtrada ou mais adiante na lista) estar vazia.
+    # Sem filtro nem cursor, uma página vazia já responde à pergunta.
+    has_invitees = bool(invited_users) or (
+        (invested is not None or bool(cursor)) and CustomUser.objects.filter(invited_by=user).exists()
+    )
+
     context = {
         'user': user,
         'invited_users': invited_users,
+        'has_invitees': has_invitees,
+        'team_filter': team_filter if invested is not None else '',
+        'next_cursor': next_cursor,
+        'is_first_page': not cursor,
         'total_invited_users': total_invited_users,
         'invested_users_count': invested_users_count,
         'non_invested_users_count': non_invested_users_count,
@@ -623,7 +605,16 @@ def tasks_view(request):
     """
     user = request.user
     active_task = Task.objects.filter(user=user, is_completed=False).first()
-    
+    if active_task:
+        catalog.attach_products([active_task])
+    return render(request, 'core/tasks.html', tasks_context(active_task))
+
+
+def tasks_context(active_task):
+    """
+    Contexto da página de tarefas a partir da tarefa ativa (ou None), com o
+    produto já preenchido. Partilhado com a versão assíncrona da view.
+    """
     context = {
         'active_task': active_task,
         'nivel': 'Nenhum',
@@ -651,7 +642,7 @@ def tasks_view(request):
         time_left = end_time - timezone.now()
         context['remaining_seconds'] = max(0, int(time_left.total_seconds()))
 
-    return render(request, 'core/tasks.html', context)
+    return context
 
 # --- Views da Roda da Sorte ---
 
@@ -659,33 +650,25 @@ def tasks_view(request):
 def lucky_wheel_view(request):
     """
     View para a Roda da Sorte.
-    Reinicia o número de giros diários se for um novo dia.
+    Só leitura: os giros de um novo dia são calculados a partir de
+    `last_spin_date` e repostos no próprio giro (core/lucky_wheel.py).
     """
     user = request.user
-    today = timezone.localdate()
-    
-    active_prizes = LuckyWheelPrize.objects.filter(is_active=True)
-    if not active_prizes.exists():
+
+    prizes = lucky_wheel.active_prizes()
+    if not prizes:
         messages.warning(request, "A Roda da Sorte não está disponível no momento. Contate o suporte.")
         context = {
             'user': user,
             'prizes': [],
+            'remaining_spins': 0,
         }
         return render(request, 'core/lucky_wheel.html', context)
-        
-    # Verifica se é um novo dia para resetar os giros
-    if user.last_spin_date is None or user.last_spin_date < today:
-        first_prize = active_prizes.first()
-        daily_spins_allowed = first_prize.daily_spins_allowed if first_prize and first_prize.daily_spins_allowed is not None else 1
-        
-        user.daily_spins_remaining = daily_spins_allowed
-        user.last_spin_date = today
-        user.save()
-        messages.info(request, f"Seus giros diários da Roda da Sorte foram resetados! Você tem {daily_spins_allowed} giros.")
 
     context = {
         'user': user,
-        'prizes': active_prizes,
+        'prizes': prizes,
+        'remaining_spins': lucky_wheel.spins_remaining(user),
     }
     return render(request, 'core/lucky_wheel.html', context)
 
@@ -693,58 +676,23 @@ def lucky_wheel_view(request):
 def spin_lucky_wheel(request):
     """
     View para processar um giro na Roda da Sorte.
-    Seleciona um prémio com base no peso e atualiza o saldo do utilizador.
+    O giro é consumido e o prémio creditado num único UPDATE condicional
+    (core/lucky_wheel.py), por isso cliques repetidos não passam do limite diário.
     """
     if request.method == 'POST':
-        user = request.user
-        
-        if user.daily_spins_remaining <= 0:
+        try:
+            prize_won = lucky_wheel.spin(request.user.pk)
+        except lucky_wheel.NoSpinsLeft:
             messages.error(request, "Você atingiu o limite diário de giros. Volte amanhã!")
             return redirect('lucky_wheel')
-
-        active_prizes = LuckyWheelPrize.objects.filter(is_active=True)
-        if not active_prizes.exists():
+        except lucky_wheel.NoPrizes:
             messages.error(request, "Nenhum prémio configurado para a Roda da Sorte. Contate o suporte.")
             return redirect('lucky_wheel')
 
-        total_weight = sum(prize.weight for prize in active_prizes)
-        
-        if total_weight == 0:
-            messages.error(request, "Pesos dos prémios inválidos. Contate o suporte.")
-            return redirect('lucky_wheel')
-
-        rand_num = random.uniform(0, total_weight)
-        
-        cumulative_weight = 0
-        prize_won = None
-        for prize in active_prizes:
-            cumulative_weight += prize.weight
-            if rand_num <= cumulative_weight:
-                prize_won = prize
-                break
-        
-        if not prize_won:
-            messages.error(request, "Não foi possível sortear um prémio. Tente novamente.")
-            return redirect('lucky_wheel')
-
-        with transaction.atomic():
-            user.daily_spins_remaining -= 1
-            user.last_spin_date = timezone.localdate()
-            user.save()
-
-            if prize_won.value > 0:
-                user.balance += prize_won.value
-                user.save()
-                messages.success(request, f"Parabéns! Você ganhou Kz {prize_won.value:.2f} na Roda da Sorte!")
-            else:
-                messages.info(request, f"Você girou a Roda da Sorte, mas não ganhou um prémio em dinheiro desta vez.")
-
-            LuckyWheelSpin.objects.create(
-                user=user,
-                prize_won=prize_won,
-                is_paid_spin=False
-            )
-        
+        if prize_won.value > 0:
+            messages.success(request, f"Parabéns! Você ganhou Kz {prize_won.value:.2f} na Roda da Sorte!")
+        else:
+            messages.info(request, f"Você girou a Roda da Sorte, mas não ganhou um prémio em dinheiro desta vez.")
         return redirect('lucky_wheel')
     return redirect('home')
 
@@ -755,13 +703,30 @@ def investment_levels_view(request):
     View para exibir a lista de produtos (níveis de investimento).
     Acessa a tabela de produtos e envia os dados para o template.
     """
-    products = Product.objects.filter(is_active=True).order_by('order')
+    version, products = catalog.active_products_with_version()
     
     # O template espera a variável 'investment_levels', então vamos renomear aqui.
+    # A versão do catálogo é a chave da cache dos fragmentos de cada produto.
     context = {
         'investment_levels': products,
+        'catalog_version': version,
         'user_balance': request.user.balance, # Adicionado para o template
-        'current_product_id': request.user.current_product.id if request.user.current_product else None,
+        'current_product_id': request.user.current_product_id,
     }
     
     return render(request, 'core/investment_levels.html', context)
+
+
+def metrics_view(request):
+    """
+    Métricas de latência e de SQL por rota, no formato de texto do Prometheus.
+    Só para membros da equipa ou com o token METRICS_TOKEN; os outros recebem 404.
+    """
+    authorization = request.headers.get('Authorization', '')
+    token = settings.METRICS_TOKEN
+    allowed = request.user.is_staff or (
+        token and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+    )
+    if not allowed:
+        raise Http404
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,71 @@
+# microsoft_2025_platform/gunicorn.conf.py
+
+# Configuração do gunicorn, lida automaticamente do diretório onde ele arranca.
+# O número de workers vem de WEB_CONCURRENCY e a porta de PORT (ambos do Render).
+#
+# SERVER_MODE=wsgi (por omissão): workers síncronos, um pedido de cada vez por worker.
+# SERVER_MODE=asgi: workers do uvicorn (pacote uvicorn-worker) a servir
+# microsoft_2025_platform/asgi.py; cada worker atende vários pedidos ao mesmo
+# tempo enquanto esperam pela base de dados. Para comparar os dois modos:
+#   python manage.py bench_servers
+#
+# MEDIA_WORKER=1: o processo mestre também arranca e vigia o worker da fila `media`
+# (comprovativos de depósito), que precisa do mesmo disco (MEDIA_ROOT) do serviço web:
+# reinicia-o se terminar e para-o quando o gunicorn termina.
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+if os.environ.get('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'microsoft_2025_platform.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'microsoft_2025_platform.wsgi:application'
+
+MEDIA_WORKER_COMMAND = [
+    sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'manage.py'),
+    'runworker', '--queues', 'media', '--pool', 'process', '--concurrency', '1',
+]
+# Segundos mínimos entre arranques, para não entrar em ciclo se falhar logo ao arrancar.
+MEDIA_WORKER_RESTART_DELAY = 5.0
+
+_media_worker = {'process': None, 'stopping': False}
+
+
+def _supervise_media_worker(server):
+    while not _media_worker['stopping']:
+        started = time.monotonic()
+        process = _media_worker['process'] = subprocess.Popen(MEDIA_WORKER_COMMAND)
+        code = process.wait()
+        if _media_worker['stopping']:
+            return
+        server.log.error("O worker da fila media terminou (código %s); a reiniciar.", code)
+        time.sleep(max(0.0, MEDIA_WORKER_RESTART_DELAY - (time.monotonic() - started)))
+
+
+def on_starting(server):
+    if os.environ.get('MEDIA_WORKER') == '1':
+        threading.Thread(target=_supervise_media_worker, args=(server,), name='media-worker', daemon=True).start()
+
+
+def on_exit(server):
+    _media_worker['stopping'] = True
+    process = _media_worker['process']
+    if process is not None and process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def child_exit(server, worker):
+    # Corre no processo mestre quando um worker termina (reciclado, morto por timeout
+    # ou no fim): os totais dele deixam de contar no /metrics, que o Prometheus vê
+    # como um reinício do contador, e o próximo processo com o mesmo PID não os herda.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'microsoft_2025_platform.settings')
+    from core import metrics
+    metrics.forget_process(worker.pid)
@@ -2,7 +2,9 @@
 
 from pathlib import Path
 import os
+import tempfile
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -35,8 +37,11 @@ INSTALLED_APPS = [
 
 # Configuração de MIDDLEWARE: WhiteNoise deve estar logo após o SecurityMiddleware.
 MIDDLEWARE = [
+    # Primeiro da lista: mede o pedido inteiro, incluindo as consultas de sessão e autenticação.
+    'core.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise, também assíncrono com SERVER_MODE=asgi (core/middleware.py).
+    'core.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -49,18 +54,27 @@ ROOT_URLCONF = 'microsoft_2025_platform.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates com medição do tempo de renderização (core/metrics.py)
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [
             BASE_DIR / 'templates',
             BASE_DIR / 'core' / 'templates',
         ],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates compilados uma vez por processo (o que o Django já faz sem
+            # 'loaders'; explícito para não se perder se a lista mudar).
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.reference_data.reference_data',
             ],
         },
     },
@@ -68,12 +82,24 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'microsoft_2025_platform.wsgi.application'
 
+# Servidor de aplicação, escolhido com SERVER_MODE (lido também pelo gunicorn.conf.py):
+# - 'wsgi': workers síncronos do gunicorn, um pedido de cada vez por worker (por omissão);
+# - 'asgi': workers do uvicorn dentro do gunicorn (microsoft_2025_platform/asgi.py); as
+#   páginas só de leitura passam a ser as views assíncronas de core/async_views.py.
+SERVER_MODES = ('wsgi', 'asgi')
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+if SERVER_MODE not in SERVER_MODES:
+    raise ImproperlyConfigured(f"SERVER_MODE deve ser um de: {', '.join(SERVER_MODES)}.")
+
 # Database
 if 'DATABASE_URL' in os.environ:
     DATABASES = {
         'default': dj_database_url.config(
             default=os.environ.get('DATABASE_URL'),
-            conn_max_age=600
+            # Com ASGI cada pedido usa uma thread diferente para o ORM e as
+            # ligações persistentes ficariam presas a threads; o Django
+            # recomenda desligá-las.
+            conn_max_age=0 if SERVER_MODE == 'asgi' else 600
         )
     }
 else:
@@ -84,6 +110,57 @@ else:
         }
     }
 
+# Cache partilhada entre os workers do gunicorn (ex: versão do catálogo de
+# produtos em core/catalog.py). Em produção usa uma tabela na base de dados,
+# criada com `createcachetable` no build; localmente basta a cache em memória.
+if 'DATABASE_URL' in os.environ:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+# Dados de referência em memória (core/versioned_cache.py): cada processo confirma
+# a versão na cache partilhada no máximo uma vez por este intervalo. Com a
+# DatabaseCache cada confirmação é uma consulta; alterações feitas no admin
+# chegam aos outros workers com este atraso máximo.
+REFERENCE_DATA_RECHECK_SECONDS = float(os.environ.get('REFERENCE_DATA_RECHECK_SECONDS', '5'))
+
+# Fragmentos de template já renderizados ({% cache ... using="fragments" %}), em
+# memória em cada processo: na cache partilhada cada leitura seria uma consulta.
+# As chaves incluem a versão dos dados (core/versioned_cache.py), por isso uma
+# alteração no admin muda a chave e as entradas antigas saem por falta de espaço.
+CACHES['fragments'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'fragments',
+    'TIMEOUT': 60 * 60 * 24,
+    'OPTIONS': {'MAX_ENTRIES': 1000},
+}
+
+# Armazenamento das sessões, escolhido com SESSION_MODE:
+# - 'db': tabela django_session, uma consulta por pedido autenticado (por omissão);
+# - 'cached_db': cache à frente da tabela; só poupa a consulta se a cache não
+#   estiver na própria base de dados (a DatabaseCache de produção não poupa nada);
+# - 'signed_cookies': a sessão vai assinada no cookie, sem nenhuma consulta. O
+#   logout apaga o cookie, mas uma cópia antiga continua válida até expirar e
+#   não há como revogar sessões do lado do servidor. Só como opção explícita,
+#   não em produção: o render.yaml usa 'db'.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_MODE = os.environ.get('SESSION_MODE', 'db')
+if SESSION_MODE not in SESSION_ENGINES:
+    raise ImproperlyConfigured(f"SESSION_MODE deve ser um de: {', '.join(SESSION_ENGINES)}.")
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -112,9 +189,23 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads acima de 512 KB (ex: fotos de comprovativos) vão para um ficheiro
+# temporário em blocos em vez de ficarem inteiros em memória no worker.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
+
 # Define o modelo de usuário personalizado
 AUTH_USER_MODEL = 'core.CustomUser'
 
+# Chave da permutação que gera os códigos de convite a partir do id do usuário
+# (core/invitation_codes.py). Não deve mudar depois de haver usuários registados.
+INVITATION_CODE_KEY = os.environ.get('INVITATION_CODE_KEY', SECRET_KEY)
+
+# Métricas por rota (core/metrics.py). Cada worker do gunicorn grava os seus
+# totais em METRICS_DIR e o /metrics junta-os. O /metrics só responde a
+# membros da equipa ou a pedidos com `Authorization: Bearer <METRICS_TOKEN>`.
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'microsoft_2025_metrics'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # Adições para URLs de login e redirecionamento
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = 'home'